@@ -0,0 +1,323 @@
+from django.views.decorators.http import condition
+from django.utils.cache import add_never_cache_headers
+from django.utils.decorators import method_decorator
+from django.utils.translation import ugettext as _
+from django.http import JsonResponse, HttpResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.views.generic import View
+from django.db.models import Count, Max
+from manager.routers import use_primary
+from django.urls import reverse
+import hashlib
+import json
+
+from .paginator import CursorPaginator, InvalidCursor
+from .journal import SYNC_BATCH_SIZE, read_changes
+from .reuse import get_reuse_count
+from .jobs import cancel_job
+from .search import search_entries
+from .cache import get_vault_version, is_cache_shared
+from .sharing import create_share_token, get_active_share_tokens, revoke_share_token
+from .forms import EntryForm, ShareTokenForm
+from .models import Entry, Job, ShareToken
+from .utils import get_crypto
+
+PAGE_SIZE = 100
+
+
+def serialize_entry(entry: Entry, password: str) -> dict:
+    return {
+        'id': entry.pk,
+        'name': entry.name,
+        'url': entry.url,
+        'login': entry.login,
+        'password': password,
+        'updated_at': entry.updated_at.isoformat(),
+    }
+
+
+def serialize_share(share: ShareToken) -> dict:
+    return {
+        'id': share.pk,
+        'expires': int(share.expires_at.timestamp()),
+        'max_uses': share.max_uses,
+        'uses': share.uses,
+    }
+
+
+def serialize_job(job: Job) -> dict:
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def get_entry_etag(updated_at) -> str:
+    return '"{}"'.format(int(updated_at.timestamp() * 1000000))
+
+
+def list_etag(request, *args, **kwargs):
+    """
+    Compute the ETag of the list of entries from the cached vault version,
+    which changes with every change of the entries, so the database is not
+    queried at all. The version kept by a single process is not bumped by the
+    changes made by the others, so without a shared cache the ETag is
+    computed from the number of the entries and the time of the last change.
+    """
+    if not request.user.is_authenticated:
+        return None
+    if is_cache_shared():
+        version = get_vault_version(request.user.pk)
+    else:
+        state = Entry.objects.filter(owner=request.user).aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+        version = '{count}:{updated_at}'.format(**state)
+    to_hash = '{version}:{query}'.format(version=version, query=request.GET.urlencode())
+    return '"{}"'.format(hashlib.md5(to_hash.encode('utf-8')).hexdigest())
+
+
+def _get_updated_at(request, pk):
+    """Return the modification time of the entry, queried once per request."""
+    if not request.user.is_authenticated:
+        return None
+    if not hasattr(request, '_entry_updated_at'):
+        with use_primary():
+            request._entry_updated_at = Entry.objects.filter(owner=request.user, pk=pk) \
+                .values_list('updated_at', flat=True).first()
+    return request._entry_updated_at
+
+
+def detail_etag(request, *args, **kwargs):
+    updated_at = _get_updated_at(request, kwargs['pk'])
+    return get_entry_etag(updated_at) if updated_at else None
+
+
+def detail_last_modified(request, *args, **kwargs):
+    return _get_updated_at(request, kwargs['pk'])
+
+
+class ApiLoginRequiredMixin(object):
+    """Responds with `401 Unauthorized` to the requests of not logged users."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': _('Authentication required.')}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'error': _('Not found.')}, status=404)
+
+    def get_queryset(self):
+        return Entry.objects.filter(owner=self.request.user)
+
+    def get_data(self):
+        try:
+            data = json.loads(self.request.body.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            data = None
+        if not isinstance(data, dict):
+            raise ValueError(_('The request body has to be a JSON object.'))
+        return data
+
+    def save_form(self, data: dict, instance: Entry = None) -> JsonResponse:
+        """
+        Validate the data using the `EntryForm` and create or update the entry.
+        The response tells the number of the other entries reusing the password.
+        """
+        form = EntryForm(data=data, instance=instance)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        password = form.cleaned_data['password']
+        form.instance.owner = self.request.user
+        entry = form.save()
+
+        data = dict(serialize_entry(entry, password), reused=get_reuse_count(entry))
+        response = JsonResponse(data, status=201 if instance is None else 200)
+        response['ETag'] = get_entry_etag(entry.updated_at)
+        if instance is None:
+            response['Location'] = reverse('entries:api-detail', args=[entry.pk])
+        return response
+
+
+class EntryApiListView(ApiLoginRequiredMixin, View):
+    """
+    The entries API list view. Returns a page of the entries of the user
+    (`GET`) or creates a new entry (`POST`). The list supports the same
+    `q` and `cursor` parameters as the HTML list. Unchanged lists are not
+    fetched nor decrypted again, a matching `If-None-Match` header results
+    in `304 Not Modified`.
+    """
+
+    @method_decorator(condition(etag_func=list_etag))
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        query = request.GET.get('q')
+        if query:
+            queryset = search_entries(queryset, query, owner_id=request.user.pk)
+
+        try:
+            page = CursorPaginator(queryset, PAGE_SIZE).page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return JsonResponse({'error': _('Invalid cursor.')}, status=400)
+
+        passwords = get_crypto().decrypt_many(entry.password for entry in page)
+        return JsonResponse({
+            'results': [serialize_entry(entry, password) for entry, password in zip(page, passwords)],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = self.get_data()
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        return self.save_form(data)
+
+
+class EntryApiDetailView(ApiLoginRequiredMixin, View):
+    """
+    The entry API detail view. Returns (`GET`), updates (`PUT`, `PATCH`)
+    or deletes (`DELETE`) a single entry of the user. The responses carry
+    the `ETag` and `Last-Modified` headers. Conditional `GET` requests of
+    unchanged entries result in `304 Not Modified` and conditional updates
+    of modified entries result in `412 Precondition Failed`.
+    """
+    http_method_names = ['get', 'put', 'patch', 'delete', 'head', 'options']
+
+    @method_decorator(condition(etag_func=detail_etag, last_modified_func=detail_last_modified))
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_object(self) -> Entry:
+        return get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+
+    def get(self, request, *args, **kwargs):
+        entry = self.get_object()
+        return JsonResponse(serialize_entry(entry, get_crypto().decrypt(entry.password)))
+
+    def put(self, request, *args, **kwargs):
+        entry = self.get_object()
+        try:
+            data = self.get_data()
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        return self.save_form(data, instance=entry)
+
+    def patch(self, request, *args, **kwargs):
+        entry = self.get_object()
+        try:
+            data = self.get_data()
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        current = serialize_entry(entry, get_crypto().decrypt(entry.password))
+        current.update(data)
+        return self.save_form(current, instance=entry)
+
+    def delete(self, request, *args, **kwargs):
+        self.get_object().delete()
+        return HttpResponse(status=204)
+
+
+class EntryApiShareView(ApiLoginRequiredMixin, View):
+    """
+    The entry API share view. Lists the active links that give access to
+    the entry (`GET`) or creates a new one (`POST`) with the optional
+    `expires_in` (seconds, see `ShareTokenForm`) and `max_uses` options
+    sent as JSON or form data.
+    """
+    http_method_names = ['get', 'post', 'options']
+
+    def get(self, request, *args, **kwargs):
+        entry = get_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        return JsonResponse({'results': [serialize_share(share) for share in get_active_share_tokens(entry)]})
+
+    def post(self, request, *args, **kwargs):
+        entry = get_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        try:
+            data = self.get_data() if request.content_type == 'application/json' else request.POST
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        form = ShareTokenForm(data=data)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        token, share = create_share_token(entry, form.cleaned_data['expires_in'], form.cleaned_data['max_uses'])
+        link = request.build_absolute_uri(reverse('entries:share-check', args=[token]))
+        return JsonResponse(dict(serialize_share(share), link=link), status=201)
+
+
+class EntryApiShareDetailView(ApiLoginRequiredMixin, View):
+    """The entry API share detail view. Revokes (`DELETE`) a link that gives access to the entry."""
+    http_method_names = ['delete', 'options']
+
+    def delete(self, request, *args, **kwargs):
+        share = get_object_or_404(ShareToken, pk=kwargs['share_pk'], entry_id=kwargs['pk'],
+                                  entry__owner=request.user)
+        revoke_share_token(share)
+        return HttpResponse(status=204)
+
+
+class EntrySyncView(ApiLoginRequiredMixin, View):
+    """
+    The entries API sync view. Returns the changes of the entries recorded
+    in the journal after the `since` sequence number, in compacted batches.
+    Deleted entries are returned as tombstones. The clients should store the
+    returned `seq` and repeat the request while `more` is set.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = min(int(request.GET.get('limit', SYNC_BATCH_SIZE)), SYNC_BATCH_SIZE)
+            if since < 0 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return JsonResponse({'error': _('Invalid since or limit parameter.')}, status=400)
+
+        result = read_changes(request.user, since, limit)
+        entries = [entry for _entry_id, entry in result['changes'] if entry is not None]
+        passwords = dict(zip((entry.pk for entry in entries),
+                             get_crypto().decrypt_many(entry.password for entry in entries)))
+
+        changes = []
+        for entry_id, entry in result['changes']:
+            if entry is None:
+                changes.append({'id': entry_id, 'action': 'delete'})
+            else:
+                changes.append({'id': entry_id, 'action': 'upsert',
+                                'entry': serialize_entry(entry, passwords[entry_id])})
+        return JsonResponse({'changes': changes, 'seq': result['seq'], 'more': result['more']})
+
+
+class JobApiDetailView(ApiLoginRequiredMixin, View):
+    """
+    The job API detail view. Returns the status and the progress of a
+    background job of the user (`GET`), polled until the job finishes, or
+    cancels the job (`DELETE`). The responses are never cached.
+    """
+    http_method_names = ['get', 'delete', 'head', 'options']
+
+    def get_object(self) -> Job:
+        return get_object_or_404(Job.objects.defer('payload'), pk=self.kwargs['pk'], owner=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        response = JsonResponse(serialize_job(self.get_object()))
+        add_never_cache_headers(response)
+        return response
+
+    def delete(self, request, *args, **kwargs):
+        if not cancel_job(self.get_object()):
+            return JsonResponse({'error': _('The job has already finished.')}, status=409)
+        return HttpResponse(status=204)
@@ -0,0 +1,167 @@
+from django.test import Client
+from django.urls import reverse
+import statistics
+import time
+
+from .paginator import CursorPaginator
+from .cache import bump_vault_version
+from .sharing import create_share_token
+from .transfer import import_entries
+from .search import search_entries
+from .utils import get_crypto
+from .models import Entry
+
+SIZES = (1000, 10000, 100000)
+DEPTHS = (1, 10, 100)
+QUERIES = ('', 'site42', 'user7')
+PAGE_SIZE = 10
+
+
+class Metric(object):
+    """A single measured value of the benchmark."""
+
+    def __init__(self, name: str, value: float, unit: str, higher_is_better: bool) -> None:
+        self.name = name
+        self.value = value
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+
+    def to_dict(self) -> dict:
+        return {'value': round(self.value, 3), 'unit': self.unit, 'higher_is_better': self.higher_is_better}
+
+
+def rate(func, iterations: int) -> float:
+    """Call the `func` `iterations` times and return the number of calls per second."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - start)
+
+
+def latency(func, repeat: int) -> float:
+    """Call the `func` `repeat` times and return the median duration in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def generate_rows(start: int, stop: int):
+    """Generate the synthetic entries with the numbers from `start` to `stop`."""
+    for number in range(start, stop):
+        yield {
+            'name': 'entry{:06d}'.format(number),
+            'url': 'https://site{}.example.com/'.format(number % 1000),
+            'login': 'user{}'.format(number % 97),
+            'password': 'password-{:08x}'.format(number * 2654435761 % 2 ** 32),
+        }
+
+
+def benchmark_crypto(iterations: int) -> list:
+    crypto = get_crypto()
+    encrypted = crypto.encrypt('password')
+    return [
+        Metric('crypto.encrypt', rate(lambda: crypto.encrypt('password'), iterations), 'ops/s', True),
+        Metric('crypto.decrypt', rate(lambda: crypto.decrypt(encrypted), iterations), 'ops/s', True),
+    ]
+
+
+def benchmark_import(owner, start: int, stop: int) -> Metric:
+    started = time.perf_counter()
+    import_entries(generate_rows(start, stop), owner)
+    value = (stop - start) / (time.perf_counter() - started)
+    return Metric('import.{}'.format(stop), value, 'entries/s', True)
+
+
+def get_cursor(owner, query: str, depth: int):
+    """Return the cursor of the page with the given number (or `None` if too deep)."""
+    queryset = Entry.objects.filter(owner=owner).defer('password')
+    if query:
+        queryset = search_entries(queryset, query, owner_id=owner.pk)
+    paginator = CursorPaginator(queryset, PAGE_SIZE)
+
+    cursor = ''
+    for _ in range(depth - 1):
+        page = paginator.page(cursor or None)
+        if not page.has_next():
+            return None
+        cursor = page.next_cursor
+    return cursor
+
+
+def benchmark_list(owner, size: int, repeat: int) -> list:
+    client = Client()
+    client.force_login(owner, backend=None)
+    metrics = []
+
+    for query in QUERIES:
+        for depth in DEPTHS:
+            cursor = get_cursor(owner, query, depth)
+            if cursor is None:
+                continue
+            params = {'q': query, 'cursor': cursor}
+
+            def cold():
+                # Bypass the cache of the rendered pages.
+                bump_vault_version(owner.pk)
+                client.get(reverse('entries:list'), params)
+
+            name = 'list.{}.page{}.q={}'.format(size, depth, query)
+            metrics.append(Metric(name, latency(cold, repeat), 'ms', False))
+            metrics.append(Metric(name + '.cached', latency(lambda: client.get(reverse('entries:list'), params),
+                                                            repeat), 'ms', False))
+    return metrics
+
+
+def benchmark_share_check(owner, iterations: int) -> Metric:
+    client = Client()
+    entry = Entry.objects.filter(owner=owner).first()
+    token, _share = create_share_token(entry)
+    link = reverse('entries:share-check', args=[token])
+    return Metric('share_check', rate(lambda: client.get(link), iterations), 'req/s', True)
+
+
+def run_benchmark(owner, sizes=SIZES, iterations: int = 1000, repeat: int = 5, log=None) -> list:
+    """
+    Run the benchmark in the current database. The synthetic entries of the
+    `owner` are imported in steps up to every size of the `sizes`, then the
+    entries list is measured at several page depths and search terms.
+    Returns the list of the measured metrics.
+    """
+    log = log or (lambda message: None)
+    metrics = benchmark_crypto(iterations)
+    log('Measured the crypto.')
+
+    count = Entry.objects.filter(owner=owner).count()
+    for size in sorted(sizes):
+        metrics.append(benchmark_import(owner, count, size))
+        count = size
+        log('Imported {} entries.'.format(size))
+        metrics.extend(benchmark_list(owner, size, repeat))
+        log('Measured the list of {} entries.'.format(size))
+
+    metrics.append(benchmark_share_check(owner, iterations // 10 or 1))
+    log('Measured the share check.')
+    return metrics
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare the results with the baseline. Returns the list of the metrics
+    (with their values) that are worse than the baseline by more than the
+    `threshold` fraction. The metrics missing in either run are skipped.
+    """
+    regressions = []
+    for name, metric in sorted(results['metrics'].items()):
+        base = baseline.get('metrics', {}).get(name)
+        if not base or not base['value']:
+            continue
+        if metric['higher_is_better']:
+            change = (base['value'] - metric['value']) / base['value']
+        else:
+            change = (metric['value'] - base['value']) / base['value']
+        if change > threshold:
+            regressions.append((name, base['value'], metric['value'], metric['unit']))
+    return regressions
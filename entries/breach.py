@@ -0,0 +1,199 @@
+from django.conf import settings
+import functools
+import tempfile
+import hashlib
+import struct
+import heapq
+import mmap
+import os
+
+from .utils import get_crypto
+
+MAGIC = b'BREACH01'
+HEADER = struct.Struct('>8sQQI4x')
+DIGEST_SIZE = 20
+BLOOM_HASHES = 7
+BLOOM_BITS_PER_DIGEST = 10
+SORT_CHUNK_SIZE = 1000000
+AUDIT_BATCH_SIZE = 500
+
+
+def _bloom_positions(digest: bytes, bits: int):
+    """Return the positions of the digest in the Bloom filter (double hashing of the SHA-1 digest)."""
+    first, second = struct.unpack_from('>QQ', digest)
+    return [(first + number * second) % bits for number in range(BLOOM_HASHES)]
+
+
+def parse_corpus(path: str):
+    """
+    Generate the SHA-1 digests of the breached passwords from a corpus file
+    in the HIBP format: `<SHA-1>:<count>` lines, or `<suffix>:<count>` lines
+    of a range file named after the 5 characters long prefix of the hashes.
+    """
+    prefix = os.path.splitext(os.path.basename(path))[0].upper()
+    with open(path, encoding='ascii', errors='ignore') as stream:
+        for line in stream:
+            value = line.split(':', 1)[0].strip().upper()
+            if len(value) == 35:
+                value = prefix + value
+            try:
+                digest = bytes.fromhex(value)
+            except ValueError:
+                continue
+            if len(digest) == DIGEST_SIZE:
+                yield digest
+
+
+def _sorted_runs(digests, directory: str, chunk_size: int) -> list:
+    """Split the digests into sorted runs stored in the temporary files."""
+    runs = []
+    chunk = []
+    for digest in digests:
+        chunk.append(digest)
+        if len(chunk) == chunk_size:
+            runs.append(_write_run(sorted(chunk), directory))
+            chunk = []
+    if chunk:
+        runs.append(_write_run(sorted(chunk), directory))
+    return runs
+
+
+def _write_run(digests: list, directory: str) -> str:
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.run')
+    with os.fdopen(fd, 'wb') as stream:
+        stream.write(b''.join(digests))
+    return path
+
+
+def _read_run(path: str):
+    with open(path, 'rb') as stream:
+        while True:
+            digest = stream.read(DIGEST_SIZE)
+            if len(digest) < DIGEST_SIZE:
+                return
+            yield digest
+
+
+def build_index(digests, path: str, bits_per_digest: int = BLOOM_BITS_PER_DIGEST,
+                chunk_size: int = SORT_CHUNK_SIZE) -> int:
+    """
+    Build the breach index file from the SHA-1 digests. The digests are
+    sorted externally (in runs of `chunk_size` digests merged from temporary
+    files), so the corpus never has to fit in the memory. The file holds
+    the header, the Bloom filter and the sorted unique digests. Returns the
+    number of the indexed digests.
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as directory:
+        runs = _sorted_runs(digests, directory, chunk_size)
+        merged = os.path.join(directory, 'merged')
+        count, previous = 0, None
+        with open(merged, 'wb') as stream:
+            for digest in heapq.merge(*[_read_run(run) for run in runs]):
+                if digest != previous:
+                    stream.write(digest)
+                    count, previous = count + 1, digest
+
+        bits = max(count * bits_per_digest, 8)
+        bloom = bytearray((bits + 7) // 8)
+        for digest in _read_run(merged):
+            for position in _bloom_positions(digest, bits):
+                bloom[position >> 3] |= 1 << (position & 7)
+
+        partial = os.path.join(directory, 'index')
+        with open(partial, 'wb') as stream, open(merged, 'rb') as source:
+            stream.write(HEADER.pack(MAGIC, count, bits, BLOOM_HASHES))
+            stream.write(bloom)
+            while True:
+                block = source.read(DIGEST_SIZE * 65536)
+                if not block:
+                    break
+                stream.write(block)
+        os.replace(partial, path)
+    return count
+
+
+class BreachIndex(object):
+    """
+    The memory-mapped breach index. A password is hashed with SHA-1, checked
+    in the Bloom filter and, when it may be present, binary searched in the
+    sorted digests. Only the touched pages of the file are read.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.bits, hashes = HEADER.unpack_from(self._map)
+        if magic != MAGIC or hashes != BLOOM_HASHES:
+            raise ValueError('{} is not a breach index.'.format(path))
+        self._bloom_offset = HEADER.size
+        self._offset = HEADER.size + (self.bits + 7) // 8
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, password: str) -> bool:
+        return self.contains_digest(hashlib.sha1(password.encode('utf-8')).digest())
+
+    def contains_digest(self, digest: bytes) -> bool:
+        for position in _bloom_positions(digest, self.bits):
+            if not self._map[self._bloom_offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            start = self._offset + middle * DIGEST_SIZE
+            value = self._map[start:start + DIGEST_SIZE]
+            if value == digest:
+                return True
+            if value < digest:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+
+@functools.lru_cache(maxsize=4)
+def _open_index(path: str, inode: int, mtime: int, size: int) -> BreachIndex:
+    return BreachIndex(path)
+
+
+def get_breach_index():
+    """
+    Return the breach index set in the `BREACH_INDEX_PATH` setting or `None`
+    if not set. The opened index is kept until the file changes, so an index
+    rebuilt in place is picked up by the running processes.
+    """
+    path = getattr(settings, 'BREACH_INDEX_PATH', None)
+    if not path:
+        return None
+    stat = os.stat(path)
+    return _open_index(path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def is_breached(password: str) -> bool:
+    """Return whether the password is in the breach index (always `False` without the index)."""
+    index = get_breach_index()
+    return index is not None and password in index
+
+
+def audit_entries(queryset, batch_size: int = AUDIT_BATCH_SIZE):
+    """
+    Generate the entries of the queryset with the breached passwords. The
+    entries are read in batches of `batch_size` ordered by the primary key
+    and their passwords are decrypted a batch at a time.
+    """
+    index = get_breach_index()
+    if index is None:
+        return
+
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return
+        passwords = get_crypto().decrypt_many(entry.password for entry in batch)
+        for entry, password in zip(batch, passwords):
+            if password in index:
+                yield entry
+        last_pk = batch[-1].pk
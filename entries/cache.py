@@ -0,0 +1,110 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache import cache, caches
+from django.db import transaction
+from manager.routers import use_primary
+from django.conf import settings
+import hashlib
+import time
+
+from .utils import seal, unseal
+
+VERSION_KEY = 'entries:version:{owner_id}'
+COUNT_KEY = 'entries:count:{owner_id}:{version}'
+PAGE_KEY = 'entries:page:{owner_id}:{version}:{params}'
+
+
+def is_cache_shared() -> bool:
+    """
+    Tell whether the cache is shared by all the processes. The local memory
+    cache is kept by every process on its own, so the data invalidated by one
+    process is still served by the others.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def get_vault_version(owner_id: int) -> int:
+    """
+    Return the version of the vault of the given user. The version is a part
+    of the keys of all cached data derived from the entries of the user, so
+    bumping it invalidates all of them at once.
+    """
+    key = VERSION_KEY.format(owner_id=owner_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the current time, so a version lost by the cache is never
+        # reused with the data cached before.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_vault_version(owner_id: int) -> None:
+    """Invalidate the cached data of the vault of the given user."""
+    key = VERSION_KEY.format(owner_id=owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def invalidate_vault(owner_id: int) -> None:
+    """
+    Bump the vault version now and once again after the current transaction
+    is committed, so no data cached by a concurrent request before the commit
+    is used afterwards.
+    """
+    bump_vault_version(owner_id)
+    transaction.on_commit(lambda: bump_vault_version(owner_id))
+
+
+def get_entry_count(owner) -> int:
+    """
+    Return the number of the entries of the given user, cached until the vault
+    changes when the cache is shared by all the processes. The cached count is
+    read from the primary database, as a replica behind it would have the
+    count cached under the version of the vault.
+    """
+    if not is_cache_shared():
+        return owner.entries.count()
+
+    key = COUNT_KEY.format(owner_id=owner.pk, version=get_vault_version(owner.pk))
+    count = cache.get(key)
+    if count is None:
+        with use_primary():
+            count = owner.entries.count()
+        cache.set(key, count)
+    return count
+
+
+def get_page_key(owner_id: int, query: str, cursor: str) -> str:
+    """
+    Return the cache key of the entries list page under the current version
+    of the vault. The key has to be taken before the entries are queried, so
+    a page rendered from the entries changed in the meantime is stored under
+    the version which has been bumped since.
+    """
+    params = hashlib.md5('{}\0{}'.format(query, cursor).encode('utf-8')).hexdigest()
+    return PAGE_KEY.format(owner_id=owner_id, version=get_vault_version(owner_id), params=params)
+
+
+def _get_seal_key() -> bytes:
+    return hashlib.sha256('entries.cache.page{}'.format(settings.SECRET_KEY).encode('utf-8')).digest()
+
+
+def get_list_page(key: str):
+    """
+    Return the cached content of the entries list page or `None`. The page is
+    kept sealed in the cache, so no decrypted data is ever stored in clear.
+    """
+    token = cache.get(key)
+    if token is None:
+        return None
+    try:
+        return unseal(token, _get_seal_key())
+    except ValueError:
+        return None
+
+
+def set_list_page(key: str, content: bytes) -> None:
+    """Seal and store the content of the entries list page under the key from `get_page_key`."""
+    cache.set(key, seal(content, _get_seal_key()))
@@ -0,0 +1,68 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.decorators import classonlymethod
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+import contextvars
+import functools
+import asyncio
+
+
+@functools.lru_cache(maxsize=None)
+def get_crypto_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool the cryptographic operations are offloaded to.
+    The pool is bounded by the `CRYPTO_WORKERS` setting.
+    """
+    return ThreadPoolExecutor(max_workers=settings.CRYPTO_WORKERS, thread_name_prefix='crypto')
+
+
+async def run_crypto(func, *args):
+    """
+    Run the (blocking) cryptographic function in the crypto thread pool.
+    The function runs in a copy of the current context, so it is recorded
+    in the metrics of the current request.
+    """
+    loop = asyncio.get_event_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_crypto_executor(), functools.partial(context.run, func, *args))
+
+
+class AsyncViewMixin(object):
+    """
+    Serves the class-based view asynchronously. The HTTP method handlers of
+    the view have to be coroutines; the database is accessed through
+    `sync_to_async`, which runs the queries in the thread reserved for the
+    synchronous code, so the event loop is never blocked by the ORM.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        # The request handler awaits the view only when it is a coroutine
+        # function (there is no support for asynchronous class-based views
+        # in Django 3.2), so the view is wrapped in one.
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return functools.update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin, AsyncViewMixin):
+    """
+    Verifies that the current user is authenticated. The user is loaded in
+    a thread, so the view can use `request.user` without blocking afterwards.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return self.handle_no_permission()
+        return await AsyncViewMixin.dispatch(self, request, *args, **kwargs)
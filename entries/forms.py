@@ -1,10 +1,18 @@
 from django.utils.translation import gettext_lazy as _
+from django.conf import settings
 from django import forms
+import os
+
+from .breach import is_breached
 from .models import Entry
 
 
 class EntryForm(forms.ModelForm):
-    """Form representation of the single entry based on the `Entry` model."""
+    """
+    Form representation of the single entry based on the `Entry` model.
+    The passwords found in the breach index are rejected unless `check_breach`
+    is unset.
+    """
 
     class Meta:
         model = Entry
@@ -20,8 +28,60 @@ class EntryForm(forms.ModelForm):
             'password': forms.PasswordInput(attrs={'placeholder': _('password')})
         }
 
+    def __init__(self, *args, check_breach: bool = True, **kwargs):
+        self.check_breach = check_breach
+        super().__init__(*args, **kwargs)
+
     def clean_password(self):
         password = self.cleaned_data.get('password')
         if len(password) > 50:
             raise forms.ValidationError(_('The password is too long. (max 50 characters)'))
+        if self.check_breach and is_breached(password):
+            raise forms.ValidationError(_('The password has appeared in a data breach. Use another one.'))
         return password
+
+
+class ShareTokenForm(forms.Form):
+    """Form with the options of the new share link of an entry."""
+    EXPIRY_CHOICES = (
+        (5 * 60, _('5 minutes')),
+        (60 * 60, _('1 hour')),
+        (24 * 60 * 60, _('1 day')),
+        (7 * 24 * 60 * 60, _('7 days')),
+    )
+
+    expires_in = forms.TypedChoiceField(label=_('expires in'), choices=EXPIRY_CHOICES, coerce=int,
+                                        required=False, empty_value=None)
+    max_uses = forms.IntegerField(label=_('max uses'), min_value=1, max_value=1000, required=False,
+                                  widget=forms.NumberInput(attrs={'placeholder': _('unlimited')}))
+
+
+class ImportForm(forms.Form):
+    """
+    Form with the file of the entries to import. The format is guessed from
+    the extension of the file unless chosen.
+    """
+    FORMAT_CHOICES = (('csv', _('CSV')), ('jsonl', _('JSON lines')))
+
+    file = forms.FileField(label=_('file'))
+    format = forms.ChoiceField(label=_('format'), choices=(('', _('guess from the extension')),) + FORMAT_CHOICES,
+                               required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload is None:
+            return cleaned_data
+
+        if upload.size > settings.IMPORT_MAX_SIZE:
+            raise forms.ValidationError(_('The file is too large. (max %(size)d MB)'),
+                                        params={'size': settings.IMPORT_MAX_SIZE // (1024 * 1024)})
+        fmt = cleaned_data.get('format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+        if fmt not in dict(self.FORMAT_CHOICES):
+            raise forms.ValidationError(_('Unknown format of the file. Choose the format.'))
+        try:
+            cleaned_data['text'] = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise forms.ValidationError(_('The file has to be encoded in UTF-8.'))
+        cleaned_data['format'] = fmt
+        return cleaned_data
@@ -0,0 +1,242 @@
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models.functions import Coalesce
+from django.db.models import DateTimeField, F, Q, Value
+from django.utils import timezone
+from django.conf import settings
+import threading
+import datetime
+import logging
+import random
+import time
+import io
+
+from .transfer import BATCH_SIZE as IMPORT_BATCH_SIZE, TransferError, chunked, clean_entries, read_entries, \
+    import_entries
+from .rotation import BATCH_SIZE as ROTATION_BATCH_SIZE, rotate_passwords, rotate_payloads
+from .breach import AUDIT_BATCH_SIZE, audit_entries, get_breach_index
+from .models import Entry, Job
+from .utils import get_crypto
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+CLAIM_CANDIDATES = 10
+STEP_RETRIES = 5
+PROGRESS_FIELDS = ('checkpoint', 'progress', 'total', 'result')
+
+
+class JobError(Exception):
+    """Raised by the job handlers when the job cannot be completed."""
+
+
+class JobInterrupted(Exception):
+    """Raised when the running job has been cancelled or taken over by another worker."""
+
+
+def register(kind: str):
+    """
+    Register the decorated function as the handler of the jobs of the given
+    kind. The handler is a generator which processes the job in chunks and
+    yields after every chunk with the `checkpoint`, `progress`, `total` and
+    `result` of the job updated. Every chunk runs in a transaction together
+    with the saving of the progress, so a chunk is never done twice.
+    """
+    def decorator(handler):
+        HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+
+def enqueue_job(kind: str, owner=None, params: dict = None, payload: str = None) -> Job:
+    """Create a pending job of the given kind. The `payload` is stored encrypted."""
+    if kind not in HANDLERS:
+        raise ValueError('Unknown kind of the job: {}'.format(kind))
+    return Job.objects.create(kind=kind, owner=owner, params=params or {},
+                              payload=get_crypto().encrypt(payload) if payload else '')
+
+
+def claim_job(worker: str):
+    """
+    Claim the oldest pending job for the `worker`, or a running job without
+    a heartbeat for the last `JOB_STALE_SECONDS` (its worker is presumed
+    dead, the job is resumed from its checkpoint). A job is claimed with a
+    conditional update, so it is never run by two workers at once. A job
+    interrupted `JOB_MAX_ATTEMPTS` times fails. Returns `None` if there is
+    no job to run.
+    """
+    now = timezone.now()
+    stale_before = now - datetime.timedelta(seconds=settings.JOB_STALE_SECONDS)
+    candidates = Job.objects.filter(Q(status=Job.PENDING) | Q(status=Job.RUNNING, heartbeat_at__lt=stale_before)) \
+        .order_by('id').values_list('pk', 'status', 'heartbeat_at', 'attempts')[:CLAIM_CANDIDATES]
+
+    for pk, status, heartbeat_at, attempts in candidates:
+        claimable = Job.objects.filter(pk=pk, status=status, heartbeat_at=heartbeat_at)
+        if attempts >= settings.JOB_MAX_ATTEMPTS:
+            claimable.update(status=Job.FAILED, error='The job has been interrupted too many times.',
+                             payload='', finished_at=now)
+            continue
+        if claimable.update(status=Job.RUNNING, worker=worker, heartbeat_at=now, attempts=F('attempts') + 1,
+                            started_at=Coalesce('started_at', Value(now, output_field=DateTimeField()))):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def save_progress(job: Job) -> bool:
+    """
+    Save the progress of the job and report the heartbeat of its worker.
+    Returns `False` if the job has been cancelled or taken over by another
+    worker in the meantime.
+    """
+    job.heartbeat_at = timezone.now()
+    return bool(Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+        checkpoint=job.checkpoint, progress=job.progress, total=job.total, result=job.result,
+        heartbeat_at=job.heartbeat_at))
+
+
+def finish_job(job: Job, status: str, error: str = '') -> bool:
+    """Mark the running job as finished with the given status and clear its payload."""
+    now = timezone.now()
+    finished = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+        status=status, error=error, payload='', progress=job.progress, total=job.total, result=job.result,
+        heartbeat_at=now, finished_at=now)
+    if finished:
+        job.status, job.error, job.payload, job.finished_at = status, error, '', now
+    return bool(finished)
+
+
+def cancel_job(job: Job) -> bool:
+    """
+    Cancel the pending or running job. The running job stops at its next
+    checkpoint and the work of the current chunk is rolled back.
+    """
+    cancelled = Job.objects.filter(pk=job.pk, status__in=[Job.PENDING, Job.RUNNING]) \
+        .update(status=Job.CANCELLED, payload='', finished_at=timezone.now())
+    if cancelled:
+        job.status = Job.CANCELLED
+    return bool(cancelled)
+
+
+def _run_steps(job: Job) -> None:
+    """Run the chunks of the job, each in a transaction together with the saving of the progress."""
+    steps = HANDLERS[job.kind](job)
+    while True:
+        with transaction.atomic():
+            try:
+                next(steps)
+            except StopIteration:
+                return
+            if not save_progress(job):
+                raise JobInterrupted
+
+
+def run_job(job: Job) -> Job:
+    """
+    Run the claimed job to the end (or until it is cancelled) and record its
+    outcome. A chunk failed because of a transient database error (such as a
+    locked database) is rolled back and the job is resumed from its saved
+    progress, up to `STEP_RETRIES` times.
+    """
+    for retry in range(1, STEP_RETRIES + 2):
+        try:
+            _run_steps(job)
+        except JobInterrupted:
+            logger.info('The job %s has been cancelled or taken over by another worker.', job.pk)
+        except OperationalError:
+            if retry <= STEP_RETRIES:
+                logger.warning('The job %s is retried after a database error.', job.pk, exc_info=True)
+                time.sleep(random.uniform(0, retry))
+                job.refresh_from_db(fields=PROGRESS_FIELDS)
+                continue
+            logger.exception('The job %s has failed.', job.pk)
+            finish_job(job, Job.FAILED, 'The job has failed unexpectedly.')
+        except (JobError, TransferError, ValueError) as exc:
+            finish_job(job, Job.FAILED, str(exc))
+        except Exception:
+            logger.exception('The job %s has failed.', job.pk)
+            finish_job(job, Job.FAILED, 'The job has failed unexpectedly.')
+        else:
+            finish_job(job, Job.DONE)
+        return job
+
+
+def work(worker: str, once: bool = False, poll_interval: float = None, stop: threading.Event = None) -> int:
+    """
+    Claim and run the jobs one by one, waiting `poll_interval` seconds (the
+    `JOB_POLL_INTERVAL` setting by default) when there is none. Returns when
+    the `stop` event is set, or when there are no more jobs if `once` is set.
+    Returns the number of the jobs run.
+    """
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    stop = stop or threading.Event()
+    count = 0
+    while not stop.is_set():
+        close_old_connections()
+        job = claim_job(worker)
+        if job is None:
+            if once:
+                break
+            stop.wait(poll_interval)
+            continue
+        run_job(job)
+        count += 1
+    return count
+
+
+@register(Job.IMPORT)
+def run_import(job: Job):
+    """
+    Import the entries of the file in the payload (`format` param) in chunks
+    of `batch_size` rows. The whole file is read and validated before the
+    first chunk, so a malformed or invalid row fails the job with nothing
+    imported.
+    """
+    text = get_crypto().decrypt(job.payload)
+    rows = clean_entries(read_entries(io.StringIO(text, newline=''), job.params.get('format', 'csv')))
+    batch_size = job.params.get('batch_size', IMPORT_BATCH_SIZE)
+    job.total = len(rows)
+
+    for chunk in chunked(rows[job.checkpoint:], batch_size):
+        import_entries(chunk, job.owner, batch_size, offset=job.checkpoint, cleaned=True)
+        job.checkpoint += len(chunk)
+        job.progress = job.checkpoint
+        job.result = {'imported': job.checkpoint}
+        yield
+
+
+@register(Job.AUDIT)
+def run_audit(job: Job):
+    """Check the passwords of the entries of the owner against the breach index."""
+    if get_breach_index() is None:
+        raise JobError('The breach index is not set.')
+
+    queryset = Entry.objects.filter(owner=job.owner)
+    batch_size = job.params.get('batch_size', AUDIT_BATCH_SIZE)
+    job.total = queryset.count()
+    while True:
+        pks = list(queryset.filter(pk__gt=job.checkpoint).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        chunk = queryset.filter(pk__gt=job.checkpoint, pk__lte=pks[-1])
+        breached = [entry.pk for entry in audit_entries(chunk, batch_size)]
+        job.result = {'breached': job.result.get('breached', []) + breached}
+        job.checkpoint = pks[-1]
+        job.progress += len(pks)
+        yield
+
+
+@register(Job.ROTATE)
+def run_rotation(job: Job):
+    """
+    Re-encrypt the passwords of all entries (see `rotate_passwords`) and then
+    the payloads of the queued jobs (see `rotate_payloads`) with the primary
+    key of the keyring.
+    """
+    batch_size = job.params.get('batch_size', ROTATION_BATCH_SIZE)
+    job.total = Entry.objects.count()
+    for last_pk, rotated in rotate_passwords(job.checkpoint, batch_size):
+        job.checkpoint = last_pk
+        job.progress = Entry.objects.filter(pk__lte=last_pk).count()
+        job.result = {'rotated': job.result.get('rotated', 0) + rotated}
+        yield
+    job.result = dict(job.result, payloads=rotate_payloads())
+    yield
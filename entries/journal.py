@@ -0,0 +1,60 @@
+from django.db.models import Exists, OuterRef, Max
+from manager.routers import use_primary
+from collections import OrderedDict
+
+from .models import Entry, EntryChange
+
+SYNC_BATCH_SIZE = 500
+
+
+def read_changes(owner, since: int, limit: int = SYNC_BATCH_SIZE) -> dict:
+    """
+    Read the changes of the entries of the `owner` recorded after the `since`
+    sequence number. At most `limit` journal records are read and compacted,
+    so an entry changed many times is returned once, in its current state,
+    or as a tombstone when it has been deleted. Returns a dictionary with the
+    `changes` list of `(entry_id, entry)` pairs (`entry` is `None` for the
+    deleted entries), the `seq` number to continue from and the `more` flag
+    telling whether there are further changes to read. The records of an
+    owner are numbered in the order of their commits (see
+    `entries.models.lock_journal`), so no record is ever committed behind
+    the returned `seq` number.
+    """
+    records = list(EntryChange.objects.filter(owner=owner, pk__gt=since)
+                   .order_by('pk').values_list('pk', 'entry_id', 'action')[:limit + 1])
+    more = len(records) > limit
+    records = records[:limit]
+
+    latest = OrderedDict()
+    for _, entry_id, action in records:
+        latest.pop(entry_id, None)
+        latest[entry_id] = action
+
+    alive = [entry_id for entry_id, action in latest.items() if action != EntryChange.DELETE]
+    # A replica behind the journal would turn the entries it lacks into tombstones.
+    with use_primary():
+        entries = Entry.objects.filter(owner=owner).in_bulk(alive) if alive else {}
+    return {
+        'changes': [(entry_id, entries.get(entry_id)) for entry_id in latest],
+        'seq': records[-1][0] if records else since,
+        'more': more,
+    }
+
+
+def compact_journal(batch_size: int = 10000) -> int:
+    """
+    Remove the journal records superseded by a newer record of the same entry.
+    The newest record of every entry is kept, so a client syncing from any
+    sequence number still receives the final state of every changed entry.
+    The journal is processed in batches of `batch_size` records. Returns the
+    number of removed records.
+    """
+    last_pk = EntryChange.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+    newer = EntryChange.objects.filter(entry_id=OuterRef('entry_id'), pk__gt=OuterRef('pk'))
+    removed = 0
+
+    for start in range(0, last_pk, batch_size):
+        superseded = EntryChange.objects.filter(pk__gt=start, pk__lte=start + batch_size) \
+            .annotate(superseded=Exists(newer)).filter(superseded=True).values_list('pk', flat=True)
+        removed += EntryChange.objects.filter(pk__in=list(superseded)).delete()[0]
+    return removed
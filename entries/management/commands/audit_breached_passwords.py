@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from entries.breach import AUDIT_BATCH_SIZE, audit_entries, get_breach_index
+from entries.models import Entry
+
+
+class Command(BaseCommand):
+    help = 'List the entries with the passwords found in the breach index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=AUDIT_BATCH_SIZE,
+                            help='Number of entries decrypted and checked at once.')
+
+    def handle(self, *args, **options):
+        if get_breach_index() is None:
+            raise CommandError('The breach index is not set. Use the BREACH_INDEX_PATH setting.')
+
+        queryset = Entry.objects.select_related('owner')
+        found = 0
+        for entry in audit_entries(queryset, options['batch_size']):
+            found += 1
+            self.stdout.write('{}: {} (entry {})'.format(entry.owner.get_username(), entry, entry.pk))
+        self.stdout.write(self.style.SUCCESS('Found {} breached passwords.'.format(found)))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from entries.reuse import BATCH_SIZE, backfill_fingerprints
+
+
+class Command(BaseCommand):
+    help = 'Fill in the password fingerprints of the entries saved without them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of entries decrypted and updated at once.')
+
+    def handle(self, *args, **options):
+        filled = backfill_fingerprints(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Filled in {} fingerprints.'.format(filled)))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+from django.core.cache import cache
+import django
+import json
+
+from entries.benchmark import SIZES, run_benchmark, compare
+
+
+class Command(BaseCommand):
+    help = ('Measure the throughput of the crypto, the entries list, the share links and the import. '
+            'The benchmark runs in a separate test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES),
+                            help='Numbers of the synthetic entries to measure with.')
+        parser.add_argument('--iterations', type=int, default=1000,
+                            help='Number of the crypto operations (a tenth for the share links).')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of the requests a median latency is computed of.')
+        parser.add_argument('--output', help='Path of the JSON file the results are written to.')
+        parser.add_argument('--baseline', help='Path of the JSON results of a previous run to compare with.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Fraction a metric may be worse than the baseline by (default 0.2).')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as exc:
+                raise CommandError('Invalid baseline file: {}'.format(exc))
+
+        verbosity = options['verbosity']
+        old_config = setup_databases(verbosity, interactive=False)
+        try:
+            with override_settings(DEBUG=False):
+                cache.clear()
+                owner = get_user_model().objects.create_user(username='benchmark')
+                metrics = run_benchmark(owner, options['sizes'], options['iterations'], options['repeat'],
+                                        log=self.stdout.write if verbosity > 1 else None)
+        finally:
+            teardown_databases(old_config, verbosity)
+
+        results = {
+            'created_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'metrics': {metric.name: metric.to_dict() for metric in metrics},
+        }
+        for metric in metrics:
+            self.stdout.write('{:<40} {:>12.3f} {}'.format(metric.name, metric.value, metric.unit))
+
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, indent=2, sort_keys=True)
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(
+                    '  {}: {:.3f} -> {:.3f} {}'.format(*regression) for regression in regressions))
+            self.stdout.write(self.style.SUCCESS('No performance regressions.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+import itertools
+import os
+
+from entries.breach import BLOOM_BITS_PER_DIGEST, build_index, parse_corpus
+
+
+class Command(BaseCommand):
+    help = 'Build the breach index from the breached password hashes in the HIBP format.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+',
+                            help='Paths of the files with the `<SHA-1>:<count>` lines or of the directories '
+                                 'with the range files (`<prefix>.txt` with the `<suffix>:<count>` lines).')
+        parser.add_argument('--output', required=True, help='Path of the built index.')
+        parser.add_argument('--bloom-bits', type=int, default=BLOOM_BITS_PER_DIGEST,
+                            help='Bits of the Bloom filter per hash.')
+
+    def get_files(self, paths) -> list:
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                names = sorted(os.listdir(path))
+                files.extend(os.path.join(path, name) for name in names if os.path.isfile(os.path.join(path, name)))
+            elif os.path.exists(path):
+                files.append(path)
+            else:
+                raise CommandError('File "{}" does not exist.'.format(path))
+        return files
+
+    def handle(self, *args, **options):
+        files = self.get_files(options['paths'])
+        digests = itertools.chain.from_iterable(parse_corpus(path) for path in files)
+        count = build_index(digests, options['output'], options['bloom_bits'])
+        self.stdout.write(self.style.SUCCESS('Indexed {} hashes.'.format(count)))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from entries.journal import compact_journal
+
+
+class Command(BaseCommand):
+    help = 'Remove the change journal records superseded by newer changes of the same entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of journal records processed at once.')
+
+    def handle(self, *args, **options):
+        removed = compact_journal(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Removed {} journal records.'.format(removed)))
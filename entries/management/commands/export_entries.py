@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from entries.transfer import FORMATS, BATCH_SIZE, export_entries
+from entries.models import Entry
+
+
+class Command(BaseCommand):
+    help = 'Export the entries to a CSV or JSON lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Username of the user whose entries are exported. '
+                                            'All entries are exported by default.')
+        parser.add_argument('--format', choices=FORMATS, default='csv',
+                            help='Format of the exported data.')
+        parser.add_argument('--output', help='Path of the output file. Defaults to stdout.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of entries fetched and decrypted at once.')
+
+    def handle(self, *args, **options):
+        queryset = Entry.objects.order_by('pk')
+        if options['owner'] is not None:
+            User = get_user_model()
+            try:
+                owner = User.objects.get(**{User.USERNAME_FIELD: options['owner']})
+            except User.DoesNotExist:
+                raise CommandError('User "{}" does not exist.'.format(options['owner']))
+            queryset = queryset.filter(owner=owner)
+
+        lines = export_entries(queryset, options['format'], options['batch_size'])
+
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+            stream.writelines(lines)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+import uuid
+import os
+
+from entries.transfer import FORMATS, BATCH_SIZE, TransferError, read_entries, import_entries
+
+
+class Command(BaseCommand):
+    help = 'Import entries from a CSV or JSON lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the file to import.')
+        parser.add_argument('--owner', required=True, help='Username of the owner of the entries.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Format of the file. Guessed from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of entries encrypted and inserted at once.')
+        parser.add_argument('--import-id',
+                            help='Marker of an interrupted import to resume. The entries imported before are skipped.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in FORMATS:
+            raise CommandError('Unknown format of the file. Use the --format option.')
+
+        User = get_user_model()
+        try:
+            owner = User.objects.get(**{User.USERNAME_FIELD: options['owner']})
+        except User.DoesNotExist:
+            raise CommandError('User "{}" does not exist.'.format(options['owner']))
+
+        import_id = options['import_id'] or uuid.uuid4().hex
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                imported = import_entries(read_entries(stream, fmt), owner, options['batch_size'],
+                                          import_id=import_id)
+        except (OSError, ValueError, TransferError) as exc:
+            if owner.entries.filter(import_id=import_id).exists():
+                # The chunks before the error are committed.
+                raise CommandError('{} Run the import again with --import-id {} to import the rest.'.format(
+                    exc, import_id))
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS('Imported {} entries.'.format(imported)))
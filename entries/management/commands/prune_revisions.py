@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from entries.revisions import PRUNE_BATCH_SIZE, prune_revisions
+
+
+class Command(BaseCommand):
+    help = 'Remove the entry revisions beyond the retention limits.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-count', type=int,
+                            help='Number of the latest revisions kept per entry (REVISION_MAX_COUNT by default).')
+        parser.add_argument('--max-age', type=int,
+                            help='Days the revisions are kept for (REVISION_MAX_AGE by default).')
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE,
+                            help='Number of entries processed at once.')
+
+    def handle(self, *args, **options):
+        removed = prune_revisions(options['max_count'], options['max_age'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Removed {} revisions.'.format(removed)))
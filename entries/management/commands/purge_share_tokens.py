@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from entries.sharing import PURGE_BATCH_SIZE, purge_share_tokens
+
+
+class Command(BaseCommand):
+    help = 'Remove the expired, revoked and used up share links.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE,
+                            help='Number of share links removed at once.')
+
+    def handle(self, *args, **options):
+        removed = purge_share_tokens(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Removed {} share links.'.format(removed)))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from entries.search import is_available, rebuild_index
+from entries.models import Entry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of the entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of entries indexed at once.')
+
+    def handle(self, *args, **options):
+        if not is_available(Entry.objects.db):
+            raise CommandError('The search index is not available in this database.')
+
+        indexed = rebuild_index(Entry.objects.all(), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Indexed {} entries.'.format(indexed)))
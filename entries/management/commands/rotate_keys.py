@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+
+from entries.rotation import BATCH_SIZE, rotate_passwords, rotate_payloads
+from entries.jobs import enqueue_job
+from entries.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Re-encrypt the passwords of all entries and the queued jobs with the primary key of the keyring.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of entries re-encrypted at once.')
+        parser.add_argument('--checkpoint',
+                            help='Path of the file the progress is saved to. An interrupted rotation is '
+                                 'resumed from the saved progress. The file is removed when done.')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the rotation as a background job run by the run_jobs command.')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue_job(Job.ROTATE, params={'batch_size': options['batch_size']})
+            self.stdout.write(self.style.SUCCESS('Queued the rotation as the job {}.'.format(job.pk)))
+            return
+
+        checkpoint = options['checkpoint']
+        start_after = 0
+        if checkpoint and os.path.exists(checkpoint):
+            try:
+                with open(checkpoint) as stream:
+                    start_after = int(stream.read())
+            except (OSError, ValueError) as exc:
+                raise CommandError('Invalid checkpoint file: {}'.format(exc))
+            self.stdout.write('Resuming after the entry {}.'.format(start_after))
+
+        total = 0
+        for last_pk, rotated in rotate_passwords(start_after, options['batch_size']):
+            total += rotated
+            if checkpoint:
+                with open(checkpoint, 'w') as stream:
+                    stream.write(str(last_pk))
+            self.stdout.write('Rotated {} entries up to the entry {}.'.format(rotated, last_pk))
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS('Rotated {} entries.'.format(total)))
+        self.stdout.write(self.style.SUCCESS('Rotated {} job payloads.'.format(rotate_payloads())))
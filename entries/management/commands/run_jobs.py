@@ -0,0 +1,60 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+import threading
+import socket
+import django
+import os
+
+from entries.jobs import work
+
+POOLS = ('thread', 'process')
+
+
+def run_worker(worker: str, once: bool, poll_interval: float, stop: threading.Event = None) -> int:
+    """Run the worker in a thread or a process of the pool and close its database connections when done."""
+    try:
+        return work(worker, once, poll_interval, stop)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run the background jobs (imports, audits and key rotations) queued in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of the jobs run at once.')
+        parser.add_argument('--pool', choices=POOLS, default='thread',
+                            help='Run the workers in threads or in processes (for the CPU bound jobs).')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Seconds to wait for a new job. The JOB_POLL_INTERVAL setting by default.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when there are no more jobs instead of waiting for new ones.')
+
+    def handle(self, *args, **options):
+        name = '{}:{}'.format(socket.gethostname(), os.getpid())
+        once, poll_interval, workers = options['once'], options['poll_interval'], max(options['workers'], 1)
+
+        if workers == 1:
+            count = work(name, once, poll_interval)
+        elif options['pool'] == 'thread':
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_worker, '{}:{}'.format(name, number), once, poll_interval, stop)
+                           for number in range(workers)]
+                try:
+                    count = sum(future.result() for future in futures)
+                except KeyboardInterrupt:
+                    # The workers stop once their current jobs are done.
+                    stop.set()
+                    raise
+        else:
+            # The connections must not be shared with the forked processes.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+                futures = [executor.submit(run_worker, '{}:{}'.format(name, number), once, poll_interval)
+                           for number in range(workers)]
+                count = sum(future.result() for future in futures)
+
+        self.stdout.write(self.style.SUCCESS('Ran {} jobs.'.format(count)))
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.3 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='name')),
+                ('url', models.URLField(verbose_name='url')),
+                ('login', models.CharField(max_length=50, verbose_name='login')),
+                ('password', models.CharField(max_length=90, verbose_name='password')),
+            ],
+            options={
+                'verbose_name': 'entry',
+                'verbose_name_plural': 'entries',
+                'ordering': ['name', 'url'],
+            },
+        ),
+    ]
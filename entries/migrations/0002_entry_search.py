@@ -0,0 +1,49 @@
+from django.db import migrations
+from urllib.parse import urlsplit
+
+# The SQL is copied here instead of importing `entries.search`, so this
+# migration keeps creating the index it was written for.
+SEARCH_TABLE = 'entries_entry_search'
+
+
+def get_host(url):
+    try:
+        return urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+
+
+def forwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS {} USING '
+                           'fts5(name, host, login, tokenize="trigram")'.format(SEARCH_TABLE))
+        except Exception:
+            # The SQLite library is built without FTS5 or the trigram tokenizer.
+            return
+
+        Entry = apps.get_model('entries', 'Entry')
+        entries = Entry.objects.using(connection.alias).only('pk', 'name', 'url', 'login')
+        cursor.execute('DELETE FROM {}'.format(SEARCH_TABLE))
+        cursor.executemany('INSERT INTO {} (rowid, name, host, login) VALUES (%s, %s, %s, %s)'.format(SEARCH_TABLE),
+                           [(entry.pk, entry.name, get_host(entry.url), entry.login) for entry in entries.iterator()])
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS {}'.format(SEARCH_TABLE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.3 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0002_entry_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['name', 'url', 'id'], name='entries_name_url_id_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 2.1.3 on 2026-10-18 07:46
+
+from django.conf import settings
+from django.db import migrations, models
+from urllib.parse import urlsplit
+import django.db.models.deletion
+
+# A frozen copy of the search index SQL from the time of this migration; the
+# later changes of `entries.search` must not affect it.
+SEARCH_TABLE = 'entries_entry_search'
+
+
+def get_host(url):
+    try:
+        return urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+
+
+def backfill_owner(apps, schema_editor):
+    """Assign the existing entries to the first superuser (or the first user)."""
+    alias = schema_editor.connection.alias
+    Entry = apps.get_model('entries', 'Entry')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    entries = Entry.objects.using(alias).filter(owner__isnull=True)
+    if not entries.exists():
+        return
+
+    users = User.objects.using(alias).order_by('pk')
+    owner = users.filter(is_superuser=True).first() or users.first()
+    if owner is None:
+        raise RuntimeError('Create a user before migrating, the existing entries need an owner.')
+    entries.update(owner=owner)
+
+
+def rebuild_search_index(apps, schema_editor):
+    """Recreate the search index with the token of the owner (`u` and the zero-padded primary key)."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(SEARCH_TABLE))
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE {} USING '
+                           'fts5(owner, name, host, login, tokenize="trigram")'.format(SEARCH_TABLE))
+        except Exception:
+            # The SQLite library is built without FTS5 or the trigram tokenizer.
+            return
+
+        Entry = apps.get_model('entries', 'Entry')
+        entries = Entry.objects.using(connection.alias).only('pk', 'owner_id', 'name', 'url', 'login')
+        cursor.executemany(
+            'INSERT INTO {} (rowid, owner, name, host, login) VALUES (%s, %s, %s, %s, %s)'.format(SEARCH_TABLE),
+            [(entry.pk, 'u{:012d}'.format(entry.owner_id), entry.name, get_host(entry.url), entry.login)
+             for entry in entries.iterator()]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('entries', '0003_entry_name_url_id_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='entry',
+            name='entries_name_url_id_idx',
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='owner',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='entries', to=settings.AUTH_USER_MODEL, verbose_name='owner'),
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='entry',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='entries', to=settings.AUTH_USER_MODEL, verbose_name='owner'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['owner', 'name', 'url', 'id'], name='entries_owner_name_url_idx'),
+        ),
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
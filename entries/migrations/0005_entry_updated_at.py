@@ -0,0 +1,18 @@
+# Generated by Django 2.1.3 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0004_entry_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated at'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.1.3 on 2026-10-18 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def journal_existing_entries(apps, schema_editor):
+    """Record the existing entries as created, so the first sync returns them."""
+    alias = schema_editor.connection.alias
+    Entry = apps.get_model('entries', 'Entry')
+    EntryChange = apps.get_model('entries', 'EntryChange')
+
+    changes = (EntryChange(owner_id=owner_id, entry_id=pk, action='c')
+               for pk, owner_id in Entry.objects.using(alias).order_by('pk').values_list('pk', 'owner_id'))
+    EntryChange.objects.using(alias).bulk_create(changes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('entries', '0005_entry_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.IntegerField(verbose_name='entry id')),
+                ('action', models.CharField(choices=[('c', 'create'), ('u', 'update'), ('d', 'delete')],
+                                            max_length=1, verbose_name='action')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('owner', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='entry_changes', to=settings.AUTH_USER_MODEL,
+                                            verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'entry change',
+                'verbose_name_plural': 'entry changes',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='entrychange',
+            index=models.Index(fields=['owner', 'id'], name='entries_change_owner_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrychange',
+            index=models.Index(fields=['entry_id', 'id'], name='entries_change_entry_id_idx'),
+        ),
+        migrations.RunPython(journal_existing_entries, migrations.RunPython.noop),
+    ]
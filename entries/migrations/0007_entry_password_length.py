@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0006_entrychange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entry',
+            name='password',
+            field=models.CharField(max_length=400, verbose_name='password'),
+        ),
+    ]
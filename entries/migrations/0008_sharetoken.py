@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0007_entry_password_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShareToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='digest')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='expires at')),
+                ('max_uses', models.PositiveIntegerField(blank=True, null=True, verbose_name='max uses')),
+                ('uses', models.PositiveIntegerField(default=0, verbose_name='uses')),
+                ('revoked_at', models.DateTimeField(blank=True, null=True, verbose_name='revoked at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='share_tokens',
+                                            to='entries.entry', verbose_name='entry')),
+            ],
+            options={
+                'verbose_name': 'share token',
+                'verbose_name_plural': 'share tokens',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0008_sharetoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='fingerprint'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['owner', 'fingerprint'], name='entries_owner_fingerprint_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0009_entry_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='number')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='is snapshot')),
+                ('fields', models.CharField(max_length=50, verbose_name='fields')),
+                ('data', models.TextField(verbose_name='data')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('entry', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='revisions', to='entries.entry', verbose_name='entry')),
+            ],
+            options={
+                'verbose_name': 'entry revision',
+                'verbose_name_plural': 'entry revisions',
+                'ordering': ['-number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='entryrevision',
+            index=models.Index(fields=['entry', 'created_at'], name='entries_revision_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='entryrevision',
+            constraint=models.UniqueConstraint(fields=('entry', 'number'), name='entries_revision_number_uniq'),
+        ),
+    ]
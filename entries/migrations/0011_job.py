@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('entries', '0010_entryrevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('import', 'import'), ('audit', 'audit'),
+                                                   ('rotate', 'key rotation')], max_length=10, verbose_name='kind')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'),
+                                                     ('failed', 'failed'), ('cancelled', 'cancelled')],
+                                            default='pending', max_length=10, verbose_name='status')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='params')),
+                ('payload', models.TextField(blank=True, verbose_name='payload')),
+                ('checkpoint', models.BigIntegerField(default=0, verbose_name='checkpoint')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='progress')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='total')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='result')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='worker')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='started at')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='heartbeat at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'job',
+                'verbose_name_plural': 'jobs',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'id'], name='entries_job_status_idx'),
+        ),
+    ]
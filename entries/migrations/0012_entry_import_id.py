@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='import_id',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, verbose_name='import id'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['owner', 'import_id'], name='entries_owner_import_idx'),
+        ),
+    ]
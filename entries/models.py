@@ -1,8 +1,20 @@
 from django.utils.translation import ugettext_lazy as _
-from django.db.models.signals import pre_save
-from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+from django.db import connections, models, router, transaction
+from django.conf import settings
+import json
 
-from .utils import Crypto
+from .search import index_entries, unindex_entries
+from .cache import invalidate_vault
+from .signals import post_bulk_create
+from .utils import get_crypto, get_fingerprint
+
+# The fields of the entries kept in the revisions (see `EntryRevision`).
+REVISION_FIELDS = ('name', 'url', 'login', 'password')
+REVISION_SNAPSHOT_INTERVAL = 10
+# The first key of the PostgreSQL advisory locks of the journals (see `lock_journal`).
+JOURNAL_LOCK_CLASS = 0x6a726e6c
 
 
 class Entry(models.Model):
@@ -10,6 +22,9 @@ class Entry(models.Model):
     A model represesentation of the single entry that will be stored
     in the database.
 
+    .. py:attribute:: owner
+       The user owning the entry. Every user can access only their entries.
+
     .. py:attribute:: name
        A name that will be used to identify an individual entry.
 
@@ -20,25 +35,399 @@ class Entry(models.Model):
        Login of the entry.
 
     .. py:attribute:: password
-       An encrypted form of the password with a maximum length of 90 characters.
+       An encrypted form of the password (see `entries.utils.Crypto`) with
+       a maximum length of 400 characters.
        NOTE: The real password length is limited to 50 characters.
+
+    .. py:attribute:: fingerprint
+       Keyed fingerprint of the password (see `entries.utils.get_fingerprint`)
+       used to find the reused passwords. Empty until it is backfilled.
+
+    .. py:attribute:: import_id
+       Marker of the import which has created the entry (see
+       `entries.transfer.import_entries`), used to read back the inserted
+       rows and to resume an interrupted import. Empty for the entries
+       created otherwise.
+
+    .. py:attribute:: updated_at
+       Date and time of the last modification of the entry.
     """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                              related_name='entries', verbose_name=_('owner'),
+                              db_index=False)
     name = models.CharField(_('name'), max_length=50)
     url = models.URLField(_('url'), max_length=200)
     login = models.CharField(_('login'), max_length=50)
-    password = models.CharField(_('password'), max_length=90)
+    password = models.CharField(_('password'), max_length=400)
+    fingerprint = models.CharField(_('fingerprint'), max_length=64, blank=True, default='', editable=False)
+    import_id = models.CharField(_('import id'), max_length=32, null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
     class Meta:
         verbose_name = _('entry')
         verbose_name_plural = _('entries')
         ordering = ['name', 'url']
+        indexes = [
+            models.Index(fields=['owner', 'name', 'url', 'id'], name='entries_owner_name_url_idx'),
+            models.Index(fields=['owner', 'fingerprint'], name='entries_owner_fingerprint_idx'),
+            models.Index(fields=['owner', 'import_id'], name='entries_owner_import_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.url})'
 
+    def save(self, *args, **kwargs):
+        # The revision is recorded in the transaction of the save (see `pre_save_track_revision`).
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Entry, instance=self)):
+            super().save(*args, **kwargs)
+
+
+class EntryChange(models.Model):
+    """
+    A model representation of the single record of the change journal.
+    Every creation, modification and deletion of an entry appends a new
+    record, the primary key is used as a monotonically increasing sequence
+    number that allows the clients to fetch only the changes they miss.
+
+    .. py:attribute:: owner
+       The user owning the changed entry.
+
+    .. py:attribute:: entry_id
+       Primary key of the changed entry. It is not a foreign key, so the
+       record outlives the deleted entry as a tombstone.
+
+    .. py:attribute:: action
+       Type of the change (create, update or delete).
+    """
+    CREATE, UPDATE, DELETE = 'c', 'u', 'd'
+    ACTIONS = ((CREATE, _('create')), (UPDATE, _('update')), (DELETE, _('delete')))
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                              related_name='entry_changes', verbose_name=_('owner'),
+                              db_index=False)
+    entry_id = models.IntegerField(_('entry id'))
+    action = models.CharField(_('action'), max_length=1, choices=ACTIONS)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('entry change')
+        verbose_name_plural = _('entry changes')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['owner', 'id'], name='entries_change_owner_id_idx'),
+            models.Index(fields=['entry_id', 'id'], name='entries_change_entry_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_action_display()} #{self.entry_id} ({self.pk})'
+
+
+class EntryRevision(models.Model):
+    """
+    A model representation of the single revision of an entry. A revision
+    holds the new values of the fields changed by a save, every
+    `REVISION_SNAPSHOT_INTERVAL`-th revision holds the values of all fields,
+    so any revision is rebuilt from the nearest snapshot and a few changes.
+
+    .. py:attribute:: entry
+       The revised entry.
+
+    .. py:attribute:: number
+       The sequence number of the revision of the entry, starting from 1.
+
+    .. py:attribute:: is_snapshot
+       Whether the revision holds the values of all fields.
+
+    .. py:attribute:: fields
+       Comma separated names of the fields changed by the revision.
+
+    .. py:attribute:: data
+       The values of the fields as encrypted JSON (see `entries.utils.Crypto`).
+
+    .. py:attribute:: created_at
+       Date and time of the revision.
+    """
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name='revisions',
+                              verbose_name=_('entry'), db_index=False)
+    number = models.PositiveIntegerField(_('number'))
+    is_snapshot = models.BooleanField(_('is snapshot'), default=False)
+    fields = models.CharField(_('fields'), max_length=50)
+    data = models.TextField(_('data'))
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('entry revision')
+        verbose_name_plural = _('entry revisions')
+        ordering = ['-number']
+        constraints = [
+            models.UniqueConstraint(fields=['entry', 'number'], name='entries_revision_number_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['entry', 'created_at'], name='entries_revision_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.entry_id} revision {self.number}'
+
+    def get_fields(self) -> list:
+        return self.fields.split(',') if self.fields else []
+
+
+class ShareToken(models.Model):
+    """
+    A model representation of the link sharing a single entry. The link
+    carries a random token; only its HMAC digest is stored, so the links
+    cannot be recovered from the database.
+
+    .. py:attribute:: entry
+       The shared entry.
+
+    .. py:attribute:: digest
+       HMAC-SHA256 of the token (see `entries.sharing.get_token_digest`).
+       The token is validated by a single lookup of its unique digest.
+
+    .. py:attribute:: expires_at
+       Date and time the link expires at.
+
+    .. py:attribute:: max_uses
+       The number of times the password can be revealed through the link
+       (unlimited when empty).
+
+    .. py:attribute:: uses
+       The number of times the password has been revealed.
+
+    .. py:attribute:: revoked_at
+       Date and time the link has been revoked at by the owner of the entry.
+    """
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name='share_tokens',
+                              verbose_name=_('entry'))
+    digest = models.CharField(_('digest'), max_length=64, unique=True)
+    expires_at = models.DateTimeField(_('expires at'), db_index=True)
+    max_uses = models.PositiveIntegerField(_('max uses'), null=True, blank=True)
+    uses = models.PositiveIntegerField(_('uses'), default=0)
+    revoked_at = models.DateTimeField(_('revoked at'), null=True, blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('share token')
+        verbose_name_plural = _('share tokens')
+        ordering = ['-id']
+
+    def __str__(self):
+        return f'{self.entry_id} ({self.expires_at})'
+
+
+class Job(models.Model):
+    """
+    A model representation of the background job run by the `run_jobs`
+    worker command (see `entries.jobs`). The job is executed in chunks; the
+    progress is saved after every chunk, so an interrupted job is resumed
+    from its checkpoint.
+
+    .. py:attribute:: owner
+       The user who has started the job (empty for the jobs started by the
+       administrators, such as the key rotation).
+
+    .. py:attribute:: kind
+       Type of the job (import, audit or key rotation).
+
+    .. py:attribute:: status
+       State of the job (pending, running, done, failed or cancelled).
+
+    .. py:attribute:: params
+       Parameters of the job.
+
+    .. py:attribute:: payload
+       Encrypted input data of the job (e.g. the imported file). Cleared
+       when the job finishes.
+
+    .. py:attribute:: checkpoint
+       Position the job is resumed from (e.g. the last processed entry).
+
+    .. py:attribute:: progress
+       Number of the processed items out of `total`.
+
+    .. py:attribute:: result
+       Result of the job (e.g. the entries with the breached passwords).
+
+    .. py:attribute:: heartbeat_at
+       Date and time the worker has last reported the progress at. Running
+       jobs without a recent heartbeat are taken over by another worker.
+    """
+    IMPORT, AUDIT, ROTATE = 'import', 'audit', 'rotate'
+    KINDS = ((IMPORT, _('import')), (AUDIT, _('audit')), (ROTATE, _('key rotation')))
+    PENDING, RUNNING, DONE, FAILED, CANCELLED = 'pending', 'running', 'done', 'failed', 'cancelled'
+    STATUSES = ((PENDING, _('pending')), (RUNNING, _('running')), (DONE, _('done')),
+                (FAILED, _('failed')), (CANCELLED, _('cancelled')))
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='jobs',
+                              verbose_name=_('owner'), null=True, blank=True)
+    kind = models.CharField(_('kind'), max_length=10, choices=KINDS)
+    status = models.CharField(_('status'), max_length=10, choices=STATUSES, default=PENDING)
+    params = models.JSONField(_('params'), default=dict, blank=True)
+    payload = models.TextField(_('payload'), blank=True)
+    checkpoint = models.BigIntegerField(_('checkpoint'), default=0)
+    progress = models.PositiveIntegerField(_('progress'), default=0)
+    total = models.PositiveIntegerField(_('total'), null=True, blank=True)
+    result = models.JSONField(_('result'), default=dict, blank=True)
+    error = models.TextField(_('error'), blank=True)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    worker = models.CharField(_('worker'), max_length=100, blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    started_at = models.DateTimeField(_('started at'), null=True, blank=True)
+    heartbeat_at = models.DateTimeField(_('heartbeat at'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('finished at'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('job')
+        verbose_name_plural = _('jobs')
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='entries_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.pk} ({self.status})'
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.FINISHED
+
+
+def pre_save_track_revision(sender, instance, using, *args, **kwargs):
+    """
+    Remember the fields changed by the save (with the password in clear,
+    so the handler runs before the password is encrypted). The password
+    is compared by its fingerprint, so the old one is not decrypted. The
+    row of the entry is locked until the end of the transaction of the save,
+    so the concurrent saves of an entry number their revisions one after
+    another (SQLite allows a single writer at once, the later save fails
+    with the database locked and is rolled back as a whole).
+    """
+    values = {field: getattr(instance, field) for field in REVISION_FIELDS}
+    previous = None
+    if instance.pk is not None:
+        previous = Entry.objects.using(using).select_for_update().filter(pk=instance.pk) \
+            .values(*REVISION_FIELDS, 'fingerprint', 'updated_at').first()
+
+    if previous is None:
+        changed = list(REVISION_FIELDS)
+    else:
+        changed = [field for field in REVISION_FIELDS[:-1] if values[field] != previous[field]]
+        if get_fingerprint(instance.owner_id, instance.password) != previous['fingerprint']:
+            changed.append('password')
+    instance._revision = (previous, changed, values) if changed else None
+
 
 def pre_save_encrypt_password(sender, instance, *args, **kwargs):
-    instance.password = Crypto().encrypt(instance.password)
+    instance.fingerprint = get_fingerprint(instance.owner_id, instance.password)
+    instance.password = get_crypto().encrypt(instance.password)
+
+
+def post_save_record_revision(sender, instance, using, *args, **kwargs):
+    """
+    Record the revision of the saved entry. The first revision of an entry
+    saved before the history was introduced is preceded by a snapshot of
+    its previous state.
+    """
+    revision, instance._revision = getattr(instance, '_revision', None), None
+    if revision is None:
+        return
+    previous, changed, values = revision
+
+    crypto = get_crypto()
+    last = EntryRevision.objects.using(using).filter(entry_id=instance.pk).order_by('-number') \
+        .values_list('number', flat=True).first() or 0
+    revisions = []
+    if not last and previous is not None:
+        state = {field: previous[field] for field in REVISION_FIELDS}
+        state['password'] = crypto.decrypt(state['password'])
+        revisions.append(EntryRevision(entry=instance, number=1, is_snapshot=True, fields=','.join(REVISION_FIELDS),
+                                       data=crypto.encrypt(json.dumps(state)), created_at=previous['updated_at']))
+        last = 1
+
+    number = last + 1
+    is_snapshot = (number - 1) % REVISION_SNAPSHOT_INTERVAL == 0
+    data = values if is_snapshot else {field: values[field] for field in changed}
+    revisions.append(EntryRevision(entry=instance, number=number, is_snapshot=is_snapshot, fields=','.join(changed),
+                                   data=crypto.encrypt(json.dumps(data))))
+    EntryRevision.objects.using(using).bulk_create(revisions)
+
+
+def post_save_index_entry(sender, instance, using, *args, **kwargs):
+    index_entries([instance], using)
+
+
+def post_delete_unindex_entry(sender, instance, using, *args, **kwargs):
+    unindex_entries([instance.pk], using)
+
+
+def post_bulk_create_index_entries(sender, instances, using, *args, **kwargs):
+    index_entries(instances, using)
+
+
+def lock_journal(owner_ids, using: str) -> None:
+    """
+    Lock the journals of the given owners until the end of the transaction.
+    The sequence numbers of the journal records come from the autoincrement
+    primary key, which on PostgreSQL is assigned when the row is inserted,
+    not when it is committed. Without the lock a record with a lower number
+    might be committed after a client has already synced past a higher one
+    and would never be read. With the lock the records of an owner are
+    numbered in the order of their commits. SQLite allows a single writer
+    at once, so it needs no lock.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # Sorted, so two transactions never wait for each other's locks.
+        for owner_id in sorted(set(owner_ids)):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [JOURNAL_LOCK_CLASS, owner_id])
+
+
+def post_save_journal_change(sender, instance, created, using, *args, **kwargs):
+    action = EntryChange.CREATE if created else EntryChange.UPDATE
+    with transaction.atomic(using=using):
+        lock_journal([instance.owner_id], using)
+        EntryChange.objects.using(using).create(owner_id=instance.owner_id, entry_id=instance.pk, action=action)
+
+
+def post_delete_journal_change(sender, instance, using, *args, **kwargs):
+    with transaction.atomic(using=using):
+        lock_journal([instance.owner_id], using)
+        EntryChange.objects.using(using).create(owner_id=instance.owner_id, entry_id=instance.pk,
+                                                action=EntryChange.DELETE)
+
+
+def post_bulk_create_journal_changes(sender, instances, using, *args, **kwargs):
+    with transaction.atomic(using=using):
+        lock_journal([entry.owner_id for entry in instances], using)
+        EntryChange.objects.using(using).bulk_create([
+            EntryChange(owner_id=entry.owner_id, entry_id=entry.pk, action=EntryChange.CREATE)
+            for entry in instances
+        ])
+
+
+def post_change_invalidate_vault(sender, instance, *args, **kwargs):
+    invalidate_vault(instance.owner_id)
+
+
+def post_bulk_create_invalidate_vault(sender, instances, *args, **kwargs):
+    for owner_id in {entry.owner_id for entry in instances}:
+        invalidate_vault(owner_id)
 
 
+pre_save.connect(pre_save_track_revision, sender=Entry)
 pre_save.connect(pre_save_encrypt_password, sender=Entry)
+post_save.connect(post_save_record_revision, sender=Entry)
+post_save.connect(post_save_index_entry, sender=Entry)
+post_delete.connect(post_delete_unindex_entry, sender=Entry)
+post_bulk_create.connect(post_bulk_create_index_entries, sender=Entry)
+post_save.connect(post_save_journal_change, sender=Entry)
+post_delete.connect(post_delete_journal_change, sender=Entry)
+post_bulk_create.connect(post_bulk_create_journal_changes, sender=Entry)
+post_save.connect(post_change_invalidate_vault, sender=Entry)
+post_delete.connect(post_change_invalidate_vault, sender=Entry)
+post_bulk_create.connect(post_bulk_create_invalidate_vault, sender=Entry)
@@ -0,0 +1,124 @@
+from django.utils.functional import cached_property
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'entries.paginator.cursor'
+
+
+class InvalidCursor(Exception):
+    """Raised when the given cursor is malformed or was tampered with."""
+
+
+class CursorPage(object):
+    """A single page of the cursor paginator."""
+
+    def __init__(self, object_list: list, paginator: 'CursorPaginator',
+                 next_cursor: str = None, previous_cursor: str = None) -> None:
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self) -> str:
+        return '<Page of {} objects>'.format(len(self.object_list))
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(object):
+    """
+    A keyset (cursor) paginator. Instead of `OFFSET n` it filters the rows
+    placed after (or before) the boundary row of the current page using the
+    ordering of the queryset, so every page costs a single index range scan
+    no matter how deep it is. The ordering is made unique by appending the
+    primary key as a tiebreaker. The pages are addressed with opaque, signed
+    cursors and the total count of the objects is computed only on demand.
+    """
+
+    def __init__(self, queryset, per_page: int) -> None:
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering.append('pk')
+        self.ordering = ordering
+
+    @cached_property
+    def count(self) -> int:
+        return self.queryset.count()
+
+    def encode_cursor(self, obj, forward: bool) -> str:
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        return signing.dumps([forward, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        try:
+            forward, values = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor.')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor('Invalid cursor.')
+        return bool(forward), values
+
+    def _keyset_filter(self, values: list, forward: bool) -> Q:
+        """
+        Build the `(a > x) OR (a = x AND b > y) OR ...` condition selecting
+        the rows after (or before) the row with the given ordering values.
+        The redundant `a >= x` bound lets the database use an index range scan.
+        """
+        condition, equal, bound = Q(), Q(), Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            ascending = forward != field.startswith('-')
+            condition |= equal & Q(**{'{}__{}'.format(name, 'gt' if ascending else 'lt'): value})
+            if not bound:
+                bound = Q(**{'{}__{}'.format(name, 'gte' if ascending else 'lte'): value})
+            equal &= Q(**{name: value})
+        return bound & condition
+
+    def page(self, cursor: str = None) -> CursorPage:
+        """Return the page pointed by the given cursor, the first one by default."""
+        forward, queryset = True, self.queryset
+        if cursor:
+            forward, values = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._keyset_filter(values, forward))
+
+        if forward:
+            ordering = self.ordering
+        else:
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in self.ordering]
+
+        object_list = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if not forward:
+            object_list.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(object_list[-1], True)
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(object_list[0], False)
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
@@ -0,0 +1,57 @@
+from django.db.models import Count
+from django.db import transaction
+from collections import OrderedDict
+
+from .utils import get_crypto, get_fingerprint
+from .models import Entry
+
+BATCH_SIZE = 500
+
+
+def backfill_fingerprints(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Fill in the fingerprints of the entries saved before the fingerprints
+    were introduced. The entries are read in batches of `batch_size` ordered
+    by the primary key and their passwords are decrypted a batch at a time.
+    An entry is updated only when its password has not changed concurrently.
+    Returns the number of the filled in fingerprints.
+    """
+    crypto = get_crypto()
+    last_pk = 0
+    filled = 0
+
+    while True:
+        batch = list(Entry.objects.filter(pk__gt=last_pk, fingerprint='').order_by('pk')
+                     .values_list('pk', 'owner_id', 'password')[:batch_size])
+        if not batch:
+            return filled
+        last_pk = batch[-1][0]
+
+        passwords = crypto.decrypt_many(password for _pk, _owner_id, password in batch)
+        with transaction.atomic():
+            for (pk, owner_id, password), plaintext in zip(batch, passwords):
+                # `update` skips the `pre_save` signal and the modification time.
+                filled += Entry.objects.filter(pk=pk, password=password) \
+                    .update(fingerprint=get_fingerprint(owner_id, plaintext))
+
+
+def find_reused_passwords(owner) -> list:
+    """
+    Return the groups of the entries of the owner sharing the same password.
+    The reused fingerprints are found with a single `GROUP BY` query, no
+    password is decrypted.
+    """
+    reused = Entry.objects.filter(owner=owner).exclude(fingerprint='').order_by() \
+        .values('fingerprint').annotate(count=Count('pk')).filter(count__gt=1).values('fingerprint')
+    groups = OrderedDict()
+    for entry in Entry.objects.filter(owner=owner, fingerprint__in=reused).defer('password') \
+            .order_by('fingerprint', 'name', 'url'):
+        groups.setdefault(entry.fingerprint, []).append(entry)
+    return list(groups.values())
+
+
+def get_reuse_count(entry: Entry) -> int:
+    """Return the number of the other entries of the owner with the same password."""
+    if not entry.fingerprint:
+        return 0
+    return Entry.objects.filter(owner_id=entry.owner_id, fingerprint=entry.fingerprint).exclude(pk=entry.pk).count()
@@ -0,0 +1,77 @@
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.conf import settings
+import datetime
+import json
+
+from .models import Entry, EntryRevision
+from .utils import get_crypto
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def get_revision_state(revision: EntryRevision) -> dict:
+    """
+    Return the values of the fields of the entry as of the given revision.
+    The state is rebuilt from the nearest snapshot followed by the changes
+    up to the revision, all found using the (entry, number) index.
+    """
+    snapshot = EntryRevision.objects.filter(entry_id=revision.entry_id, is_snapshot=True,
+                                            number__lte=revision.number).order_by('-number').first()
+    if snapshot is None:
+        raise EntryRevision.DoesNotExist('The snapshot of the revision has been pruned.')
+    changes = EntryRevision.objects.filter(entry_id=revision.entry_id, number__gt=snapshot.number,
+                                           number__lte=revision.number).order_by('number')
+
+    state = {}
+    for data in get_crypto().decrypt_many(revision.data for revision in [snapshot, *changes]):
+        state.update(json.loads(data))
+    return state
+
+
+def get_revision_at(entry: Entry, moment: datetime.datetime):
+    """Return the revision of the entry current at the given moment or `None`."""
+    return entry.revisions.filter(created_at__lte=moment).order_by('-created_at', '-number').first()
+
+
+def restore_revision(revision: EntryRevision) -> Entry:
+    """Restore the entry to the state of the revision. The restore is recorded as a new revision."""
+    entry = revision.entry
+    for field, value in get_revision_state(revision).items():
+        setattr(entry, field, value)
+    entry.save()
+    return entry
+
+
+def prune_revisions(max_count: int = None, max_age: int = None, batch_size: int = PRUNE_BATCH_SIZE) -> int:
+    """
+    Remove the revisions beyond the `max_count` latest revisions of every
+    entry or older than `max_age` days (the `REVISION_MAX_COUNT` and the
+    `REVISION_MAX_AGE` settings by default). The latest revision is always
+    kept and the revisions are removed only up to a snapshot, so every kept
+    revision can still be rebuilt. The entries are processed in batches of
+    `batch_size`. Returns the number of removed revisions.
+    """
+    max_count = settings.REVISION_MAX_COUNT if max_count is None else max_count
+    max_age = settings.REVISION_MAX_AGE if max_age is None else max_age
+    recent_since = timezone.now() - datetime.timedelta(days=max_age)
+    removed = 0
+    last_entry_id = 0
+
+    while True:
+        batch = list(EntryRevision.objects.filter(entry_id__gt=last_entry_id).order_by('entry_id')
+                     .values('entry_id').annotate(first=Min('number'), last=Max('number'),
+                                                  recent=Min('number', filter=Q(created_at__gte=recent_since)))
+                     [:batch_size])
+        if not batch:
+            return removed
+        last_entry_id = batch[-1]['entry_id']
+
+        for row in batch:
+            keep_from = max(row['last'] - max_count + 1, row['recent'] or row['last'])
+            if keep_from <= row['first']:
+                continue
+            snapshot = EntryRevision.objects.filter(entry_id=row['entry_id'], is_snapshot=True, number__lte=keep_from) \
+                .order_by('-number').values_list('number', flat=True).first()
+            if snapshot is not None and snapshot > row['first']:
+                removed += EntryRevision.objects.filter(entry_id=row['entry_id'], number__lt=snapshot).delete()[0]
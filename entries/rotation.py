@@ -0,0 +1,60 @@
+from django.db import transaction
+
+from .utils import get_crypto
+from .models import Entry, EntryRevision, Job
+
+BATCH_SIZE = 500
+
+
+def rotate_passwords(start_after: int = 0, batch_size: int = BATCH_SIZE):
+    """
+    Re-encrypt the passwords not encrypted with the primary key of the
+    keyring yet. The entries are read in batches of `batch_size` entries
+    ordered by the primary key, starting after the `start_after` primary
+    key, so only a single batch is kept in memory. Every batch is written
+    in its own short transaction and an entry is updated only when its
+    password has not changed concurrently. The revisions of the entries of
+    a batch are re-encrypted along with them. Yields the last primary key of
+    every batch along with the number of re-encrypted passwords, so the
+    rotation can be checkpointed and resumed later.
+    """
+    crypto = get_crypto()
+    last_pk = start_after
+
+    while True:
+        batch = list(Entry.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', 'password')[:batch_size])
+        if not batch:
+            return
+        first_pk, last_pk = last_pk, batch[-1][0]
+        revisions = EntryRevision.objects.filter(entry_id__gt=first_pk, entry_id__lte=last_pk) \
+            .values_list('pk', 'data')
+
+        rotated = 0
+        with transaction.atomic():
+            for pk, password in batch:
+                if crypto.needs_rotation(password):
+                    # `update` skips the `pre_save` signal and the modification time.
+                    rotated += Entry.objects.filter(pk=pk, password=password) \
+                        .update(password=crypto.rotate(password))
+            for pk, data in revisions.iterator():
+                if crypto.needs_rotation(data):
+                    EntryRevision.objects.filter(pk=pk).update(data=crypto.rotate(data))
+        yield last_pk, rotated
+
+
+def rotate_payloads() -> int:
+    """
+    Re-encrypt the payloads of the unfinished jobs (the files queued for the
+    import) not encrypted with the primary key of the keyring yet, so the
+    old key can be retired with the jobs still queued. A payload is updated
+    only when it has not changed concurrently. Returns the number of the
+    re-encrypted payloads.
+    """
+    crypto = get_crypto()
+    rotated = 0
+    jobs = Job.objects.exclude(status__in=Job.FINISHED).exclude(payload='').values_list('pk', 'payload')
+    for pk, payload in jobs.iterator():
+        if crypto.needs_rotation(payload):
+            rotated += Job.objects.filter(pk=pk, payload=payload).update(payload=crypto.rotate(payload))
+    return rotated
@@ -0,0 +1,134 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from urllib.parse import urlsplit
+import re
+
+SEARCH_TABLE = 'entries_entry_search'
+MIN_TERM_LENGTH = 3
+
+_available = {}
+
+
+def is_available(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    Return whether the search index exists in the given database. The index
+    is the FTS5 table created by the migrations, only on SQLite with the
+    trigram tokenizer available (SQLite 3.34+), in other cases the search
+    falls back to a plain scan. The trigram tokenizer allows to match any
+    substring of at least three characters, the same way as the
+    `LIKE '%q%'` scan does. The `owner` column holds a fixed-width token of
+    the owner, so the lookup is narrowed down to the entries of a single
+    user by the index.
+    """
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (
+            connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available[using]
+
+
+def get_owner_token(owner_id: int) -> str:
+    """Return the token of the owner stored in the search index."""
+    return 'u{:012d}'.format(owner_id)
+
+
+def get_host(url: str) -> str:
+    """Return the host part of the given URL."""
+    try:
+        return urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+
+
+def index_entries(entries, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Add or replace the given entries in the search index."""
+    if not is_available(using):
+        return
+
+    rows = [(entry.pk, get_owner_token(entry.owner_id), entry.name, get_host(entry.url), entry.login)
+            for entry in entries]
+    if not rows:
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(SEARCH_TABLE),
+                           [(row[0],) for row in rows])
+        cursor.executemany('INSERT INTO {} (rowid, owner, name, host, login) VALUES (%s, %s, %s, %s, %s)'
+                           .format(SEARCH_TABLE), rows)
+
+
+def unindex_entries(pks, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Remove the entries with the given primary keys from the search index."""
+    if not is_available(using):
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(SEARCH_TABLE),
+                           [(pk,) for pk in pks])
+
+
+def rebuild_index(queryset, batch_size: int = 1000) -> int:
+    """
+    Rebuild the search index from scratch using the entries from the given
+    queryset. Returns the number of indexed entries.
+    """
+    using = queryset.db
+    if not is_available(using):
+        return 0
+
+    with connections[using].cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(SEARCH_TABLE))
+
+    indexed, batch = 0, []
+    for entry in queryset.only('pk', 'owner_id', 'name', 'url', 'login').iterator(chunk_size=batch_size):
+        batch.append(entry)
+        if len(batch) == batch_size:
+            index_entries(batch, using)
+            indexed, batch = indexed + len(batch), []
+    index_entries(batch, using)
+    return indexed + len(batch)
+
+
+def search_entries(queryset, query: str, owner_id: int = None):
+    """
+    Filter the given queryset using the search query. Every term of the
+    query has to match a part of the name, URL host or login of the entry.
+    Terms long enough to use the index are looked up in the FTS table,
+    shorter terms are matched with a scan of the already narrowed queryset.
+    When the `owner_id` is given, the index lookup is limited to the entries
+    of that user. The results keep the ordering of the queryset: the BM25
+    rank depends on the statistics of the whole index, which change with
+    the entries of all users, so it cannot be a part of the keys of the
+    cursors the results are paginated with.
+    """
+    terms = [term for term in re.split(r'\s+', query) if term]
+    if not terms:
+        return queryset
+
+    indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    scanned = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    if not is_available(queryset.db):
+        indexed, scanned = [], terms
+
+    for term in scanned:
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(url__icontains=term) | Q(login__icontains=term)
+        )
+    if not indexed:
+        return queryset
+
+    match = '{{name host login}} : ({})'.format(
+        ' '.join('"{}"'.format(term.replace('"', '""')) for term in indexed)
+    )
+    if owner_id is not None:
+        match = 'owner : "{}" AND {}'.format(get_owner_token(owner_id), match)
+    table = queryset.model._meta.db_table
+    # The entries are joined with the rows matched by a single FTS query.
+    # `extra` is used, because the ORM has no way to join a table without
+    # a relation.
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=['{0}.rowid = "{1}"."id"'.format(SEARCH_TABLE, table), '{} MATCH %s'.format(SEARCH_TABLE)],
+        params=[match]
+    )
@@ -0,0 +1,187 @@
+from django.db.models import F, Q
+from django.utils.crypto import salted_hmac
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.conf import settings
+from manager.metrics import share_links_created
+from manager.routers import use_primary
+import datetime
+import secrets
+import hmac
+import re
+
+from .cache import get_vault_version, is_cache_shared
+from .models import Entry, ShareToken
+
+TOKEN_BYTES = 32
+TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+TOKEN_KEY = 'entries:share:{digest}'
+ENTRY_KEY = 'entries:shared:{owner_id}:{version}:{entry_id}'
+PURGE_BATCH_SIZE = 1000
+
+
+class InvalidShareToken(Exception):
+    """
+    Raised when the share token cannot be used. The `reason` is one of
+    `invalid`, `expired`, `revoked` or `exhausted`.
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+def get_token_digest(token: str) -> str:
+    """Return the HMAC-SHA256 digest the token is stored and looked up by."""
+    return salted_hmac(settings.SHARE_SECRET_SALT, token, algorithm='sha256').hexdigest()
+
+
+def create_share_token(entry: Entry, ttl: int = None, max_uses: int = None) -> tuple:
+    """
+    Create a token sharing the entry for `ttl` seconds (`SHARE_LINK_TTL`
+    by default) and at most `max_uses` reveals of the password (unlimited
+    by default). Returns the token and the `ShareToken` storing its digest;
+    the token itself is not stored anywhere.
+    """
+    ttl = settings.SHARE_LINK_TTL if ttl is None else ttl
+    token = secrets.token_urlsafe(TOKEN_BYTES)
+    share = ShareToken.objects.create(entry=entry, digest=get_token_digest(token), max_uses=max_uses,
+                                      expires_at=timezone.now() + datetime.timedelta(seconds=ttl))
+    share_links_created.inc()
+    return token, share
+
+
+def get_active_share_tokens(entry: Entry):
+    """Return the share tokens of the entry which are neither expired, revoked nor used up."""
+    return entry.share_tokens.filter(Q(max_uses__isnull=True) | Q(uses__lt=F('max_uses')),
+                                     expires_at__gt=timezone.now(), revoked_at__isnull=True)
+
+
+def _forget_share_token(digest: str) -> None:
+    key = TOKEN_KEY.format(digest=digest)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _get_share_token(digest: str):
+    """
+    Return the state of the share token with the digest or `None`. The state
+    is cached only when the cache is shared by all the processes, otherwise
+    a revoke would not be seen by the other processes.
+    """
+    key = TOKEN_KEY.format(digest=digest)
+    shared = is_cache_shared()
+    state = cache.get(key) if shared else None
+    if state is None:
+        share = ShareToken.objects.filter(digest=digest).select_related('entry').first()
+        if share is None:
+            return None
+        state = {
+            'pk': share.pk, 'digest': share.digest, 'entry_id': share.entry_id,
+            'owner_id': share.entry.owner_id, 'expires_at': share.expires_at,
+            'max_uses': share.max_uses, 'uses': share.uses, 'revoked': share.revoked_at is not None,
+        }
+        timeout = int((share.expires_at - timezone.now()).total_seconds())
+        if shared and timeout > 0:
+            cache.set(key, state, min(timeout, settings.CACHES['default'].get('TIMEOUT') or timeout))
+    return state
+
+
+def _get_shared_entry(state: dict):
+    """
+    Return the shared entry, cached until the vault of its owner changes. The
+    entry is cached only when the cache (and so the version of the vault) is
+    shared by all the processes.
+    """
+    if not is_cache_shared():
+        entry = Entry.objects.filter(pk=state['entry_id']).first()
+        if entry is None:
+            # The token has been read from the primary database, a replica may not have the entry yet.
+            with use_primary():
+                entry = Entry.objects.filter(pk=state['entry_id']).first()
+        return entry
+
+    key = ENTRY_KEY.format(owner_id=state['owner_id'], version=get_vault_version(state['owner_id']),
+                           entry_id=state['entry_id'])
+    entry = cache.get(key)
+    if entry is None:
+        with use_primary():
+            entry = Entry.objects.filter(pk=state['entry_id']).first()
+        if entry is not None:
+            cache.set(key, entry)
+    return entry
+
+
+def _use_share_token(state: dict) -> None:
+    """
+    Count a reveal of the password with a conditional update of the token,
+    which also checks the token in the database, so a token revoked, expired
+    or used up in the meantime is never used, whatever the cached state says.
+    """
+    now = timezone.now()
+    used = ShareToken.objects.filter(Q(max_uses__isnull=True) | Q(uses__lt=F('max_uses')), pk=state['pk'],
+                                     expires_at__gt=now, revoked_at__isnull=True).update(uses=F('uses') + 1)
+    if state['max_uses'] is not None or not used:
+        # The cached state is stale afterwards.
+        _forget_share_token(state['digest'])
+    if not used:
+        share = ShareToken.objects.filter(pk=state['pk']).first()
+        if share is None:
+            raise InvalidShareToken('invalid')
+        if share.revoked_at is not None:
+            raise InvalidShareToken('revoked')
+        if share.expires_at <= now:
+            raise InvalidShareToken('expired')
+        raise InvalidShareToken('exhausted')
+
+
+def resolve_share_token(token: str, use: bool = False) -> Entry:
+    """
+    Return the entry shared by the token or raise `InvalidShareToken`.
+    The token is looked up by its digest in the cache (when it is shared by
+    all the processes) and, on a miss, with a single query of the unique
+    index. When `use` is set, a reveal of the password is counted with a
+    conditional update checking the token in the database, so a revoked
+    token is never used and a limited token cannot be used more than allowed.
+    """
+    if not TOKEN_PATTERN.match(token):
+        raise InvalidShareToken('invalid')
+    digest = get_token_digest(token)
+    state = _get_share_token(digest)
+    if state is None or not hmac.compare_digest(state['digest'], digest):
+        raise InvalidShareToken('invalid')
+    if state['revoked']:
+        raise InvalidShareToken('revoked')
+    if state['expires_at'] <= timezone.now():
+        raise InvalidShareToken('expired')
+    if state['max_uses'] is not None and state['uses'] >= state['max_uses']:
+        raise InvalidShareToken('exhausted')
+    if use:
+        _use_share_token(state)
+
+    entry = _get_shared_entry(state)
+    if entry is None:
+        raise InvalidShareToken('invalid')
+    return entry
+
+
+def revoke_share_token(share: ShareToken) -> None:
+    """Revoke the share token, the link stops working immediately."""
+    ShareToken.objects.filter(pk=share.pk, revoked_at__isnull=True).update(revoked_at=timezone.now())
+    _forget_share_token(share.digest)
+
+
+def purge_share_tokens(batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """
+    Remove the share tokens which are expired, revoked or used up, in batches
+    of `batch_size` tokens, so the table is never locked for long. Returns
+    the number of removed tokens.
+    """
+    dead = Q(expires_at__lte=timezone.now()) | Q(revoked_at__isnull=False) | Q(uses__gte=F('max_uses'))
+    removed = 0
+    while True:
+        batch = list(ShareToken.objects.filter(dead).order_by().values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return removed
+        removed += ShareToken.objects.filter(pk__in=batch).delete()[0]
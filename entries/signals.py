@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after the entries have been inserted with `bulk_create`, which does not
+# send the `pre_save` and `post_save` signals. Provides the `instances` argument
+# with the list of the created entries (with the primary keys set).
+post_bulk_create = Signal()
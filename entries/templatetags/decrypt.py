@@ -1,6 +1,6 @@
 from django import template
 
-from entries.utils import Crypto
+from entries.utils import get_crypto
 
 register = template.Library()
 
@@ -8,4 +8,4 @@ register = template.Library()
 @register.filter(name='decrypt')
 def decrypt(password):
     """Template tag that provides decryption of the given password."""
-    return Crypto().decrypt(password)
+    return get_crypto().decrypt(password)
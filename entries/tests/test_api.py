@@ -0,0 +1,209 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+import tempfile
+import shutil
+import json
+
+from entries.utils import get_crypto
+from entries.models import Entry
+
+
+class ApiTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+
+class EntryApiListViewTest(ApiTestCase):
+    """The tests for the entries API list view."""
+
+    def test_not_logged_user(self):
+        self.client.logout()
+        response = self.client.get(reverse('entries:api-list'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_list(self):
+        Entry.objects.create(owner=User.objects.create_user(username='morty'), name='google',
+                             url='https://google.com', login='morty', password='password')
+        response = self.client.get(reverse('entries:api-list'))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([entry['name'] for entry in data['results']], ['facebook'])
+        self.assertEqual(data['results'][0]['password'], 'password')
+        self.assertIsNone(data['next'])
+
+    def test_list_not_modified(self):
+        response = self.client.get(reverse('entries:api-list'))
+        etag = response['ETag']
+
+        # The session and the user are read, the ETag takes a single query.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('entries:api-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.entry.login = 'morty'
+        self.entry.save()
+        response = self.client.get(reverse('entries:api-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.entry.delete()
+        response = self.client.get(reverse('entries:api-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_not_modified_shared_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}):
+            etag = self.client.get(reverse('entries:api-list'))['ETag']
+            # The ETag is computed from the cached version of the vault.
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('entries:api-list'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com', login='rik',
+                                 password='password')
+            response = self.client.get(reverse('entries:api-list'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_list_changed_by_other_process(self):
+        # The first process keeps its version of the vault, the other one changes the entry.
+        locmem = 'django.core.cache.backends.locmem.LocMemCache'
+        with self.settings(CACHES={'default': {'BACKEND': locmem, 'LOCATION': 'first'}}):
+            etag = self.client.get(reverse('entries:api-list'))['ETag']
+        with self.settings(CACHES={'default': {'BACKEND': locmem, 'LOCATION': 'second'}}):
+            Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com', login='rik',
+                                 password='password')
+        with self.settings(CACHES={'default': {'BACKEND': locmem, 'LOCATION': 'first'}}):
+            response = self.client.get(reverse('entries:api-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_depends_on_query(self):
+        etag = self.client.get(reverse('entries:api-list'))['ETag']
+        response = self.client.get(reverse('entries:api-list'), {'q': 'face'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_create(self):
+        response = self.send('post', reverse('entries:api-list'), {
+            'name': 'amazon', 'url': 'https://amazon.com', 'login': 'rik', 'password': 'secret'
+        })
+        entry = Entry.objects.get(name='amazon')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Location'], reverse('entries:api-detail', args=[entry.pk]))
+        self.assertEqual(response.json()['password'], 'secret')
+        self.assertEqual(entry.owner, self.user)
+        self.assertEqual(get_crypto().decrypt(entry.password), 'secret')
+
+    def test_create_invalid(self):
+        response = self.send('post', reverse('entries:api-list'), {
+            'name': 'amazon', 'url': 'asdf', 'login': 'rik', 'password': 'x' * 51
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'url', 'password'})
+
+    def test_create_malformed(self):
+        response = self.client.post(reverse('entries:api-list'), 'asdf', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class EntryApiDetailViewTest(ApiTestCase):
+    """The tests for the entry API detail view."""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('entries:api-detail', args=[self.entry.pk])
+
+    def test_detail(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['password'], 'password')
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_detail_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_other_user(self):
+        entry = Entry.objects.create(owner=User.objects.create_user(username='morty'), name='google',
+                                     url='https://google.com', login='morty', password='password')
+        response = self.client.get(reverse('entries:api-detail', args=[entry.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_update(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.send('put', self.url, {
+            'name': 'google', 'url': 'https://google.com', 'login': 'rik', 'password': 'secret'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(get_crypto().decrypt(Entry.objects.get(pk=self.entry.pk).password), 'secret')
+
+    def test_patch(self):
+        response = self.send('patch', self.url, {'login': 'morty'})
+        entry = Entry.objects.get(pk=self.entry.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(entry.login, 'morty')
+        self.assertEqual(get_crypto().decrypt(entry.password), 'password')
+
+    def test_update_precondition_failed(self):
+        response = self.client.put(self.url, json.dumps({'login': 'morty'}), content_type='application/json',
+                                   HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 412)
+
+    def test_delete(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Entry.objects.filter(pk=self.entry.pk).exists())
+
+
+class EntryApiShareViewTest(ApiTestCase):
+    """The tests for the entry API share views."""
+
+    def test_share(self):
+        response = self.client.post(reverse('entries:api-share', args=[self.entry.pk]))
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.json()['max_uses'])
+
+        self.client.logout()
+        response = self.client.get(response.json()['link'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'facebook')
+
+    def test_share_options(self):
+        response = self.client.post(reverse('entries:api-share', args=[self.entry.pk]),
+                                    json.dumps({'expires_in': 3600, 'max_uses': 1}), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['max_uses'], 1)
+
+        response = self.client.post(reverse('entries:api-share', args=[self.entry.pk]),
+                                    json.dumps({'max_uses': 0}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('max_uses', response.json()['errors'])
+
+    def test_list_and_revoke(self):
+        share = self.client.post(reverse('entries:api-share', args=[self.entry.pk])).json()
+        response = self.client.get(reverse('entries:api-share', args=[self.entry.pk]))
+        self.assertEqual([result['id'] for result in response.json()['results']], [share['id']])
+
+        response = self.client.delete(reverse('entries:api-share-detail', args=[self.entry.pk, share['id']]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(reverse('entries:api-share', args=[self.entry.pk])).json()['results'], [])
+        self.assertEqual(self.client.get(share['link']).status_code, 404)
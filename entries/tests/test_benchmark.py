@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase
+
+from entries.benchmark import run_benchmark, compare
+from entries.models import Entry
+
+
+class RunBenchmarkTest(TestCase):
+    """The tests for the benchmark suite."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rik', password='pass')
+
+    def test_run_benchmark(self):
+        metrics = {metric.name: metric for metric in run_benchmark(self.user, sizes=[15, 30], iterations=10, repeat=1)}
+
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 30)
+        self.assertIn('crypto.encrypt', metrics)
+        self.assertIn('import.15', metrics)
+        self.assertIn('list.30.page1.q=user7.cached', metrics)
+        self.assertIn('list.30.page1.q=.cached', metrics)
+        self.assertNotIn('list.30.page10.q=', metrics)
+        self.assertTrue(metrics['share_check'].higher_is_better)
+        self.assertTrue(all(metric.value > 0 for metric in metrics.values()))
+
+
+class CompareTest(SimpleTestCase):
+    """The tests for the comparison of the benchmark results."""
+
+    def results(self, rate, latency):
+        return {'metrics': {
+            'crypto.encrypt': {'value': rate, 'unit': 'ops/s', 'higher_is_better': True},
+            'list.1000.page1.q=': {'value': latency, 'unit': 'ms', 'higher_is_better': False},
+        }}
+
+    def test_no_regressions(self):
+        self.assertEqual(compare(self.results(900, 11), self.results(1000, 10), 0.2), [])
+
+    def test_regressions(self):
+        self.assertEqual(compare(self.results(700, 13), self.results(1000, 10), 0.2), [
+            ('crypto.encrypt', 1000, 700, 'ops/s'),
+            ('list.1000.page1.q=', 10, 13, 'ms'),
+        ])
+
+    def test_missing_metrics(self):
+        self.assertEqual(compare(self.results(700, 13), {'metrics': {}}, 0.2), [])
@@ -0,0 +1,105 @@
+from django.core.management import call_command, CommandError
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+import tempfile
+import hashlib
+import shutil
+import io
+import os
+
+from entries.breach import BreachIndex, build_index, get_breach_index, is_breached, parse_corpus
+from entries.transfer import import_entries
+from entries.forms import EntryForm
+from entries.models import Entry
+
+BREACHED = ['password', '123456', 'qwerty', 'letmein']
+
+
+def sha1(password: str) -> str:
+    return hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+
+
+class BreachIndexTest(TestCase):
+    """The tests for the breach index."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.corpus = os.path.join(self.directory, 'corpus.txt')
+        with open(self.corpus, 'w') as stream:
+            stream.write(''.join('{}:{}\n'.format(sha1(password), number) for number, password in enumerate(BREACHED)))
+        self.path = os.path.join(self.directory, 'breach.idx')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build_and_lookup(self):
+        # The small chunks force the external merge of the sorted runs.
+        count = build_index(list(parse_corpus(self.corpus)) * 2, self.path, chunk_size=3)
+        self.assertEqual(count, len(BREACHED))
+
+        index = BreachIndex(self.path)
+        self.assertEqual(len(index), len(BREACHED))
+        for password in BREACHED:
+            self.assertIn(password, index)
+        for password in ('correct horse battery staple', 'pass', ''):
+            self.assertNotIn(password, index)
+
+    def test_range_files(self):
+        prefix = sha1('password')[:5]
+        range_file = os.path.join(self.directory, prefix + '.txt')
+        with open(range_file, 'w') as stream:
+            stream.write('{}:3861493\r\n'.format(sha1('password')[5:]))
+        build_index(parse_corpus(range_file), self.path)
+        self.assertIn('password', BreachIndex(self.path))
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            BreachIndex(self.corpus)
+
+    def test_empty_index(self):
+        build_index([], self.path)
+        self.assertNotIn('password', BreachIndex(self.path))
+
+    def test_index_rebuilt(self):
+        build_index(parse_corpus(self.corpus), self.path)
+        with override_settings(BREACH_INDEX_PATH=self.path):
+            self.assertIs(get_breach_index(), get_breach_index())
+            self.assertFalse(is_breached('s3cret!'))
+            build_index([bytes.fromhex(sha1('s3cret!'))], self.path)
+            # The running process picks up the index rebuilt in place.
+            self.assertTrue(is_breached('s3cret!'))
+            self.assertFalse(is_breached('password'))
+
+    def test_commands(self):
+        user = User.objects.create_user(username='rik', password='pass')
+        Entry.objects.create(owner=user, name='facebook', url='https://facebook.com', login='rik', password='qwerty')
+        Entry.objects.create(owner=user, name='twitter', url='https://twitter.com', login='rik', password='s3cret!')
+
+        with self.assertRaises(CommandError):
+            call_command('audit_breached_passwords', stdout=io.StringIO())
+
+        stdout = io.StringIO()
+        call_command('build_breach_index', self.directory, output=self.path, stdout=stdout)
+        self.assertIn('Indexed 4 hashes.', stdout.getvalue())
+
+        stdout = io.StringIO()
+        with override_settings(BREACH_INDEX_PATH=self.path):
+            call_command('audit_breached_passwords', batch_size=1, stdout=stdout)
+        self.assertIn('rik: facebook (https://facebook.com)', stdout.getvalue())
+        self.assertIn('Found 1 breached passwords.', stdout.getvalue())
+
+    def test_form(self):
+        build_index(parse_corpus(self.corpus), self.path)
+        data = {'name': 'facebook', 'url': 'https://facebook.com', 'login': 'rik', 'password': 'letmein'}
+        self.assertFalse(is_breached('letmein'))
+        self.assertTrue(EntryForm(data=data).is_valid())
+
+        with override_settings(BREACH_INDEX_PATH=self.path):
+            self.assertTrue(is_breached('letmein'))
+            form = EntryForm(data=data)
+            self.assertFalse(form.is_valid())
+            self.assertIn('password', form.errors)
+            self.assertTrue(EntryForm(data=dict(data, password='s3cret!')).is_valid())
+
+            user = User.objects.create_user(username='rik', password='pass')
+            self.assertEqual(import_entries([data], user), 1)
@@ -0,0 +1,170 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+import tempfile
+import shutil
+
+from entries.cache import get_vault_version, bump_vault_version, get_entry_count, get_page_key
+from entries.transfer import import_entries
+from entries.views import EntryListView
+from entries.models import Entry
+
+
+class SharedCacheMixin(object):
+
+    def shared_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class VaultCacheTest(SharedCacheMixin, TestCase):
+    """The tests for the vault cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    def test_bump_vault_version(self):
+        version = get_vault_version(self.user.pk)
+        bump_vault_version(self.user.pk)
+        self.assertGreater(get_vault_version(self.user.pk), version)
+
+    def test_bump_missing_vault_version(self):
+        cache.clear()
+        bump_vault_version(self.user.pk)
+        self.assertIsNotNone(get_vault_version(self.user.pk))
+
+    def test_entry_count_cached(self):
+        self.shared_cache()
+        self.assertEqual(get_entry_count(self.user), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_entry_count(self.user), 1)
+
+    def test_entry_count_invalidated(self):
+        get_entry_count(self.user)
+        entry = Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                                     login='rik', password='password')
+        self.assertEqual(get_entry_count(self.user), 2)
+
+        entry.delete()
+        self.assertEqual(get_entry_count(self.user), 1)
+
+        import_entries([{'name': 'github', 'url': 'https://github.com', 'login': 'rik', 'password': 'pass'}],
+                       self.user)
+        self.assertEqual(get_entry_count(self.user), 2)
+
+    def test_entry_count_other_user(self):
+        other = User.objects.create_user(username='morty', password='pass')
+        version = get_vault_version(self.user.pk)
+        Entry.objects.create(owner=other, name='amazon', url='https://amazon.com',
+                             login='morty', password='password')
+        self.assertEqual(get_vault_version(self.user.pk), version)
+        self.assertEqual(get_entry_count(other), 1)
+
+    def test_entry_list_count(self):
+        client = Client()
+        client.force_login(self.user, backend=None)
+        response = client.get(reverse('entries:list'))
+        self.assertEqual(response.context['entry_count'], 1)
+
+
+class EntryListPageCacheTest(SharedCacheMixin, TestCase):
+    """The tests for the cache of the entries list pages."""
+
+    def setUp(self):
+        self.shared_cache()
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='secret-password')
+        self.client.force_login(self.user, backend=None)
+
+    def test_page_cached(self):
+        content = self.client.get(reverse('entries:list')).content
+        # Only the session and the user are read.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('entries:list'))
+        self.assertEqual(response.content, content)
+
+    def test_page_sealed(self):
+        self.client.get(reverse('entries:list'))
+        token = cache.get(get_page_key(self.user.pk, '', ''))
+        self.assertIsNotNone(token)
+        self.assertNotIn(b'secret-password', token)
+
+    def test_page_invalidated(self):
+        self.client.get(reverse('entries:list'))
+        self.entry.login = 'morty'
+        self.entry.save()
+        self.assertContains(self.client.get(reverse('entries:list')), 'morty')
+
+        self.entry.delete()
+        self.assertNotContains(self.client.get(reverse('entries:list')), 'facebook')
+
+    def test_page_changed_before_render(self):
+        request = RequestFactory().get(reverse('entries:list'))
+        request.user = self.user
+        view = EntryListView()
+        view.setup(request)
+        response = view.get_page(request)
+        # The vault changes after the entries have been queried, before the page is rendered and cached.
+        Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com', login='rik',
+                             password='password')
+        response.render()
+        self.assertNotContains(response, 'amazon')
+        self.assertContains(self.client.get(reverse('entries:list')), 'amazon')
+
+    def test_page_depends_on_query(self):
+        self.client.get(reverse('entries:list'))
+        response = self.client.get(reverse('entries:list'), {'q': 'amazon'})
+        self.assertNotContains(response, 'facebook')
+
+    def test_page_other_user(self):
+        self.client.get(reverse('entries:list'))
+        self.client.force_login(User.objects.create_user(username='morty', password='pass'), backend=None)
+        self.assertNotContains(self.client.get(reverse('entries:list')), 'facebook')
+
+    def test_page_with_messages_not_cached(self):
+        response = self.client.post(reverse('entries:delete', args=[self.entry.pk]), follow=True)
+        self.assertContains(response, 'Entry successfully deleted.')
+        self.assertNotContains(self.client.get(reverse('entries:list')), 'Entry successfully deleted.')
+
+
+class ProcessCacheTest(TestCase):
+    """The tests for the vault data with a cache kept by every process on its own."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+
+    def process(self, name: str):
+        return override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name,
+        }})
+
+    def test_changed_by_other_process(self):
+        with self.process('first'):
+            response = self.client.get(reverse('entries:list'))
+            self.assertContains(response, 'facebook')
+            self.assertEqual(response.context['entry_count'], 1)
+        with self.process('second'):
+            self.entry.name = 'twitter'
+            self.entry.save()
+            Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com', login='rik',
+                                 password='password')
+        # The first process has not seen the version of the vault bumped.
+        with self.process('first'):
+            response = self.client.get(reverse('entries:list'))
+            self.assertContains(response, 'twitter')
+            self.assertEqual(response.context['entry_count'], 2)
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient
+from django.urls import reverse
+from asgiref.sync import sync_to_async
+import asyncio
+
+from entries.concurrency import run_crypto
+from entries.sharing import create_share_token
+from entries.utils import get_crypto
+from entries.views import EntryListView
+from entries.models import Entry
+
+
+class AsyncViewsTest(TestCase):
+    """The tests for the asynchronous views served through the ASGI handler."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    async def test_entry_list(self):
+        await sync_to_async(self.client.force_login)(self.user, backend=None)
+        response = await self.client.get(reverse('entries:list'))
+        self.assertContains(response, 'facebook')
+
+        response = await self.client.get(reverse('entries:list'))
+        self.assertContains(response, 'facebook')
+
+    async def test_entry_list_not_logged_user(self):
+        response = await self.client.get(reverse('entries:list'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_entry_detail(self):
+        await sync_to_async(self.client.force_login)(self.user, backend=None)
+        response = await self.client.get(reverse('entries:detail', args=[self.entry.pk]))
+        self.assertContains(response, 'facebook')
+
+        response = await self.client.get(reverse('entries:detail', args=[self.entry.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_entry_reveal(self):
+        await sync_to_async(self.client.force_login)(self.user, backend=None)
+        response = await self.client.get(reverse('entries:reveal', args=[self.entry.pk]))
+        self.assertEqual(response.json(), {'password': 'password'})
+
+    async def test_entry_share_check(self):
+        token, _share = await sync_to_async(create_share_token)(self.entry)
+        link = reverse('entries:share-check', args=[token])
+
+        response = await self.client.get(link)
+        self.assertContains(response, 'facebook')
+        response = await self.client.get(link + 'reveal/')
+        self.assertEqual(response.json(), {'password': 'password'})
+
+        response = await self.client.get(link.replace(token, token[::-1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_run_crypto(self):
+        crypto = get_crypto()
+        self.assertEqual(await run_crypto(crypto.decrypt, crypto.encrypt('secret')), 'secret')
+
+    def test_view_is_coroutine_function(self):
+        view = EntryListView.as_view()
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertIs(view.view_class, EntryListView)
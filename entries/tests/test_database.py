@@ -0,0 +1,64 @@
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TransactionTestCase
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from manager.database import check_connections, mark_connections_used
+import tempfile
+import time
+import os
+
+
+class DatabaseTest(SimpleTestCase):
+    """The tests for the database connections setup."""
+
+    def test_sqlite_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(connection.settings_dict, NAME=os.path.join(directory, 'test.sqlite3'))
+            wrapper = DatabaseWrapper(settings_dict)
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+
+class ConnectionHealthCheckTest(TransactionTestCase):
+    """The tests for the health checks of the persistent connections."""
+
+    def setUp(self):
+        self.connection = connections[DEFAULT_DB_ALIAS]
+        self.connection.ensure_connection()
+        self.usable, self.checks, self.closed = True, 0, False
+
+        def is_usable():
+            self.checks += 1
+            return self.usable
+
+        def close():
+            # The in-memory test database is never closed for real.
+            self.closed = True
+
+        self.connection.is_usable, self.connection.close = is_usable, close
+        self.addCleanup(vars(self.connection).pop, 'is_usable')
+        self.addCleanup(vars(self.connection).pop, 'close')
+        self.addCleanup(vars(self.connection).pop, 'last_used_at', None)
+
+    def test_recently_used_connection_not_checked(self):
+        mark_connections_used()
+        check_connections()
+        self.assertEqual((self.checks, self.closed), (0, False))
+
+    def test_usable_connection_is_kept(self):
+        self.connection.last_used_at = time.monotonic() - 60
+        check_connections()
+        self.assertEqual((self.checks, self.closed), (1, False))
+
+    def test_broken_connection_is_closed(self):
+        self.usable = False
+        self.connection.last_used_at = time.monotonic() - 60
+        check_connections()
+        self.assertEqual((self.checks, self.closed), (1, True))
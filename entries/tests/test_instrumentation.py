@@ -0,0 +1,111 @@
+from django.test import TestCase, Client, AsyncClient, override_settings
+from django.core.handlers.asgi import ASGIHandler
+from django.contrib.auth.models import User
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.urls import reverse
+import logging
+import json
+import re
+
+from manager.instrumentation import RequestMetrics, get_metrics, instrument
+from entries.models import Entry
+
+
+def parse_server_timing(value: str) -> dict:
+    return {name: (float(duration), description) for name, duration, description
+            in re.findall(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', value)}
+
+
+@override_settings(SERVER_TIMING=True)
+class InstrumentationMiddlewareTest(TestCase):
+    """The tests for the instrumentation middleware."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('entries:list'))
+        timing = parse_server_timing(response['Server-Timing'])
+
+        self.assertEqual(set(timing), {'sql', 'crypto', 'render', 'total'})
+        self.assertNotEqual(timing['sql'][1], '0 queries')
+        self.assertEqual(timing['crypto'][1], '0 calls')
+        self.assertGreater(timing['render'][0], 0)
+        self.assertGreaterEqual(timing['total'][0], timing['render'][0])
+
+    def test_crypto_calls(self):
+        response = self.client.get(reverse('entries:reveal', args=[self.entry.pk]))
+        self.assertEqual(parse_server_timing(response['Server-Timing'])['crypto'][1], '1 calls')
+
+        response = self.client.get(reverse('entries:api-list'))
+        self.assertEqual(parse_server_timing(response['Server-Timing'])['crypto'][1], '1 calls')
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        response = Client().get(reverse('users:signin'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_log(self):
+        with self.assertLogs('manager.requests', 'INFO') as logs:
+            self.client.get(reverse('entries:detail', args=[self.entry.pk]))
+
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual(data['path'], reverse('entries:detail', args=[self.entry.pk]))
+        self.assertEqual(data['status'], 200)
+        self.assertGreater(data['sql_count'], 0)
+        self.assertEqual(logs.records[0].metrics, data)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0, PROFILE_SAMPLE_RATE=1.0)
+    def test_slow_request_profile(self):
+        with self.assertLogs('manager.requests', 'WARNING') as logs:
+            Client().get(reverse('users:signin'))
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('Profile of GET', logs.records[1].getMessage())
+
+
+@override_settings(SERVER_TIMING=True)
+class InstrumentationMiddlewareAsyncTest(TestCase):
+    """The tests for the instrumentation middleware served through the ASGI handler."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    def test_not_adapted(self):
+        with self.settings(DEBUG=True), self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Loaded.')
+        self.assertFalse([record for record in logs.records if 'InstrumentationMiddleware' in record.getMessage()])
+
+    async def test_server_timing(self):
+        await sync_to_async(self.client.force_login)(self.user, backend=None)
+        with self.assertLogs('manager.requests', 'INFO') as logs:
+            response = await self.client.get(reverse('entries:reveal', args=[self.entry.pk]))
+        timing = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(timing['crypto'][1], '1 calls')
+        self.assertGreater(timing['total'][0], 0)
+        self.assertEqual(json.loads(logs.records[0].getMessage())['status'], 200)
+
+
+class InstrumentTest(TestCase):
+    """The tests for the instrumentation of the functions."""
+
+    def test_outside_of_request(self):
+        self.assertIsNone(get_metrics())
+        self.assertEqual(instrument('crypto')(lambda value: value * 2)(2), 4)
+
+    def test_record(self):
+        metrics = RequestMetrics()
+        metrics.record('crypto', 0.5, count=3)
+        metrics.record('render', 0.25)
+        self.assertEqual(metrics.counts['crypto'], 3)
+        self.assertEqual(metrics.times['render'], 0.25)
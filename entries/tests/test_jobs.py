@@ -0,0 +1,231 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.db import OperationalError
+from django.utils import timezone
+from django.urls import reverse
+import datetime
+import tempfile
+import hashlib
+import shutil
+import io
+import os
+
+from entries.jobs import HANDLERS, cancel_job, claim_job, enqueue_job, run_job, work
+from entries.breach import build_index
+from entries.utils import get_crypto
+from entries.models import Entry, Job
+
+CSV = 'name,url,login,password\n' + ''.join(
+    'entry{0},https://example.com/{0},rik,password{0}\n'.format(number) for number in range(5))
+
+
+class JobsTest(TestCase):
+    """The tests for the background jobs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+
+    def test_enqueue_encrypts_payload(self):
+        job = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv'}, payload=CSV)
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertNotIn('password0', job.payload)
+        self.assertEqual(get_crypto().decrypt(job.payload), CSV)
+
+        with self.assertRaises(ValueError):
+            enqueue_job('unknown')
+
+    def test_import(self):
+        job = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv', 'batch_size': 2}, payload=CSV)
+        self.assertEqual(claim_job('worker').pk, job.pk)
+        self.assertIsNone(claim_job('other'))
+
+        job = run_job(Job.objects.get(pk=job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual((job.progress, job.total, job.checkpoint), (5, 5, 5))
+        self.assertEqual(job.result, {'imported': 5})
+        self.assertEqual(job.payload, '')
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 5)
+
+    def test_import_invalid_row(self):
+        payload = CSV + 'invalid,not a url,rik,password\n'
+        job = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv', 'batch_size': 2}, payload=payload)
+        run_job(claim_job('worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Entry 6 is invalid', job.error)
+        # The file is validated before the first chunk, so nothing is imported.
+        self.assertEqual(job.checkpoint, 0)
+        self.assertEqual(Entry.objects.count(), 0)
+
+    def test_resume_stale_job(self):
+        job = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv', 'batch_size': 2}, payload=CSV)
+        claim_job('dead')
+        # The dead worker has imported the first chunk.
+        Entry.objects.create(owner=self.user, name='entry0', url='https://example.com/0', login='rik',
+                             password='password0')
+        Entry.objects.create(owner=self.user, name='entry1', url='https://example.com/1', login='rik',
+                             password='password1')
+        Job.objects.filter(pk=job.pk).update(checkpoint=2, progress=2)
+        self.assertIsNone(claim_job('worker'))
+
+        stale = timezone.now() - datetime.timedelta(minutes=10)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=stale)
+        with self.settings(JOB_STALE_SECONDS=60):
+            claimed = claim_job('worker')
+        self.assertEqual((claimed.pk, claimed.worker, claimed.attempts), (job.pk, 'worker', 2))
+        run_job(claimed)
+        self.assertEqual(Entry.objects.count(), 5)
+        self.assertEqual(list(Entry.objects.order_by('name').values_list('name', flat=True)),
+                         ['entry{}'.format(number) for number in range(5)])
+
+    def test_too_many_attempts(self):
+        job = enqueue_job(Job.ROTATE)
+        stale = timezone.now() - datetime.timedelta(minutes=10)
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, heartbeat_at=stale, attempts=3)
+        with self.settings(JOB_STALE_SECONDS=60, JOB_MAX_ATTEMPTS=3):
+            self.assertIsNone(claim_job('worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_cancel(self):
+        job = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv', 'batch_size': 2}, payload=CSV)
+        claimed = claim_job('worker')
+        self.assertTrue(cancel_job(job))
+        self.assertFalse(cancel_job(job))
+
+        # The chunk in progress is rolled back.
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.payload), (Job.CANCELLED, ''))
+        self.assertEqual(Entry.objects.count(), 0)
+
+    def test_retry_after_database_error(self):
+        failures = []
+
+        def flaky(job):
+            while job.checkpoint < 3:
+                job.checkpoint += 1
+                if job.checkpoint == 2 and not failures:
+                    failures.append(job.checkpoint)
+                    raise OperationalError('database is locked')
+                job.progress += 1
+                yield
+
+        HANDLERS['flaky'] = flaky
+        self.addCleanup(HANDLERS.pop, 'flaky')
+        job = enqueue_job('flaky')
+        run_job(claim_job('worker'))
+        job.refresh_from_db()
+        # The failed chunk is run again from the saved progress.
+        self.assertEqual((job.status, job.checkpoint, job.progress), (Job.DONE, 3, 3))
+        self.assertEqual(failures, [2])
+
+    def test_rotation(self):
+        for number in range(3):
+            Entry.objects.create(owner=self.user, name='entry{}'.format(number), url='https://example.com',
+                                 login='rik', password='password')
+        enqueue_job(Job.ROTATE, params={'batch_size': 2})
+        self.assertEqual(work('worker', once=True), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.progress, job.total), (Job.DONE, 3, 3))
+        self.assertEqual(job.result, {'rotated': 0, 'payloads': 0})
+
+    def test_audit(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'breach.idx')
+        build_index([hashlib.sha1(b'password1').digest()], path)
+
+        Entry.objects.create(owner=self.user, name='safe', url='https://example.com', login='rik',
+                             password='correct horse')
+        breached = Entry.objects.create(owner=self.user, name='breached', url='https://example.com', login='rik',
+                                        password='password1')
+        with self.settings(BREACH_INDEX_PATH=path):
+            job = enqueue_job(Job.AUDIT, owner=self.user, params={'batch_size': 1})
+            work('worker', once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.total), (Job.DONE, 2, 2))
+        self.assertEqual(job.result, {'breached': [breached.pk]})
+
+    @override_settings(BREACH_INDEX_PATH=None)
+    def test_audit_without_index(self):
+        job = enqueue_job(Job.AUDIT, owner=self.user)
+        work('worker', once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'The breach index is not set.'))
+
+    def test_run_jobs_command(self):
+        enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv'}, payload=CSV)
+        out = io.StringIO()
+        call_command('run_jobs', once=True, stdout=out)
+        self.assertIn('Ran 1 jobs.', out.getvalue())
+        self.assertEqual(Entry.objects.count(), 5)
+
+    def test_rotate_keys_background(self):
+        call_command('rotate_keys', background=True, stdout=io.StringIO())
+        self.assertEqual(Job.objects.get().kind, Job.ROTATE)
+
+
+class JobViewsTest(TestCase):
+    """The tests for the views of the background jobs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.other = User.objects.create_user(username='bob', password='pass')
+        self.client.login(username='rik', password='pass')
+
+    def test_import(self):
+        upload = SimpleUploadedFile('entries.csv', CSV.encode('utf-8'))
+        response = self.client.post(reverse('entries:import'), {'file': upload})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('entries:job', args=[job.pk]))
+        self.assertEqual((job.kind, job.owner, job.params), (Job.IMPORT, self.user, {'format': 'csv'}))
+        # Nothing is imported by the request itself.
+        self.assertEqual(Entry.objects.count(), 0)
+
+    def test_import_unknown_format(self):
+        upload = SimpleUploadedFile('entries.txt', CSV.encode('utf-8'))
+        response = self.client.post(reverse('entries:import'), {'file': upload})
+        self.assertContains(response, 'Unknown format of the file.')
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(IMPORT_MAX_SIZE=10)
+    def test_import_too_large(self):
+        upload = SimpleUploadedFile('entries.csv', CSV.encode('utf-8'))
+        response = self.client.post(reverse('entries:import'), {'file': upload})
+        self.assertContains(response, 'The file is too large.')
+
+    @override_settings(BREACH_INDEX_PATH=None)
+    def test_audit_without_index(self):
+        response = self.client.post(reverse('entries:audit'))
+        self.assertRedirects(response, reverse('entries:audit'))
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_status(self):
+        job = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv'}, payload=CSV)
+        response = self.client.get(reverse('entries:api-job', args=[job.pk]))
+        self.assertEqual(response.json()['status'], Job.PENDING)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertContains(self.client.get(reverse('entries:job', args=[job.pk])), 'pending')
+
+        work('worker', once=True)
+        data = self.client.get(reverse('entries:api-job', args=[job.pk])).json()
+        self.assertEqual((data['status'], data['progress'], data['total']), (Job.DONE, 5, 5))
+        self.assertIsNotNone(data['finished_at'])
+        self.assertContains(self.client.get(reverse('entries:job', args=[job.pk])), 'Imported 5 entries.')
+
+    def test_job_of_other_user(self):
+        job = enqueue_job(Job.AUDIT, owner=self.other)
+        self.assertEqual(self.client.get(reverse('entries:job', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('entries:api-job', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('entries:job-cancel', args=[job.pk])).status_code, 404)
+
+    def test_cancel(self):
+        job = enqueue_job(Job.AUDIT, owner=self.user)
+        self.assertEqual(self.client.delete(reverse('entries:api-job', args=[job.pk])).status_code, 204)
+        self.assertEqual(self.client.delete(reverse('entries:api-job', args=[job.pk])).status_code, 409)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.CANCELLED)
@@ -0,0 +1,153 @@
+from django.test import TestCase, TransactionTestCase, Client
+from django.db import connection, transaction
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+import threading
+import unittest
+import io
+
+from entries.journal import read_changes, compact_journal
+from entries.models import Entry, EntryChange
+from entries.transfer import import_entries
+
+
+class JournalTest(TestCase):
+    """The tests for the change journal."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    def actions(self):
+        return list(EntryChange.objects.values_list('entry_id', 'action'))
+
+    def test_journal_save_and_delete(self):
+        self.entry.login = 'morty'
+        self.entry.save()
+        pk = self.entry.pk
+        self.entry.delete()
+        self.assertEqual(self.actions(), [(pk, 'c'), (pk, 'u'), (pk, 'd')])
+
+    def test_journal_import(self):
+        import_entries([{'name': 'github', 'url': 'https://github.com', 'login': 'rik', 'password': 'pass'}],
+                       self.user)
+        github = Entry.objects.get(name='github')
+        self.assertEqual(self.actions(), [(self.entry.pk, 'c'), (github.pk, 'c')])
+
+    def test_read_changes_compacted(self):
+        for login in ('a', 'b', 'c'):
+            self.entry.login = login
+            self.entry.save()
+        result = read_changes(self.user, 0)
+
+        self.assertEqual(result['changes'], [(self.entry.pk, self.entry)])
+        self.assertEqual(result['seq'], EntryChange.objects.last().pk)
+        self.assertFalse(result['more'])
+
+    def test_read_changes_since(self):
+        seq = read_changes(self.user, 0)['seq']
+        self.assertEqual(read_changes(self.user, seq), {'changes': [], 'seq': seq, 'more': False})
+
+        pk = self.entry.pk
+        self.entry.delete()
+        self.assertEqual(read_changes(self.user, seq)['changes'], [(pk, None)])
+
+    def test_read_changes_limit(self):
+        other = Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                                     login='rik', password='password')
+        result = read_changes(self.user, 0, limit=1)
+        self.assertEqual(result['changes'], [(self.entry.pk, self.entry)])
+        self.assertTrue(result['more'])
+
+        result = read_changes(self.user, result['seq'], limit=1)
+        self.assertEqual(result['changes'], [(other.pk, other)])
+        self.assertFalse(result['more'])
+
+    def test_read_changes_other_owner(self):
+        other = User.objects.create_user(username='morty', password='pass')
+        self.assertEqual(read_changes(other, 0)['changes'], [])
+
+    def test_compact_journal(self):
+        self.entry.save()
+        self.entry.save()
+        other = Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                                     login='rik', password='password')
+        self.assertEqual(compact_journal(batch_size=2), 2)
+        self.assertEqual(self.actions(), [(self.entry.pk, 'u'), (other.pk, 'c')])
+
+    def test_compact_command(self):
+        self.entry.save()
+        out = io.StringIO()
+        call_command('compact_change_journal', stdout=out)
+        self.assertIn('Removed 1 journal records.', out.getvalue())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'The journal lock is used only on PostgreSQL.')
+class JournalOrderTest(TransactionTestCase):
+    """The tests for the order of the journal records of the concurrent transactions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+
+    def create_entry(self, name, created=None, release=None):
+        try:
+            with transaction.atomic():
+                Entry.objects.create(owner=self.user, name=name, url='https://example.com',
+                                     login='rik', password='password')
+                if created:
+                    created.set()
+                    release.wait(5)
+        finally:
+            connection.close()
+
+    def test_records_numbered_in_commit_order(self):
+        created, release = threading.Event(), threading.Event()
+        first = threading.Thread(target=self.create_entry, args=('first', created, release))
+        first.start()
+        self.assertTrue(created.wait(5))
+
+        # The second transaction waits for the lock of the journal held by the first one.
+        second = threading.Thread(target=self.create_entry, args=('second',))
+        second.start()
+        second.join(0.5)
+        self.assertTrue(second.is_alive())
+
+        release.set()
+        first.join()
+        second.join()
+        changes = read_changes(self.user, 0)['changes']
+        self.assertEqual([entry.name for _, entry in changes], ['first', 'second'])
+
+
+class EntrySyncViewTest(TestCase):
+    """The tests for the entries API sync view."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+
+    def test_sync(self):
+        data = self.client.get(reverse('entries:api-sync')).json()
+        self.assertEqual(len(data['changes']), 1)
+        self.assertEqual(data['changes'][0]['action'], 'upsert')
+        self.assertEqual(data['changes'][0]['entry']['password'], 'password')
+
+        pk = self.entry.pk
+        self.entry.delete()
+        data = self.client.get(reverse('entries:api-sync'), {'since': data['seq']}).json()
+        self.assertEqual(data['changes'], [{'id': pk, 'action': 'delete'}])
+        self.assertFalse(data['more'])
+
+    def test_sync_invalid_since(self):
+        response = self.client.get(reverse('entries:api-sync'), {'since': 'asdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sync_not_logged_user(self):
+        self.client.logout()
+        response = self.client.get(reverse('entries:api-sync'))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,128 @@
+from django.test import TestCase, SimpleTestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+import threading
+import tempfile
+import json
+import os
+
+from manager.metrics import Registry, Counter, Histogram, registry
+from entries.models import Entry
+
+
+def get_value(name, **labels):
+    return registry.snapshot().get((name, tuple(labels.items())), 0)
+
+
+class RegistryTest(SimpleTestCase):
+    """The tests for the metrics registry."""
+
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter('test_total', 'Test counter.', ['kind'], registry=self.registry)
+        self.histogram = Histogram('test_seconds', 'Test histogram.', buckets=(0.1, 1, float('inf')),
+                                   registry=self.registry)
+
+    def test_concurrent_counter(self):
+        def worker():
+            for _ in range(1000):
+                self.counter.inc(kind='a')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry.snapshot()[('test_total', (('kind', 'a'),))], 4000)
+
+    def test_render(self):
+        self.counter.inc(kind='a"b')
+        self.histogram.observe(0.5)
+        self.assertEqual(self.registry.render().splitlines(), [
+            '# HELP test_total Test counter.',
+            '# TYPE test_total counter',
+            'test_total{kind="a\\"b"} 1',
+            '# HELP test_seconds Test histogram.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{le="0.1"} 0',
+            'test_seconds_bucket{le="1"} 1',
+            'test_seconds_bucket{le="+Inf"} 1',
+            'test_seconds_sum 0.5',
+            'test_seconds_count 1',
+        ])
+
+    def test_multiprocess(self):
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, 'metrics-1.json'), 'w') as stream:
+            json.dump([['test_total', [['kind', 'a']], 2]], stream)
+
+        self.counter.inc(kind='a')
+        with self.settings(METRICS_MULTIPROC_DIR=directory):
+            self.assertEqual(self.registry.collect(), {('test_total', (('kind', 'a'),)): 3})
+        self.assertTrue(os.path.exists(os.path.join(directory, 'metrics-{}.json'.format(os.getpid()))))
+
+
+class MetricsViewTest(TestCase):
+    """The tests for the metrics view."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics(self):
+        self.client.get(reverse('users:signin'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(response, 'http_requests_total{view="users:signin",method="GET",status="200"}')
+        self.assertContains(response, 'http_request_duration_seconds_bucket{view="users:signin",le="+Inf"}')
+
+    def test_metrics_forbidden(self):
+        # The local clients are not allowed by default.
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer other').status_code, 403)
+
+        self.client.force_login(User.objects.create_user(username='admin', is_staff=True), backend=None)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_allowed_ips(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.2').status_code, 403)
+
+    def test_logins(self):
+        success, failure = get_value('logins_total', result='success'), get_value('logins_total', result='failure')
+        self.client.post(reverse('users:signin'), {'username': 'rik', 'password': 'wrong'})
+        self.client.post(reverse('users:signin'), {'username': 'rik', 'password': 'pass'})
+
+        self.assertEqual(get_value('logins_total', result='success'), success + 1)
+        self.assertEqual(get_value('logins_total', result='failure'), failure + 1)
+
+    def test_share_links(self):
+        created = get_value('share_links_created_total')
+        valid = get_value('share_link_validations_total', result='valid')
+        invalid = get_value('share_link_validations_total', result='invalid')
+
+        self.client.force_login(self.user, backend=None)
+        link = self.client.post(reverse('entries:share', args=[self.entry.pk])).context['link']
+        self.client.get(link)
+        self.client.get(link.replace('/share/', '/share/0'))
+
+        self.assertEqual(get_value('share_links_created_total'), created + 1)
+        self.assertEqual(get_value('share_link_validations_total', result='valid'), valid + 1)
+        self.assertEqual(get_value('share_link_validations_total', result='invalid'), invalid + 1)
+
+    def test_crypto(self):
+        decrypts = get_value('crypto_operations_total', operation='decrypt')
+        self.client.force_login(self.user, backend=None)
+        self.client.get(reverse('entries:reveal', args=[self.entry.pk]))
+        self.assertEqual(get_value('crypto_operations_total', operation='decrypt'), decrypts + 1)
+        self.assertGreater(get_value('crypto_operation_seconds_total', operation='decrypt'), 0)
@@ -1,5 +1,7 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
+from entries.utils import get_crypto
 from entries.models import Entry
 
 
@@ -7,7 +9,8 @@ class EntryModelTest(TestCase):
     """The test for the entry model."""
 
     def setUp(self):
-        self.initial_data = {'name': 'facebook', 'url': 'https://facebook.com',
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.initial_data = {'owner': self.user, 'name': 'facebook', 'url': 'https://facebook.com',
                              'login': 'user', 'password': 'password'}
 
     def test_string_representation(self):
@@ -21,7 +24,8 @@ class EntryModelTest(TestCase):
         entry = Entry(**self.initial_data)
         self.assertEqual(entry.password, 'password')
         entry.save()
-        self.assertEqual(entry.password, 'EgBSBcfow6xrX4xB47i+PQ==')
+        self.assertTrue(entry.password.startswith('v2$'))
+        self.assertEqual(get_crypto().decrypt(entry.password), 'password')
 
     def test_entries_ordering(self):
         Entry.objects.create(**self.initial_data)
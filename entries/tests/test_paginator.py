@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from entries.paginator import CursorPaginator, InvalidCursor
+from entries.search import search_entries
+from entries.models import Entry
+
+
+class CursorPaginatorTest(TestCase):
+    """The tests for the cursor paginator."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        for i in range(7):
+            Entry.objects.create(owner=self.user, name='entry', url=f'https://{i % 3}.example.com',
+                                 login='rik', password='password')
+        self.expected = list(Entry.objects.order_by('name', 'url', 'pk'))
+        self.paginator = CursorPaginator(Entry.objects.all(), 3)
+
+    def test_ordering_with_tiebreaker(self):
+        self.assertEqual(self.paginator.ordering, ['name', 'url', 'pk'])
+
+    def test_forward(self):
+        page = self.paginator.page()
+        pages = [page]
+        while page.has_next():
+            page = self.paginator.page(page.next_cursor)
+            pages.append(page)
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([entry for page in pages for entry in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_backward(self):
+        first = self.paginator.page()
+        second = self.paginator.page(first.next_cursor)
+        third = self.paginator.page(second.next_cursor)
+
+        previous = self.paginator.page(third.previous_cursor)
+        self.assertEqual(previous.object_list, second.object_list)
+        self.assertTrue(previous.has_next())
+        self.assertTrue(previous.has_previous())
+
+        previous = self.paginator.page(previous.previous_cursor)
+        self.assertEqual(previous.object_list, first.object_list)
+        self.assertFalse(previous.has_previous())
+
+    def test_descending_ordering(self):
+        paginator = CursorPaginator(Entry.objects.order_by('-url'), 4)
+        page = paginator.page()
+        entries = page.object_list + paginator.page(page.next_cursor).object_list
+        self.assertEqual(entries, list(Entry.objects.order_by('-url', 'pk')))
+
+    def test_search_ordering(self):
+        paginator = CursorPaginator(search_entries(Entry.objects.all(), 'example'), 5)
+        page = paginator.page()
+        entries = page.object_list + paginator.page(page.next_cursor).object_list
+        self.assertEqual(len(set(entries)), 7)
+
+    def test_page_query_count(self):
+        cursor = self.paginator.page().next_cursor
+        with self.assertNumQueries(1):
+            self.paginator.page(cursor)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page('asdf')
+
+    def test_count(self):
+        self.assertEqual(self.paginator.count, 7)
+
+
+class EntryListViewPaginationTest(TestCase):
+    """The tests for the pagination of the entry list view."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.client = Client()
+        self.client.force_login(self.user, backend=None)
+        for i in range(12):
+            Entry.objects.create(owner=self.user, name=f'entry{i:02}', url='https://example.com',
+                                 login='rik', password='password')
+
+    def test_next_page(self):
+        response = self.client.get(reverse('entries:list'))
+        page = response.context['page_obj']
+        self.assertEqual(len(response.context['entries']), 10)
+        self.assertTrue(response.context['is_paginated'])
+
+        response = self.client.get(reverse('entries:list'), {'cursor': page.next_cursor})
+        self.assertEqual([entry.name for entry in response.context['entries']], ['entry10', 'entry11'])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('entries:list'), {'cursor': 'asdf'})
+        self.assertEqual(response.status_code, 404)
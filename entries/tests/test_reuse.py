@@ -0,0 +1,89 @@
+from django.core.management import call_command
+from django.contrib.messages import get_messages
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+import json
+import io
+
+from entries.reuse import backfill_fingerprints, find_reused_passwords, get_reuse_count
+from entries.transfer import import_entries
+from entries.utils import get_fingerprint
+from entries.models import Entry
+
+
+class PasswordReuseTest(TestCase):
+    """The tests for the detection of the reused passwords."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.other = User.objects.create_user(username='morty', password='pass')
+        self.facebook = self.create('facebook', 'password')
+        self.twitter = self.create('twitter', 'password')
+        self.github = self.create('github', 's3cret!')
+
+    def create(self, name: str, password: str, owner: User = None) -> Entry:
+        return Entry.objects.create(owner=owner or self.user, name=name, url='https://{}.com'.format(name),
+                                    login='rik', password=password)
+
+    def test_fingerprint(self):
+        self.assertEqual(self.facebook.fingerprint, get_fingerprint(self.user.pk, 'password'))
+        self.assertEqual(self.facebook.fingerprint, self.twitter.fingerprint)
+        self.assertNotEqual(self.facebook.fingerprint, self.github.fingerprint)
+        self.assertNotEqual(self.facebook.fingerprint, self.create('gitlab', 'password', self.other).fingerprint)
+
+    def test_find_reused_passwords(self):
+        self.create('gitlab', 'password', self.other)
+        with self.assertNumQueries(1):
+            groups = find_reused_passwords(self.user)
+        self.assertEqual(groups, [[self.facebook, self.twitter]])
+        self.assertEqual(find_reused_passwords(self.other), [])
+
+    def test_reuse_count(self):
+        self.assertEqual(get_reuse_count(self.facebook), 1)
+        self.assertEqual(get_reuse_count(self.github), 0)
+
+    def test_import(self):
+        import_entries([{'name': 'gitlab', 'url': 'https://gitlab.com', 'login': 'rik', 'password': 's3cret!'}],
+                       self.user)
+        self.assertEqual(get_reuse_count(self.github), 1)
+
+    def test_backfill(self):
+        Entry.objects.update(fingerprint='')
+        self.assertEqual(find_reused_passwords(self.user), [])
+
+        self.assertEqual(backfill_fingerprints(batch_size=2), 3)
+        self.assertEqual(find_reused_passwords(self.user), [[self.facebook, self.twitter]])
+        self.assertEqual(backfill_fingerprints(), 0)
+
+    def test_backfill_command(self):
+        Entry.objects.filter(pk=self.github.pk).update(fingerprint='')
+        stdout = io.StringIO()
+        call_command('backfill_fingerprints', stdout=stdout)
+        self.assertIn('Filled in 1 fingerprints.', stdout.getvalue())
+
+    def test_create_warning(self):
+        client = Client()
+        client.force_login(self.user, backend=None)
+        response = client.post(reverse('entries:create'), {'name': 'gitlab', 'url': 'https://gitlab.com',
+                                                           'login': 'rik', 'password': 'password'})
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertIn('The password is also used by 2 other entries.', messages)
+
+    def test_api_reuse_count(self):
+        client = Client()
+        client.force_login(self.user, backend=None)
+        response = client.post(reverse('entries:api-list'), json.dumps({
+            'name': 'gitlab', 'url': 'https://gitlab.com', 'login': 'rik', 'password': 's3cret!'
+        }), content_type='application/json')
+        self.assertEqual(response.json()['reused'], 1)
+
+    def test_reused_view(self):
+        client = Client()
+        client.force_login(self.user, backend=None)
+        response = client.get(reverse('entries:reused'))
+        self.assertEqual(response.context['groups'], [[self.facebook, self.twitter]])
+        self.assertContains(response, 'twitter')
+        self.assertNotContains(response, reverse('entries:detail', args=[self.github.pk]))
@@ -0,0 +1,154 @@
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.db.models.signals import post_save
+from django.db import IntegrityError
+from django.utils import timezone
+from django.urls import reverse
+import datetime
+import io
+
+from entries.revisions import get_revision_at, get_revision_state, prune_revisions, restore_revision
+from entries.models import REVISION_SNAPSHOT_INTERVAL, Entry, EntryRevision
+from entries.transfer import import_entries
+from entries.utils import get_crypto
+
+
+class EntryRevisionTest(TestCase):
+    """The tests for the revision history of the entries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    def update(self, **values) -> None:
+        entry = Entry.objects.get(pk=self.entry.pk)
+        entry.password = get_crypto().decrypt(entry.password)
+        for field, value in values.items():
+            setattr(entry, field, value)
+        entry.save()
+
+    def test_created(self):
+        revision = self.entry.revisions.get()
+        self.assertEqual((revision.number, revision.is_snapshot), (1, True))
+        self.assertEqual(get_revision_state(revision), {'name': 'facebook', 'url': 'https://facebook.com',
+                                                        'login': 'rik', 'password': 'password'})
+        self.assertNotIn('password', revision.data)
+
+    def test_revision_conflict(self):
+        def conflict(sender, instance, **kwargs):
+            # Stands for the number of the revision taken by a concurrent save.
+            raise IntegrityError('UNIQUE constraint failed: entries_entryrevision.entry_id, number')
+
+        post_save.connect(conflict, sender=Entry)
+        self.addCleanup(post_save.disconnect, conflict, sender=Entry)
+        with self.assertRaises(IntegrityError):
+            self.update(login='morty')
+        # The entry is not changed without its revision.
+        self.assertEqual(Entry.objects.get(pk=self.entry.pk).login, 'rik')
+        self.assertEqual(self.entry.revisions.count(), 1)
+
+    def test_changed_fields_only(self):
+        self.update(login='morty')
+        self.update(password='s3cret!')
+        self.update()
+        revisions = list(self.entry.revisions.order_by('number'))
+        self.assertEqual([revision.get_fields() for revision in revisions[1:]], [['login'], ['password']])
+        self.assertFalse(revisions[-1].is_snapshot)
+        self.assertEqual(get_revision_state(revisions[1])['login'], 'morty')
+        self.assertEqual(get_revision_state(revisions[1])['password'], 'password')
+        self.assertEqual(get_revision_state(revisions[2])['password'], 's3cret!')
+
+    def test_snapshots(self):
+        for number in range(REVISION_SNAPSHOT_INTERVAL + 2):
+            self.update(password='password{}'.format(number))
+        snapshots = self.entry.revisions.filter(is_snapshot=True).values_list('number', flat=True)
+        self.assertEqual(sorted(snapshots), [1, REVISION_SNAPSHOT_INTERVAL + 1])
+
+        last = self.entry.revisions.first()
+        with self.assertNumQueries(2):
+            state = get_revision_state(last)
+        self.assertEqual(state['password'], 'password{}'.format(REVISION_SNAPSHOT_INTERVAL + 1))
+
+    def test_imported_entry(self):
+        import_entries([{'name': 'github', 'url': 'https://github.com', 'login': 'rik', 'password': 'password'}],
+                       self.user)
+        entry = Entry.objects.get(name='github')
+        self.assertFalse(entry.revisions.exists())
+
+        entry.password = 's3cret!'
+        entry.save()
+        first, second = entry.revisions.order_by('number')
+        self.assertEqual(get_revision_state(first)['password'], 'password')
+        self.assertEqual(second.get_fields(), ['password'])
+
+    def test_restore(self):
+        self.update(name='twitter', password='s3cret!')
+        restore_revision(self.entry.revisions.get(number=1))
+
+        entry = Entry.objects.get(pk=self.entry.pk)
+        self.assertEqual(entry.name, 'facebook')
+        self.assertEqual(get_crypto().decrypt(entry.password), 'password')
+        self.assertEqual(entry.revisions.first().get_fields(), ['name', 'password'])
+
+    def test_revision_at(self):
+        EntryRevision.objects.update(created_at=timezone.now() - datetime.timedelta(days=1))
+        self.update(login='morty')
+        self.assertEqual(get_revision_at(self.entry, timezone.now() - datetime.timedelta(hours=1)).number, 1)
+        self.assertEqual(get_revision_at(self.entry, timezone.now()).number, 2)
+        self.assertIsNone(get_revision_at(self.entry, timezone.now() - datetime.timedelta(days=2)))
+
+    def test_prune_by_count(self):
+        for number in range(2 * REVISION_SNAPSHOT_INTERVAL + 5):
+            self.update(password='password{}'.format(number))
+        last = self.entry.revisions.first()
+
+        removed = prune_revisions(max_count=5, max_age=365)
+        self.assertEqual(removed, 2 * REVISION_SNAPSHOT_INTERVAL)
+        self.assertEqual(self.entry.revisions.order_by('number').first().number, 2 * REVISION_SNAPSHOT_INTERVAL + 1)
+        self.assertEqual(get_revision_state(last)['password'], 'password{}'.format(2 * REVISION_SNAPSHOT_INTERVAL + 4))
+        self.assertEqual(prune_revisions(max_count=5, max_age=365), 0)
+
+    def test_prune_by_age(self):
+        for number in range(REVISION_SNAPSHOT_INTERVAL + 1):
+            self.update(password='password{}'.format(number))
+        EntryRevision.objects.update(created_at=timezone.now() - datetime.timedelta(days=30))
+
+        stdout = io.StringIO()
+        call_command('prune_revisions', max_age=7, batch_size=1, stdout=stdout)
+        self.assertIn('Removed {} revisions.'.format(REVISION_SNAPSHOT_INTERVAL), stdout.getvalue())
+        self.assertEqual(list(self.entry.revisions.values_list('number', flat=True)),
+                         [REVISION_SNAPSHOT_INTERVAL + 2, REVISION_SNAPSHOT_INTERVAL + 1])
+
+
+class EntryHistoryViewTest(TestCase):
+    """The tests for the entry history and restore views."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+        self.client.post(reverse('entries:update', args=[self.entry.pk]), {
+            'name': 'twitter', 'url': 'https://facebook.com', 'login': 'rik', 'password': 'password'
+        })
+
+    def test_history(self):
+        response = self.client.get(reverse('entries:history', args=[self.entry.pk]))
+        self.assertEqual([revision.number for revision in response.context['revisions']], [2, 1])
+        self.assertContains(response, 'name')
+
+    def test_restore(self):
+        response = self.client.post(reverse('entries:restore', args=[self.entry.pk, 1]))
+        self.assertRedirects(response, reverse('entries:detail', args=[self.entry.pk]))
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertIn('Entry restored to the revision 1.', messages)
+        self.assertEqual(Entry.objects.get(pk=self.entry.pk).name, 'facebook')
+
+    def test_other_user(self):
+        self.client.force_login(User.objects.create_user(username='morty', password='pass'), backend=None)
+        self.assertEqual(self.client.get(reverse('entries:history', args=[self.entry.pk])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('entries:restore', args=[self.entry.pk, 1])).status_code, 404)
@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+import tempfile
+import base64
+import io
+import os
+
+from entries.utils import LegacyCrypto, get_crypto, get_keyring
+from entries.rotation import rotate_passwords, rotate_payloads
+from entries.models import Entry, EntryRevision, Job
+from entries.jobs import enqueue_job
+
+
+class RotatePasswordsTest(TestCase):
+    """The tests for the rotation of the encryption keys."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        for index in range(5):
+            Entry.objects.create(owner=self.user, name='entry{}'.format(index), url='https://example.com',
+                                 login='rik', password='password{}'.format(index))
+        # An entry stored before the envelope format.
+        self.legacy = Entry.objects.create(owner=self.user, name='legacy', url='https://example.com',
+                                           login='rik', password='legacy')
+        Entry.objects.filter(pk=self.legacy.pk).update(password=LegacyCrypto().encrypt('legacy'))
+        self.pks = list(Entry.objects.order_by('pk').values_list('pk', flat=True))
+
+        # The new primary key followed by the default key the entries were encrypted with.
+        self.keyring = 'new:{},default:{}'.format(base64.b64encode(b'k' * 32).decode(),
+                                                  base64.b64encode(get_keyring()['default']).decode())
+
+    def key_ids(self):
+        passwords = Entry.objects.order_by('pk').values_list('password', flat=True)
+        return [password.split('$')[1] if password.startswith('v2$') else None for password in passwords]
+
+    def test_rotate_passwords(self):
+        with self.settings(ENTRIES_KEYRING=self.keyring):
+            self.assertEqual(list(rotate_passwords(batch_size=4)), [(self.pks[3], 4), (self.pks[5], 2)])
+            self.assertEqual(self.key_ids(), ['new'] * 6)
+            self.assertEqual(get_crypto().decrypt(Entry.objects.get(pk=self.legacy.pk).password), 'legacy')
+            self.assertEqual(list(rotate_passwords()), [(self.pks[5], 0)])
+
+    def test_rotate_passwords_start_after(self):
+        with self.settings(ENTRIES_KEYRING=self.keyring):
+            self.assertEqual(list(rotate_passwords(start_after=self.pks[3])), [(self.pks[5], 2)])
+        self.assertEqual(self.key_ids(), ['default'] * 4 + ['new', 'new'])
+
+    def test_rotate_revisions(self):
+        entry = Entry.objects.get(pk=self.pks[0])
+        entry.password = 'changed'
+        entry.save()
+        with self.settings(ENTRIES_KEYRING=self.keyring):
+            list(rotate_passwords(batch_size=2))
+            self.assertTrue(EntryRevision.objects.exists())
+            for data in EntryRevision.objects.values_list('data', flat=True):
+                self.assertEqual(data.split('$')[1], 'new')
+                get_crypto().decrypt(data)
+
+    def test_rotate_payloads(self):
+        pending = enqueue_job(Job.IMPORT, owner=self.user, params={'format': 'csv'}, payload='name\nfacebook\n')
+        done = enqueue_job(Job.IMPORT, owner=self.user, payload='name\n')
+        Job.objects.filter(pk=done.pk).update(status=Job.DONE)
+        with self.settings(ENTRIES_KEYRING=self.keyring):
+            self.assertEqual(rotate_payloads(), 1)
+            pending.refresh_from_db()
+            self.assertEqual(pending.payload.split('$')[1], 'new')
+            self.assertEqual(get_crypto().decrypt(pending.payload), 'name\nfacebook\n')
+            self.assertEqual(rotate_payloads(), 0)
+
+    def test_rotate_keeps_modification_time(self):
+        updated_at = Entry.objects.values_list('updated_at', flat=True).first()
+        with self.settings(ENTRIES_KEYRING=self.keyring):
+            list(rotate_passwords())
+        self.assertEqual(Entry.objects.values_list('updated_at', flat=True).first(), updated_at)
+
+    def test_rotate_keys_command(self):
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'rotation')
+        with open(checkpoint, 'w') as stream:
+            stream.write(str(self.pks[1]))
+
+        out = io.StringIO()
+        with self.settings(ENTRIES_KEYRING=self.keyring):
+            call_command('rotate_keys', batch_size=2, checkpoint=checkpoint, stdout=out)
+
+        self.assertIn('Resuming after the entry {}.'.format(self.pks[1]), out.getvalue())
+        self.assertIn('Rotated 4 entries.', out.getvalue())
+        self.assertIn('Rotated 0 job payloads.', out.getvalue())
+        self.assertEqual(self.key_ids(), ['default'] * 2 + ['new'] * 4)
+        self.assertFalse(os.path.exists(checkpoint))
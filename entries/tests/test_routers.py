@@ -0,0 +1,184 @@
+from django.test import SimpleTestCase, TransactionTestCase, RequestFactory, Client, AsyncClient, override_settings
+from django.core.handlers.asgi import ASGIHandler
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.urls import reverse, resolve
+from urllib.parse import urlencode
+import tempfile
+import logging
+import sqlite3
+import shutil
+import os
+
+from manager.routers import ReplicaRouter, ReplicaRouting, _routing, use_primary
+from entries.sharing import create_share_token
+from entries.models import Entry
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(SimpleTestCase):
+    """The tests for the read replica router."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def get_routing(self, view_name='entries:list', **kwargs):
+        request = RequestFactory().get(reverse(view_name))
+        request.resolver_match = resolve(request.path_info)
+        return ReplicaRouting(request=request, **kwargs)
+
+    def route(self, model, routing):
+        token = _routing.set(routing)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            _routing.reset(token)
+
+    def test_read_from_replica(self):
+        self.assertIn(self.route(Entry, self.get_routing(enabled=True)), ['replica1', 'replica2'])
+
+    def test_read_from_primary(self):
+        self.assertIsNone(self.router.db_for_read(Entry))
+        self.assertIsNone(self.route(Entry, self.get_routing(enabled=False)))
+        self.assertIsNone(self.route(Entry, self.get_routing(enabled=True, pinned=True)))
+        self.assertIsNone(self.route(User, self.get_routing(enabled=True)))
+        # Only the reads of the `REPLICA_VIEWS` go to the replicas.
+        self.assertIsNone(self.route(Entry, self.get_routing('entries:api-sync', enabled=True)))
+        self.assertIsNone(self.route(Entry, ReplicaRouting(enabled=True)))
+
+    def test_use_primary(self):
+        routing = self.get_routing(enabled=True)
+        token = _routing.set(routing)
+        try:
+            with use_primary():
+                with use_primary():
+                    self.assertIsNone(self.router.db_for_read(Entry))
+                self.assertIsNone(self.router.db_for_read(Entry))
+            self.assertIsNotNone(self.router.db_for_read(Entry))
+        finally:
+            _routing.reset(token)
+
+    def test_read_after_write(self):
+        routing = self.get_routing(enabled=True)
+        token = _routing.set(routing)
+        try:
+            self.assertEqual(self.router.db_for_write(Entry), 'default')
+        finally:
+            _routing.reset(token)
+        self.assertIsNone(self.route(Entry, routing))
+
+    def test_allow_migrate(self):
+        self.assertIsNone(self.router.allow_migrate('default', 'entries'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'entries'))
+
+
+class ReplicaRoutingMiddlewareTest(TransactionTestCase):
+    """
+    The tests for the replica routing of the requests. The replica is a copy
+    of the primary database taken in the set up, so it misses all the later
+    changes, the same way as a replica lagging behind does.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The connections opened by the threads of the asynchronous views
+        # outlive a test, so the replica keeps its path for the whole class.
+        cls.directory = tempfile.mkdtemp()
+        cls.replica = os.path.join(cls.directory, 'replica.sqlite3')
+        connections.databases['replica1'] = dict(connections.databases['default'], NAME=cls.replica)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica1'].close()
+        del connections.databases['replica1']
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+        replica = sqlite3.connect(self.replica)
+        connection.ensure_connection()
+        connection.connection.backup(replica)
+        replica.close()
+        settings = override_settings(DATABASE_REPLICAS=['replica1'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.entry.name = 'twitter'
+        self.entry.save()
+        self.amazon = Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                                           login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+
+    def test_detail_from_replica(self):
+        response = self.client.get(reverse('entries:detail', args=[self.entry.pk]))
+        self.assertContains(response, 'facebook')
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_write_pins_to_primary(self):
+        response = self.client.post(reverse('entries:create'), {'name': 'google', 'url': 'https://google.com',
+                                                                'login': 'rik', 'password': 'password'})
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 5)
+
+        response = self.client.get(reverse('entries:detail', args=[self.entry.pk]))
+        self.assertContains(response, 'twitter')
+
+    def test_list_from_replica(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        response = self.client.get(reverse('entries:list'))
+        self.assertContains(response, 'facebook')
+        self.assertNotContains(response, 'amazon')
+        # The page read from the replica is not cached, so the pinned client gets the page from the primary.
+        self.client.cookies['primary_pin'] = '1'
+        response = self.client.get(reverse('entries:list'))
+        self.assertContains(response, 'twitter')
+        self.assertContains(response, 'amazon')
+
+    @override_settings(REPLICA_VIEWS=['entries:api-sync'])
+    def test_sync_from_primary(self):
+        # The entries missing on the replica are not turned into tombstones.
+        changes = self.client.get(reverse('entries:api-sync')).json()['changes']
+        self.assertEqual({change['action'] for change in changes}, {'upsert'})
+        self.assertEqual({change['entry']['name'] for change in changes}, {'twitter', 'amazon'})
+
+    def test_share_check_missing_on_replica(self):
+        token = create_share_token(self.amazon)[0]
+        self.assertContains(self.client.get(reverse('entries:share-check', args=[token])), 'amazon')
+
+    def test_not_adapted(self):
+        with self.settings(DEBUG=True), self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Loaded.')
+        self.assertFalse([record for record in logs.records if 'ReplicaRoutingMiddleware' in record.getMessage()])
+
+    async def test_asgi(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user, backend=None)
+        response = await client.get(reverse('entries:detail', args=[self.entry.pk]))
+        self.assertContains(response, 'facebook')
+
+        data = urlencode({'name': 'google', 'url': 'https://google.com', 'login': 'rik', 'password': 'password'})
+        response = await client.post(reverse('entries:create'), data, content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 5)
+        response = await client.get(reverse('entries:detail', args=[self.entry.pk]))
+        self.assertContains(response, 'twitter')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        response = self.client.post(reverse('entries:create'), {'name': 'google', 'url': 'https://google.com',
+                                                                'login': 'rik', 'password': 'password'})
+        self.assertNotIn('primary_pin', response.cookies)
@@ -0,0 +1,142 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+import time
+import io
+
+from entries.search import SEARCH_TABLE, is_available, search_entries, rebuild_index, get_host
+from entries.paginator import CursorPaginator
+from entries.transfer import import_entries
+from entries.models import Entry
+
+
+class SearchTest(TestCase):
+    """The tests for the entries search."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.facebook = Entry.objects.create(owner=self.user, name='facebook', url='https://www.facebook.com/login',
+                                             login='rik', password='password')
+        self.amazon = Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                                           login='rik@facebook.com', password='password')
+        self.google = Entry.objects.create(owner=self.user, name='google', url='https://google.com',
+                                           login='morty', password='password')
+
+    def search(self, query, owner=None):
+        owner = owner or self.user
+        return list(search_entries(Entry.objects.filter(owner=owner), query, owner_id=owner.pk))
+
+    def indexed_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid, owner, name, host, login FROM {} ORDER BY rowid'.format(SEARCH_TABLE))
+            return cursor.fetchall()
+
+    def test_index_is_available(self):
+        self.assertTrue(is_available())
+
+    def test_search_name_substring(self):
+        self.assertEqual(self.search('oogl'), [self.google])
+
+    def test_search_is_case_insensitive(self):
+        self.assertEqual(self.search('GOOGLE'), [self.google])
+
+    def test_search_host_and_login(self):
+        self.assertEqual(self.search('amazon.com'), [self.amazon])
+        self.assertEqual(self.search('morty'), [self.google])
+
+    def test_search_url_path_is_not_indexed(self):
+        self.assertEqual(self.search('login'), [])
+
+    def test_search_ordering(self):
+        self.assertEqual(self.search('facebook'), [self.amazon, self.facebook])
+
+    def test_search_pages_stable(self):
+        self.google.login = 'facebook facebook facebook'
+        self.google.save()
+        queryset = search_entries(Entry.objects.filter(owner=self.user), 'facebook', owner_id=self.user.pk)
+        first = CursorPaginator(queryset, per_page=1).page()
+        # The entries of the other users change the statistics of the whole index.
+        other = User.objects.create_user(username='morty', password='pass')
+        for number in range(20):
+            Entry.objects.create(owner=other, name='entry {}'.format(number), url='https://example.com',
+                                 login='morty', password='password')
+        paginator = CursorPaginator(queryset, per_page=10)
+        rest = list(paginator.page(first.next_cursor))
+        self.assertCountEqual(list(first) + rest, [self.amazon, self.facebook, self.google])
+
+    def test_search_all_terms_required(self):
+        self.assertEqual(self.search('facebook rik@'), [self.amazon])
+
+    def test_search_short_terms(self):
+        self.assertEqual(self.search('go'), [self.google])
+        self.assertEqual(self.search('face am'), [self.amazon])
+
+    def test_search_quotes(self):
+        self.assertEqual(self.search('"face'), [])
+
+    def test_search_empty_query(self):
+        self.assertEqual(len(self.search('  ')), 3)
+
+    def test_index_updated_on_save(self):
+        self.google.name = 'alphabet'
+        self.google.save()
+        self.assertEqual(self.search('alphabet'), [self.google])
+        self.assertEqual(self.search('google'), [self.google])
+        self.assertEqual(len(self.indexed_rows()), 3)
+
+    def test_index_updated_on_delete(self):
+        self.google.delete()
+        self.assertEqual(self.search('google'), [])
+        self.assertEqual(len(self.indexed_rows()), 2)
+
+    def test_index_updated_on_import(self):
+        import_entries([{'name': 'github', 'url': 'https://github.com', 'login': 'rik', 'password': 'pass'}],
+                       self.user)
+        self.assertEqual([entry.name for entry in self.search('github')], ['github'])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(SEARCH_TABLE))
+        out = io.StringIO()
+        call_command('rebuild_search_index', '--batch-size', '2', stdout=out)
+
+        self.assertIn('Indexed 3 entries.', out.getvalue())
+        self.assertEqual(self.indexed_rows()[0],
+                         (self.facebook.pk, 'u{:012d}'.format(self.user.pk), 'facebook', 'www.facebook.com', 'rik'))
+
+    def test_search_other_owner(self):
+        other = User.objects.create_user(username='morty', password='pass')
+        entry = Entry.objects.create(owner=other, name='google', url='https://google.com',
+                                     login='morty', password='password')
+        self.assertEqual(self.search('google', owner=other), [entry])
+        self.assertEqual(self.search('google'), [self.google])
+
+    def test_search_owner_token_not_matched(self):
+        self.assertEqual(self.search('000'), [])
+
+    def test_get_host(self):
+        self.assertEqual(get_host('https://user@Example.com:8080/path'), 'example.com')
+        self.assertEqual(get_host('asdf'), '')
+
+    def test_search_large_table(self):
+        Entry.objects.bulk_create(
+            Entry(owner=self.user, name='site{}'.format(number), url='https://site{}.example.com'.format(number),
+                  login='rik', password='password')
+            for number in range(20000)
+        )
+        rebuild_index(Entry.objects.all())
+
+        # The entries are matched by a single FTS query, not one query per entry.
+        started = time.monotonic()
+        with self.assertNumQueries(2):
+            paginator = CursorPaginator(search_entries(Entry.objects.filter(owner=self.user), 'site1',
+                                                       owner_id=self.user.pk), per_page=10)
+            first = paginator.page()
+            second = paginator.page(first.next_cursor)
+        self.assertLess(time.monotonic() - started, 5)
+
+        self.assertEqual([entry.name for entry in first],
+                         ['site1', 'site10', 'site100', 'site1000'] + ['site1000{}'.format(n) for n in range(6)])
+        self.assertEqual([entry.name for entry in second][:2], ['site10006', 'site10007'])
+        self.assertEqual(paginator.count, 11111)
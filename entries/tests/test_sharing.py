@@ -0,0 +1,119 @@
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.utils import timezone
+import datetime
+import tempfile
+import shutil
+import io
+
+from entries.sharing import (InvalidShareToken, create_share_token, get_active_share_tokens, get_token_digest,
+                             purge_share_tokens, resolve_share_token, revoke_share_token)
+from entries.models import Entry, ShareToken
+
+
+class SharingTest(TestCase):
+    """The tests for the share tokens."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                          login='rik', password='password')
+
+    def assertInvalid(self, token: str, reason: str, use: bool = False) -> None:
+        with self.assertRaises(InvalidShareToken) as context:
+            resolve_share_token(token, use=use)
+        self.assertEqual(context.exception.reason, reason)
+
+    def test_token_is_not_stored(self):
+        token, share = create_share_token(self.entry)
+        self.assertNotIn(token, share.digest)
+        self.assertEqual(share.digest, get_token_digest(token))
+
+    def test_resolve(self):
+        token = create_share_token(self.entry)[0]
+        self.assertEqual(resolve_share_token(token), self.entry)
+
+    def shared_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_resolve_cached(self):
+        self.shared_cache()
+        token = create_share_token(self.entry)[0]
+        resolve_share_token(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_share_token(token), self.entry)
+
+    def test_resolve_not_cached_per_process(self):
+        token, share = create_share_token(self.entry)
+        resolve_share_token(token)
+        # The token is revoked by another process, the local cache is not cleared.
+        ShareToken.objects.filter(pk=share.pk).update(revoked_at=timezone.now())
+        self.assertInvalid(token, 'revoked')
+
+    def test_use_checks_database(self):
+        self.shared_cache()
+        token, share = create_share_token(self.entry)
+        resolve_share_token(token)
+        ShareToken.objects.filter(pk=share.pk).update(revoked_at=timezone.now())
+        # The stale state is only shown, the password is never revealed.
+        self.assertEqual(resolve_share_token(token), self.entry)
+        self.assertInvalid(token, 'revoked', use=True)
+        self.assertInvalid(token, 'revoked')
+
+    def test_resolve_updated_entry(self):
+        token = create_share_token(self.entry)[0]
+        resolve_share_token(token)
+        self.entry.name = 'twitter'
+        self.entry.save()
+        self.assertEqual(resolve_share_token(token).name, 'twitter')
+
+    def test_resolve_invalid(self):
+        token = create_share_token(self.entry)[0]
+        self.assertInvalid(token[::-1], 'invalid')
+        self.assertInvalid('invalid', 'invalid')
+
+    def test_resolve_expired(self):
+        token, share = create_share_token(self.entry)
+        ShareToken.objects.filter(pk=share.pk).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertInvalid(token, 'expired')
+
+    def test_revoke(self):
+        token, share = create_share_token(self.entry)
+        resolve_share_token(token)
+        revoke_share_token(share)
+        self.assertInvalid(token, 'revoked')
+        self.assertFalse(get_active_share_tokens(self.entry).exists())
+
+    def test_max_uses(self):
+        token = create_share_token(self.entry, max_uses=2)[0]
+        resolve_share_token(token, use=True)
+        resolve_share_token(token)
+        resolve_share_token(token, use=True)
+        self.assertInvalid(token, 'exhausted')
+        self.assertInvalid(token, 'exhausted', use=True)
+        self.assertEqual(ShareToken.objects.get().uses, 2)
+
+    def test_purge(self):
+        active = create_share_token(self.entry)[1]
+        revoke_share_token(create_share_token(self.entry)[1])
+        ShareToken.objects.filter(pk=create_share_token(self.entry)[1].pk) \
+            .update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        ShareToken.objects.filter(pk=create_share_token(self.entry, max_uses=1)[1].pk).update(uses=1)
+
+        self.assertEqual(purge_share_tokens(batch_size=2), 3)
+        self.assertEqual(list(ShareToken.objects.all()), [active])
+
+    def test_purge_command(self):
+        revoke_share_token(create_share_token(self.entry)[1])
+        stdout = io.StringIO()
+        call_command('purge_share_tokens', stdout=stdout)
+        self.assertIn('Removed 1 share links.', stdout.getvalue())
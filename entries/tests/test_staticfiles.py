@@ -0,0 +1,113 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.utils.http import http_date
+from manager.staticfiles import StaticAsset, StaticFilesMiddleware, brotli
+import unittest
+import tempfile
+import logging
+import asyncio
+import shutil
+import gzip
+import os
+
+
+class StaticFilesTest(SimpleTestCase):
+    """The tests for the hashed, precompressed static files and their serving."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(STATIC_ROOT=self.root, STATIC_SERVE=True,
+                                     STATICFILES_STORAGE='manager.staticfiles.CompressedManifestStaticFilesStorage')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        self.hashed = staticfiles_storage.hashed_files['common.css']
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('not static', status=404))
+        self.factory = RequestFactory()
+
+    def get(self, name: str, **extra):
+        return self.middleware(self.factory.get('/static/' + name, **extra))
+
+    def test_collectstatic(self):
+        self.assertRegex(self.hashed, r'^common\.[0-9a-f]{12}\.css$')
+        self.assertEqual(staticfiles_storage.url('common.css'), '/static/' + self.hashed)
+        with open(os.path.join(self.root, self.hashed), 'rb') as stream:
+            original = stream.read()
+        with gzip.open(os.path.join(self.root, self.hashed + '.gz')) as stream:
+            self.assertEqual(stream.read(), original)
+        # The small files are not worth compressing.
+        small = staticfiles_storage.hashed_files['entries/entries_detail.css']
+        self.assertFalse(os.path.exists(os.path.join(self.root, small + '.gz')))
+
+    def test_serve_hashed_gzip(self):
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Content-Disposition', response)
+        self.assertEqual(int(response['Content-Length']),
+                         os.path.getsize(os.path.join(self.root, self.hashed + '.gz')))
+
+    def test_serve_identity(self):
+        for accept_encoding in ('', 'gzip;q=0', 'identity'):
+            response = self.get(self.hashed, HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(int(response['Content-Length']), os.path.getsize(os.path.join(self.root, self.hashed)))
+
+    @unittest.skipIf(brotli is None, 'The brotli package is not installed.')
+    def test_serve_brotli(self):
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_serve_original_name(self):
+        response = self.get('common.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+    def test_not_modified(self):
+        mtime = os.path.getmtime(os.path.join(self.root, 'common.css'))
+        response = self.get('common.css', HTTP_IF_MODIFIED_SINCE=http_date(mtime))
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_requests(self):
+        self.assertEqual(self.get('missing.css').status_code, 404)
+        self.assertEqual(self.get(self.hashed + '.gz').status_code, 404)
+        response = self.middleware(self.factory.post('/static/' + self.hashed))
+        self.assertEqual(response.status_code, 404)
+
+    def test_disabled(self):
+        with self.settings(STATIC_SERVE=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                StaticFilesMiddleware(lambda request: HttpResponse())
+
+    async def test_async(self):
+        async def get_response(request):
+            return HttpResponse('not static', status=404)
+
+        middleware = StaticFilesMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(self.factory.get('/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual((response.status_code, response['Content-Encoding']), (200, 'gzip'))
+        response.close()
+        response = await middleware(self.factory.get('/static/missing.css'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_adapted(self):
+        with self.settings(DEBUG=True), self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Loaded.')
+        self.assertFalse([record for record in logs.records if 'StaticFilesMiddleware' in record.getMessage()])
+
+    def test_choose_encoding(self):
+        asset = StaticAsset(os.path.join(self.root, self.hashed), immutable=True)
+        self.assertEqual(asset.choose('*')[0], 'br' if brotli else 'gzip')
+        self.assertEqual(asset.choose('deflate, gzip;q=0.5')[0], 'gzip')
+        self.assertIsNone(asset.choose('gzip;q=1.0.0')[0])
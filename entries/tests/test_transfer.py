@@ -0,0 +1,164 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client
+from django.urls import reverse
+import tempfile
+import json
+import io
+import os
+
+from entries.transfer import TransferError, clean_entries, read_entries, import_entries, export_entries
+from entries.utils import get_crypto
+from entries.models import Entry
+
+CSV_DATA = ('name,url,login,password\n'
+            'facebook,https://facebook.com,rik,password\n'
+            'amazon,https://amazon.com,rik,"se,cret"\n')
+
+JSONL_DATA = ('{"name": "facebook", "url": "https://facebook.com", "login": "rik", "password": "password"}\n'
+              '\n'
+              '{"name": "amazon", "url": "https://amazon.com", "login": "rik", "password": "se,cret"}\n')
+
+
+class ImportEntriesTest(TestCase):
+    """The tests for the entries import."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+
+    def assertImported(self):
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 2)
+        entry = Entry.objects.get(name='amazon')
+        self.assertEqual(get_crypto().decrypt(entry.password), 'se,cret')
+
+    def test_import_csv(self):
+        self.assertEqual(import_entries(read_entries(io.StringIO(CSV_DATA), 'csv'), self.user, batch_size=1), 2)
+        self.assertImported()
+
+    def test_import_jsonl(self):
+        self.assertEqual(import_entries(read_entries(io.StringIO(JSONL_DATA), 'jsonl'), self.user), 2)
+        self.assertImported()
+
+    def test_import_invalid_entry(self):
+        data = CSV_DATA + 'google,asdf,rik,password\n'
+        with self.assertRaisesMessage(TransferError, 'Entry 3 is invalid'):
+            import_entries(read_entries(io.StringIO(data), 'csv'), self.user, batch_size=2)
+        # Every chunk is committed on its own.
+        self.assertImported()
+
+    def test_import_malformed_entry(self):
+        data = JSONL_DATA + '{"name": "google"\n'
+        with self.assertRaises(ValueError):
+            import_entries(read_entries(io.StringIO(data), 'jsonl'), self.user, batch_size=1)
+        self.assertImported()
+
+    def test_import_resumed(self):
+        data = CSV_DATA + 'google,asdf,rik,password\n' + 'github,https://github.com,rik,password\n'
+        with self.assertRaisesMessage(TransferError, 'Entry 3 is invalid'):
+            import_entries(read_entries(io.StringIO(data), 'csv'), self.user, batch_size=2, import_id='import')
+        data = data.replace('asdf', 'https://google.com')
+        self.assertEqual(import_entries(read_entries(io.StringIO(data), 'csv'), self.user, batch_size=2,
+                                        import_id='import'), 2)
+        self.assertEqual(list(Entry.objects.order_by('pk').values_list('name', flat=True)),
+                         ['facebook', 'amazon', 'google', 'github'])
+        self.assertEqual(import_entries(read_entries(io.StringIO(data), 'csv'), self.user, import_id='import'), 0)
+
+    def test_import_cleaned(self):
+        rows = clean_entries(read_entries(io.StringIO(CSV_DATA), 'csv'))
+        # The rows passed as cleaned are not validated again.
+        rows.append({'name': 'google', 'url': 'asdf', 'login': 'rik', 'password': 'password'})
+        self.assertEqual(import_entries(rows, self.user, cleaned=True), 3)
+
+    def test_import_marker(self):
+        import_entries(read_entries(io.StringIO(CSV_DATA), 'csv'), self.user, batch_size=1)
+        import_entries(read_entries(io.StringIO(CSV_DATA), 'csv'), self.user)
+        markers = set(Entry.objects.values_list('import_id', flat=True))
+        self.assertEqual(len(markers), 2)
+        self.assertIsNone(Entry.objects.create(owner=self.user, name='google', url='https://google.com',
+                                               login='rik', password='password').import_id)
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'entries.jsonl')
+            with open(path, 'w') as stream:
+                stream.write(JSONL_DATA)
+            out = io.StringIO()
+            call_command('import_entries', path, '--owner', 'rik', stdout=out)
+
+        self.assertIn('Imported 2 entries.', out.getvalue())
+        self.assertImported()
+
+    def test_import_command_resumed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'entries.csv')
+            with open(path, 'w') as stream:
+                stream.write(CSV_DATA + 'google,asdf,rik,password\n')
+            with self.assertRaisesMessage(CommandError, 'Entry 3 is invalid') as context:
+                call_command('import_entries', path, '--owner', 'rik', '--batch-size', '2')
+            import_id = Entry.objects.values_list('import_id', flat=True).first()
+            self.assertIn('--import-id {}'.format(import_id), str(context.exception))
+
+            with open(path, 'w') as stream:
+                stream.write(CSV_DATA + 'google,https://google.com,rik,password\n')
+            out = io.StringIO()
+            call_command('import_entries', path, '--owner', 'rik', '--import-id', import_id, stdout=out)
+        self.assertIn('Imported 1 entries.', out.getvalue())
+        self.assertEqual(Entry.objects.filter(owner=self.user).count(), 3)
+
+    def test_import_command_unknown_format(self):
+        with self.assertRaises(CommandError):
+            call_command('import_entries', 'entries.txt', '--owner', 'rik')
+
+    def test_import_command_unknown_owner(self):
+        with self.assertRaises(CommandError):
+            call_command('import_entries', 'entries.csv', '--owner', 'morty')
+
+
+class ExportEntriesTest(TestCase):
+    """The tests for the entries export."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.other = User.objects.create_user(username='morty', password='pass')
+        Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                             login='rik', password='password')
+        Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                             login='rik', password='se,cret')
+        Entry.objects.create(owner=self.other, name='google', url='https://google.com',
+                             login='morty', password='password')
+
+    def test_export_csv(self):
+        data = ''.join(export_entries(Entry.objects.filter(owner=self.user).order_by('pk'), 'csv', batch_size=1))
+        self.assertEqual(data.replace('\r\n', '\n'), CSV_DATA)
+
+    def test_export_jsonl(self):
+        lines = list(export_entries(Entry.objects.filter(owner=self.user).order_by('pk'), 'jsonl'))
+        self.assertEqual([json.loads(line) for line in lines],
+                         [json.loads(line) for line in JSONL_DATA.splitlines() if line])
+
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command('export_entries', '--format', 'jsonl', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+        out = io.StringIO()
+        call_command('export_entries', '--format', 'jsonl', '--owner', 'morty', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+
+    def test_export_view(self):
+        client = Client()
+        client.force_login(self.user, backend=None)
+        response = client.get(reverse('entries:export'), {'format': 'csv'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="entries.csv"')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.replace('\r\n', '\n'), CSV_DATA)
+
+    def test_export_view_invalid_format(self):
+        client = Client()
+        client.force_login(self.user, backend=None)
+        response = client.get(reverse('entries:export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
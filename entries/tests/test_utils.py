@@ -0,0 +1,145 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+import threading
+import base64
+
+from entries.utils import (CipherProvider, LegacyCrypto, Crypto, DEFAULT_KEY_ID,
+                           get_crypto, get_keyring, parse_keyring, cipher_provider)
+from entries.models import Entry
+
+KEY = base64.b64encode(b'k' * 32).decode()
+OTHER_KEY = base64.b64encode(b'o' * 32).decode()
+LEGACY_PASSWORD = 'EgBSBcfow6xrX4xB47i+PQ=='
+
+
+class CipherProviderTest(SimpleTestCase):
+    """The tests for the cipher provider."""
+
+    def setUp(self):
+        self.provider = CipherProvider(maxsize=2)
+
+    def test_cipher_is_cached(self):
+        cipher = self.provider.get('a', 'x' * 32)
+        self.assertIs(self.provider.get('a', 'x' * 32), cipher)
+
+    def test_cache_is_bounded(self):
+        first = self.provider.get('a', 'a' * 32)
+        self.provider.get('b', 'b' * 32)
+        self.provider.get('a', 'a' * 32)
+        self.provider.get('c', 'c' * 32)
+
+        self.assertEqual(len(self.provider), 2)
+        self.assertIs(self.provider.get('a', 'a' * 32), first)
+
+    def test_concurrent_access(self):
+        ciphers = []
+
+        def worker():
+            ciphers.append(self.provider.get('a', 'a' * 32))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(cipher) for cipher in ciphers}), 1)
+
+
+class LegacyCryptoTest(SimpleTestCase):
+    """The tests for the legacy crypto engine."""
+
+    def test_engines_share_cipher(self):
+        self.assertIs(LegacyCrypto().cipher, get_crypto().legacy.cipher)
+        self.assertIs(LegacyCrypto().cipher, cipher_provider.get(LegacyCrypto().key_id, ''))
+
+    def test_encrypt_decrypt(self):
+        crypto = LegacyCrypto()
+        self.assertEqual(crypto.encrypt('password'), LEGACY_PASSWORD)
+        self.assertEqual(crypto.decrypt(LEGACY_PASSWORD), 'password')
+
+    def test_decrypt_many(self):
+        crypto = LegacyCrypto()
+        passwords = ['password', '', 'x' * 16]
+        encrypted = [crypto.encrypt(password) for password in passwords]
+        self.assertEqual(crypto.decrypt_many(encrypted), passwords)
+        self.assertEqual(crypto.decrypt_many(iter(encrypted)), passwords)
+        self.assertEqual(crypto.decrypt_many([]), [])
+
+
+class CryptoTest(SimpleTestCase):
+    """The tests for the crypto engine."""
+
+    def setUp(self):
+        self.crypto = Crypto(parse_keyring('new:{},old:{}'.format(KEY, OTHER_KEY)))
+
+    def test_encrypt_decrypt(self):
+        encrypted = self.crypto.encrypt('pąssword')
+        self.assertTrue(encrypted.startswith('v2$new$'))
+        self.assertEqual(self.crypto.decrypt(encrypted), 'pąssword')
+
+    def test_unique_nonces(self):
+        self.assertNotEqual(self.crypto.encrypt('password'), self.crypto.encrypt('password'))
+
+    def test_envelope_length(self):
+        encrypted = self.crypto.encrypt('\U0001f511' * 50)
+        self.assertLessEqual(len(encrypted), Entry._meta.get_field('password').max_length)
+
+    def test_decrypt_tampered(self):
+        version, key_id, sealed = self.crypto.encrypt('password').split('$')
+        sealed = base64.b64decode(sealed)
+        tampered = base64.b64encode(sealed[:-1] + bytes([sealed[-1] ^ 1])).decode()
+        with self.assertRaises(ValueError):
+            self.crypto.decrypt('$'.join((version, key_id, tampered)))
+
+    def test_decrypt_with_old_key(self):
+        encrypted = Crypto(parse_keyring('old:{}'.format(OTHER_KEY))).encrypt('password')
+        self.assertEqual(self.crypto.decrypt(encrypted), 'password')
+        with self.assertRaises(ValueError):
+            self.crypto.decrypt(encrypted.replace('$old$', '$new$'))
+
+    def test_decrypt_unknown_key(self):
+        encrypted = self.crypto.encrypt('password')
+        with self.assertRaises(ValueError):
+            Crypto(parse_keyring('old:{}'.format(OTHER_KEY))).decrypt(encrypted)
+
+    def test_decrypt_legacy(self):
+        self.assertEqual(self.crypto.decrypt(LEGACY_PASSWORD), 'password')
+
+    def test_encrypt_decrypt_many(self):
+        passwords = ['password', '', 'x' * 16]
+        encrypted = self.crypto.encrypt_many(passwords)
+        self.assertEqual(self.crypto.decrypt_many(encrypted), passwords)
+        self.assertEqual(self.crypto.decrypt_many(iter([LEGACY_PASSWORD] + encrypted)), ['password'] + passwords)
+        self.assertEqual(self.crypto.encrypt_many([]), [])
+        self.assertEqual(self.crypto.decrypt_many([]), [])
+
+    def test_rotate(self):
+        old = Crypto(parse_keyring('old:{}'.format(OTHER_KEY))).encrypt('password')
+        current = self.crypto.encrypt('password')
+        for password in (old, LEGACY_PASSWORD):
+            self.assertTrue(self.crypto.needs_rotation(password))
+            self.assertTrue(self.crypto.rotate(password).startswith('v2$new$'))
+            self.assertEqual(self.crypto.decrypt(self.crypto.rotate(password)), 'password')
+        self.assertFalse(self.crypto.needs_rotation(current))
+        self.assertEqual(self.crypto.rotate(current), current)
+
+
+class KeyringTest(SimpleTestCase):
+    """The tests for the keyring."""
+
+    def test_parse_keyring(self):
+        keyring = parse_keyring(' new:{}, old:{} '.format(KEY, OTHER_KEY))
+        self.assertEqual(list(keyring), ['new', 'old'])
+        self.assertEqual(keyring['new'], base64.b64decode(KEY))
+
+    def test_parse_invalid_keyring(self):
+        for value in ('new', 'new:asdf', 'new:' + KEY[:-4], 'n$w:' + KEY):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_keyring(value)
+
+    def test_default_keyring(self):
+        with self.settings(ENTRIES_KEYRING=''):
+            self.assertEqual(list(get_keyring()), [DEFAULT_KEY_ID])
+        with self.settings(ENTRIES_KEYRING='new:{}'.format(KEY)):
+            self.assertEqual(get_crypto().key_id, 'new')
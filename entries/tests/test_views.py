@@ -1,17 +1,20 @@
 from django.utils.translation import ugettext as _
 from django.contrib.messages import get_messages
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 
+from entries.sharing import create_share_token
+from entries.models import Entry, ShareToken
 from entries.utils import Crypto
-from entries.models import Entry
 
 
 class EntryListViewTest(TestCase):
     """The tests for the entry list view."""
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='rik', password='pass')
         self.client = Client()
 
@@ -34,6 +37,29 @@ class EntryListViewTest(TestCase):
         response = self.client.get(reverse('entries:list'), {'q': searching_text})
         self.assertContains(response, searching_text, status_code=200)
 
+    def test_logged_user_entry_list_no_passwords(self):
+        entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
+                                     login='rik', password='secret')
+        self.client.force_login(self.user, backend=None)
+        response = self.client.get(reverse('entries:list'), {})
+
+        self.assertNotContains(response, 'secret')
+        self.assertNotContains(response, entry.password)
+        self.assertContains(response, reverse('entries:reveal', args=[entry.id]))
+        self.assertEqual(response.context['entries'][0].get_deferred_fields(), {'password'})
+
+    def test_logged_user_entry_list_count(self):
+        for number in range(12):
+            Entry.objects.create(owner=self.user, name='entry{}'.format(number), url='https://example.com',
+                                 login='rik', password='password')
+        self.client.force_login(self.user, backend=None)
+
+        # The count is the total number of the entries in the vault, not the size of the page.
+        for params in ({}, {'q': 'entry1'}):
+            response = self.client.get(reverse('entries:list'), params)
+            self.assertLess(len(response.context['entries']), 12)
+            self.assertContains(response, 'number of entries: <span class="fbold">12</span>')
+
 
 class EntryDetailViewTest(TestCase):
     """The tests for the entry detail view."""
@@ -41,7 +67,7 @@ class EntryDetailViewTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='rik', password='pass')
-        self.entry = Entry.objects.create(name='facebook', url='https://facebook.com',
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
                                           login='rik', password='password')
 
     def test_not_logged_user_entry_detail(self):
@@ -57,6 +83,55 @@ class EntryDetailViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'entries/entries_detail.html')
         self.assertEqual(response.context['entry'].name, self.entry.name)
+        self.assertNotContains(response, 'value="password"')
+
+    def test_logged_user_entry_reveal(self):
+        self.client.force_login(self.user, backend=None)
+        response = self.client.get(reverse('entries:reveal', args=[self.entry.id]))
+
+        self.assertEqual(response.json(), {'password': 'password'})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_not_logged_user_entry_reveal(self):
+        response = self.client.get(reverse('entries:reveal', args=[self.entry.id]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_other_user_entry_reveal(self):
+        self.client.force_login(User.objects.create_user(username='morty', password='pass'), backend=None)
+        response = self.client.get(reverse('entries:reveal', args=[self.entry.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class EntryOwnershipTest(TestCase):
+    """The tests for the entries visibility between the users."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='rik', password='pass')
+        self.other = User.objects.create_user(username='morty', password='pass')
+        self.entry = Entry.objects.create(owner=self.other, name='facebook', url='https://facebook.com',
+                                          login='morty', password='password')
+        self.client.force_login(self.user, backend=None)
+
+    def test_entry_list_other_user(self):
+        Entry.objects.create(owner=self.user, name='amazon', url='https://amazon.com',
+                             login='rik', password='password')
+        response = self.client.get(reverse('entries:list'))
+        self.assertEqual([entry.name for entry in response.context['entries']], ['amazon'])
+
+        response = self.client.get(reverse('entries:list'), {'q': 'facebook'})
+        self.assertEqual(len(response.context['entries']), 0)
+
+    def test_entry_views_other_user(self):
+        for name in ('detail', 'update', 'delete', 'share'):
+            response = self.client.get(reverse(f'entries:{name}', args=[self.entry.id]))
+            self.assertEqual(response.status_code, 404)
+
+    def test_entry_delete_other_user(self):
+        response = self.client.post(reverse('entries:delete', args=[self.entry.id]), {})
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Entry.objects.filter(id=self.entry.id).exists())
 
 
 class EntryCreateViewTest(TestCase):
@@ -91,7 +166,8 @@ class EntryCreateViewTest(TestCase):
         self.assertEqual(Entry.objects.first().name, 'facebook')
         self.assertEqual(Entry.objects.first().url, 'https://facebook.com')
         self.assertEqual(Entry.objects.first().login, 'user')
-        self.assertEqual(Entry.objects.first().password, Crypto().encrypt('password'))
+        self.assertEqual(Crypto().decrypt(Entry.objects.first().password), 'password')
+        self.assertEqual(Entry.objects.first().owner, self.user)
 
 
 class EntryUpdateViewTest(TestCase):
@@ -100,7 +176,7 @@ class EntryUpdateViewTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='rik', password='pass')
-        self.entry = Entry.objects.create(name='facebook', url='https://facebook.com',
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
                                           login='user', password='password')
 
     def test_not_logged_user_entry_update(self):
@@ -136,7 +212,7 @@ class EntryDeleteViewTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='rik', password='pass')
-        self.entry = Entry.objects.create(name='facebook', url='https://facebook.com',
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
                                           login='rik', password='password')
 
     def test_not_logged_user_entry_delete(self):
@@ -169,7 +245,7 @@ class EntryShareViewTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='rik', password='pass')
-        self.entry = Entry.objects.create(name='facebook', url='https://facebook.com',
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
                                           login='rik', password='password')
 
     def test_not_logged_user_entry_share(self):
@@ -182,6 +258,38 @@ class EntryShareViewTest(TestCase):
         response = self.client.get(reverse('entries:share', args=[self.entry.id]))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'entries/entries_share.html')
+        self.assertNotIn('link', response.context)
+
+    def test_logged_user_entry_share_create(self):
+        self.client.force_login(self.user, backend=None)
+        response = self.client.post(reverse('entries:share', args=[self.entry.id]),
+                                    {'expires_in': 3600, 'max_uses': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/entry/share/', response.context['link'])
+        self.assertEqual(response.context['share'].max_uses, 2)
+        self.assertEqual(list(response.context['shares']), [response.context['share']])
+
+    def test_logged_user_entry_share_invalid_options(self):
+        self.client.force_login(self.user, backend=None)
+        response = self.client.post(reverse('entries:share', args=[self.entry.id]), {'expires_in': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+        self.assertFalse(ShareToken.objects.exists())
+
+    def test_logged_user_entry_share_revoke(self):
+        self.client.force_login(self.user, backend=None)
+        response = self.client.post(reverse('entries:share', args=[self.entry.id]))
+        link, share = response.context['link'], response.context['share']
+
+        response = self.client.post(reverse('entries:share-revoke', args=[self.entry.id, share.pk]))
+        self.assertRedirects(response, reverse('entries:share', args=[self.entry.id]))
+        self.assertEqual(self.client.get(link).status_code, 404)
+
+    def test_other_user_entry_share_revoke(self):
+        share = create_share_token(self.entry)[1]
+        self.client.force_login(User.objects.create_user(username='morty', password='pass'), backend=None)
+        response = self.client.post(reverse('entries:share-revoke', args=[self.entry.id, share.pk]))
+        self.assertEqual(response.status_code, 404)
 
     def test_logged_user_entry_share_pk_as_string(self):
         self.client.force_login(self.user, backend=None)
@@ -195,12 +303,12 @@ class EntryShareCheckViewTest(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='rik', password='pass')
-        self.entry = Entry.objects.create(name='facebook', url='https://facebook.com',
+        self.entry = Entry.objects.create(owner=self.user, name='facebook', url='https://facebook.com',
                                           login='rik', password='password')
 
     def test_not_logged_user_entry_share_check(self):
         self.client.force_login(self.user, backend=None)
-        response = self.client.get(reverse('entries:share', args=[self.entry.id]))
+        response = self.client.post(reverse('entries:share', args=[self.entry.id]))
         link = response.context['link']
         self.client.logout()
         response = self.client.get(link)
@@ -208,14 +316,28 @@ class EntryShareCheckViewTest(TestCase):
         self.assertTemplateUsed(response, 'entries/entries_detail.html')
         self.assertContains(response, 'facebook')
 
+        response = self.client.get(response.context['reveal_url'])
+        self.assertEqual(response.json(), {'password': 'password'})
+
     def test_not_logged_user_entry_share_check_invalid_data(self):
-        response = self.client.get('/entry/share/amsa87afbf8327/12531212/12/')
+        response = self.client.get('/entry/share/amsa87afbf8327/')
         self.assertEqual(response.status_code, 404)
 
-    def test_not_logged_user_entry_share_check_invalid_pk(self):
-        self.client.force_login(self.user, backend=None)
-        response = self.client.get(reverse('entries:share', args=[self.entry.id]))
-        link = response.context['link'].replace('/1/', '/123/')
-        self.client.logout()
-        response = self.client.get(link)
+    def test_not_logged_user_entry_share_reveal_invalid_data(self):
+        response = self.client.get('/entry/share/amsa87afbf8327/reveal/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_logged_user_entry_share_check_deleted_entry(self):
+        token = create_share_token(self.entry)[0]
+        self.entry.delete()
+        response = self.client.get(reverse('entries:share-check', args=[token]))
         self.assertEqual(response.status_code, 404)
+
+    def test_not_logged_user_entry_share_reveal_single_use(self):
+        token = create_share_token(self.entry, max_uses=1)[0]
+        self.assertEqual(self.client.get(reverse('entries:share-check', args=[token])).status_code, 200)
+        response = self.client.get(reverse('entries:share-reveal', args=[token]))
+        self.assertEqual(response.json(), {'password': 'password'})
+
+        self.assertEqual(self.client.get(reverse('entries:share-reveal', args=[token])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('entries:share-check', args=[token])).status_code, 404)
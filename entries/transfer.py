@@ -0,0 +1,141 @@
+from django.db.models import Count, Max
+from django.db import transaction
+from itertools import islice
+import json
+import uuid
+import csv
+
+from .signals import post_bulk_create
+from .utils import get_crypto, get_fingerprint
+from .models import Entry
+from .forms import EntryForm
+
+FIELDS = ('name', 'url', 'login', 'password')
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 1000
+
+
+class TransferError(Exception):
+    """Raised when the imported data is malformed or invalid."""
+
+
+class Echo(object):
+    """A pseudo-buffer that returns the written value instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def chunked(iterable, size: int):
+    """Split the given iterable into lists of at most `size` items."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def read_entries(stream, fmt: str):
+    """
+    Lazily read the entries from a text stream in the given format. Every
+    entry is returned as a dictionary with the `FIELDS` keys.
+    """
+    if fmt == 'csv':
+        rows = csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        rows = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise TransferError('Unsupported format: {}'.format(fmt))
+
+    for row in rows:
+        if not isinstance(row, dict):
+            raise TransferError('Each entry has to be an object.')
+        yield {field: row.get(field) or '' for field in FIELDS}
+
+
+def clean_entries(rows, offset: int = 0) -> list:
+    """
+    Validate the given entries with the `EntryForm` and return their cleaned
+    data. The `offset` is the number of the rows before (the invalid rows are
+    reported by their number).
+    """
+    cleaned = []
+    for number, row in enumerate(rows, start=offset + 1):
+        # The imported vault is audited for the breached passwords separately.
+        form = EntryForm(data=row, check_breach=False)
+        if not form.is_valid():
+            errors = '; '.join('{}: {}'.format(field, ' '.join(messages))
+                               for field, messages in form.errors.items())
+            raise TransferError('Entry {} is invalid ({}).'.format(number, errors))
+        cleaned.append(form.cleaned_data)
+    return cleaned
+
+
+def import_entries(rows, owner, batch_size: int = BATCH_SIZE, offset: int = 0, import_id: str = None,
+                   cleaned: bool = False) -> int:
+    """
+    Validate and insert the given entries of the `owner` in chunks of
+    `batch_size`. The passwords of a chunk are encrypted in batch and the
+    rows are inserted using `bulk_create`. Since `bulk_create` skips the
+    `pre_save` signal the passwords are encrypted here instead and the
+    `post_bulk_create` signal is sent for every chunk. Every chunk is
+    committed on its own, so a long import does not hold the write lock of
+    the database for the whole run; an invalid or malformed row stops the
+    import with the chunks before it imported. The inserted rows are tagged
+    with the `import_id` marker (a new one by default) and read back by it
+    on the backends not returning their primary keys, so the rows inserted
+    concurrently are never mixed in. The rows already imported under the
+    given marker are skipped, so an interrupted import is resumed by running
+    it again with the same marker. The `offset` is the number of the rows
+    imported before (the invalid rows are reported by their number). The
+    rows already validated by `clean_entries` are passed with `cleaned` set,
+    so they are not validated again. Returns the number of the entries
+    imported by this call.
+    """
+    crypto = get_crypto()
+    import_id = import_id or uuid.uuid4().hex
+    state = Entry.objects.filter(owner=owner, import_id=import_id).aggregate(done=Count('pk'), last_pk=Max('pk'))
+    done, last_pk, imported = state['done'], state['last_pk'] or 0, 0
+
+    for chunk in chunked(islice(rows, done, None), batch_size):
+        valid = chunk if cleaned else clean_entries(chunk, offset + done + imported)
+        passwords = crypto.encrypt_many(data['password'] for data in valid)
+        entries = [Entry(owner=owner, name=data['name'], url=data['url'], login=data['login'],
+                         password=password, fingerprint=get_fingerprint(owner.pk, data['password']),
+                         import_id=import_id)
+                   for data, password in zip(valid, passwords)]
+        with transaction.atomic():
+            entries = Entry.objects.bulk_create(entries, batch_size=batch_size)
+            if entries[0].pk is None:
+                # Only some backends return the primary keys of the inserted rows.
+                entries = list(Entry.objects.filter(owner=owner, import_id=import_id, pk__gt=last_pk)
+                               .order_by('pk'))
+            post_bulk_create.send(sender=Entry, instances=entries, using=Entry.objects.db)
+        last_pk = entries[-1].pk
+        imported += len(entries)
+
+    return imported
+
+
+def export_entries(queryset, fmt: str, batch_size: int = BATCH_SIZE):
+    """
+    Lazily export the entries of the given queryset in the given format.
+    The rows are fetched with `.iterator()` and decrypted in chunks, so the
+    whole vault is never held in memory. Yields lines of text.
+    """
+    if fmt not in FORMATS:
+        raise TransferError('Unsupported format: {}'.format(fmt))
+
+    writer = csv.writer(Echo())
+    if fmt == 'csv':
+        yield writer.writerow(FIELDS)
+
+    crypto = get_crypto()
+    rows = queryset.values_list(*FIELDS).iterator(chunk_size=batch_size)
+    for chunk in chunked(rows, batch_size):
+        passwords = crypto.decrypt_many(row[3] for row in chunk)
+        for (name, url, login, _), password in zip(chunk, passwords):
+            if fmt == 'csv':
+                yield writer.writerow((name, url, login, password))
+            else:
+                yield json.dumps(dict(zip(FIELDS, (name, url, login, password)))) + '\n'
@@ -1,16 +1,37 @@
 from django.urls import path
 
 from .views import (EntryListView, EntryDetailView, EntryCreateView,
-                    EntryUpdateView, EntryDeleteView, EntryShareView, EntryShareCheckView)
+                    EntryUpdateView, EntryDeleteView, EntryShareView, EntryShareCheckView,
+                    EntryExportView, EntryRevealView, EntryShareRevealView, EntryShareRevokeView,
+                    EntryReusedView, EntryHistoryView, EntryRevisionRestoreView, EntryImportView,
+                    EntryAuditView, JobDetailView, JobCancelView)
+from .api import (EntryApiListView, EntryApiDetailView, EntryApiShareView, EntryApiShareDetailView,
+                  EntrySyncView, JobApiDetailView)
 
 app_name = 'entries'
 urlpatterns = [
     path('', EntryListView.as_view(), name='list'),
     path('entry/create/', EntryCreateView.as_view(), name='create'),
+    path('entry/export/', EntryExportView.as_view(), name='export'),
+    path('entry/import/', EntryImportView.as_view(), name='import'),
+    path('entry/audit/', EntryAuditView.as_view(), name='audit'),
+    path('entry/reused/', EntryReusedView.as_view(), name='reused'),
     path('entry/<int:pk>/', EntryDetailView.as_view(), name='detail'),
     path('entry/<int:pk>/update/', EntryUpdateView.as_view(), name='update'),
     path('entry/<int:pk>/delete/', EntryDeleteView.as_view(), name='delete'),
     path('entry/<int:pk>/share/', EntryShareView.as_view(), name='share'),
-    path('entry/share/<str:hash>/<int:time>/<int:pk>/', EntryShareCheckView.as_view(),
-         name='share-check')
+    path('entry/<int:pk>/reveal/', EntryRevealView.as_view(), name='reveal'),
+    path('entry/<int:pk>/history/', EntryHistoryView.as_view(), name='history'),
+    path('entry/<int:pk>/history/<int:number>/restore/', EntryRevisionRestoreView.as_view(), name='restore'),
+    path('entry/<int:pk>/share/<int:share_pk>/revoke/', EntryShareRevokeView.as_view(), name='share-revoke'),
+    path('entry/share/<str:token>/', EntryShareCheckView.as_view(), name='share-check'),
+    path('entry/share/<str:token>/reveal/', EntryShareRevealView.as_view(), name='share-reveal'),
+    path('job/<int:pk>/', JobDetailView.as_view(), name='job'),
+    path('job/<int:pk>/cancel/', JobCancelView.as_view(), name='job-cancel'),
+    path('api/entries/', EntryApiListView.as_view(), name='api-list'),
+    path('api/entries/<int:pk>/', EntryApiDetailView.as_view(), name='api-detail'),
+    path('api/entries/<int:pk>/share/', EntryApiShareView.as_view(), name='api-share'),
+    path('api/entries/<int:pk>/share/<int:share_pk>/', EntryApiShareDetailView.as_view(), name='api-share-detail'),
+    path('api/sync/', EntrySyncView.as_view(), name='api-sync'),
+    path('api/jobs/<int:pk>/', JobApiDetailView.as_view(), name='api-job'),
 ]
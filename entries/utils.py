@@ -1,19 +1,93 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import salted_hmac
+from Crypto.Random import get_random_bytes
+from collections import OrderedDict
+from django.conf import settings
 from Crypto.Cipher import AES
+from manager.instrumentation import instrument
+import functools
+import threading
+import binascii
+import hashlib
 import base64
 
 PRIVATE_SECRET_KEY = '/^;<90Bo5r;.P[xlg4:58O`,EAQQ3?,1'
 
+ENVELOPE_VERSION = 'v2'
+ENVELOPE_SEPARATOR = '$'
+ENVELOPE_PREFIX = ENVELOPE_VERSION + ENVELOPE_SEPARATOR + '{}' + ENVELOPE_SEPARATOR
+DEFAULT_KEY_ID = 'default'
 
-class Crypto(object):
+
+class CipherProvider(object):
     """
-    A crypto engine that provides encryption and decryption of passwords
-    stored in the database. It uses a AES algorithm to ensure password
-    security and strong cryptography.
+    A process-wide provider of the AES-ECB cipher objects of the legacy
+    engine. Expanding the AES key schedule is the most expensive part of the
+    legacy crypto setup, so the provider keeps a bounded LRU cache of ready
+    to use ciphers keyed by the key id. The cache is guarded by a lock and
+    can be safely shared between threads.
+
+    NOTE: It does not help the envelope (AES-GCM) passwords. A GCM cipher
+    object is bound to its nonce and cannot be reused for another value, so
+    `seal` and `unseal` create a new one for every value.
     """
 
-    def __init__(self, key: str = PRIVATE_SECRET_KEY) -> None:
+    def __init__(self, maxsize: int = 16) -> None:
+        self.maxsize = maxsize
+        self._ciphers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ciphers)
+
+    def get(self, key_id: str, key: str):
+        """Return a cached cipher for the `key_id` or create a new one."""
+        with self._lock:
+            cipher = self._ciphers.get(key_id)
+            if cipher is not None:
+                self._ciphers.move_to_end(key_id)
+                return cipher
+
+        cipher = AES.new(key.encode(), AES.MODE_ECB)
+
+        with self._lock:
+            cipher = self._ciphers.setdefault(key_id, cipher)
+            self._ciphers.move_to_end(key_id)
+            while len(self._ciphers) > self.maxsize:
+                self._ciphers.popitem(last=False)
+        return cipher
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ciphers.clear()
+
+
+cipher_provider = CipherProvider()
+
+
+def get_key_id(key: str) -> str:
+    """Return a short, non-reversible identifier of the given key."""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+PRIVATE_SECRET_KEY_ID = get_key_id(PRIVATE_SECRET_KEY)
+
+
+class LegacyCrypto(object):
+    """
+    The crypto engine of the passwords stored before the envelope format
+    (version 1). It uses the AES algorithm in the ECB mode with the single
+    hard-coded key. The passwords are kept readable until they are rotated
+    using the `rotate_keys` command.
+
+    The underlying cipher is shared through the `cipher_provider`, so
+    creating a new engine is cheap.
+    """
+
+    def __init__(self, key: str = PRIVATE_SECRET_KEY, key_id: str = None) -> None:
         self.bs = 16
-        self.cipher = AES.new(key.encode(), AES.MODE_ECB)
+        self.key_id = key_id or get_key_id(key)
+        self.cipher = cipher_provider.get(self.key_id, key)
 
     def _pad(self, text: str) -> str:
         return text + (self.bs - len(text) % self.bs) * chr(self.bs - len(text) % self.bs)
@@ -30,3 +104,165 @@ class Crypto(object):
         decoded = base64.b64decode(password)
         decrypted = self.cipher.decrypt(decoded)
         return str(self._unpad(decrypted), 'utf-8')
+
+    @instrument('crypto', 'decrypt', count=lambda self, passwords: len(passwords) if isinstance(passwords, list) else 1)
+    def decrypt_many(self, passwords) -> list:
+        """
+        Decrypt the given iterable of passwords at once. All the ciphertexts
+        are joined into a single buffer and decrypted in one cipher call,
+        then the plaintexts are sliced out of it without extra copies.
+        """
+        decoded = [base64.b64decode(password) for password in passwords]
+        if not decoded:
+            return []
+
+        decrypted = memoryview(self.cipher.decrypt(b''.join(decoded)))
+        plaintexts, offset = [], 0
+        for block in decoded:
+            end = offset + len(block)
+            plaintexts.append(str(decrypted[offset:end - decrypted[end - 1]], 'utf-8'))
+            offset = end
+        return plaintexts
+
+
+@functools.lru_cache(maxsize=8)
+def parse_keyring(value: str) -> OrderedDict:
+    """
+    Parse the keyring setting, i.e. comma separated `<key id>:<key>` pairs
+    where the key is a base64 encoded 256-bit key. Returns an ordered
+    dictionary of the keys (as bytes) by their ids.
+    """
+    keyring = OrderedDict()
+    for item in filter(None, (item.strip() for item in value.split(','))):
+        key_id, _sep, key = item.partition(':')
+        try:
+            key = base64.b64decode(key, validate=True)
+        except binascii.Error:
+            key = b''
+        if not key_id or ENVELOPE_SEPARATOR in key_id or len(key_id) > 32 or len(key) != 32:
+            raise ImproperlyConfigured('Invalid ENTRIES_KEYRING item "{}".'.format(key_id))
+        keyring[key_id] = key
+    return keyring
+
+
+def get_keyring() -> OrderedDict:
+    """
+    Return the keyring the passwords are encrypted with. The first key of the
+    `ENTRIES_KEYRING` setting is the primary one, which encrypts the new
+    passwords, the other ones only decrypt the passwords not rotated yet.
+    Without the setting, a single key derived from the legacy key is used.
+    """
+    keyring = parse_keyring(getattr(settings, 'ENTRIES_KEYRING', ''))
+    if not keyring:
+        keyring = OrderedDict([(DEFAULT_KEY_ID, hashlib.sha256(PRIVATE_SECRET_KEY.encode()).digest())])
+    return keyring
+
+
+class Crypto(object):
+    """
+    A crypto engine that provides encryption and decryption of passwords
+    stored in the database. The passwords are encrypted using AES-GCM with
+    a random nonce into a versioned envelope:
+
+        v2$<key id>$<base64 of nonce, tag and ciphertext>
+
+    The version and the key id are authenticated together with the password.
+    The envelope names the key of the keyring it was encrypted with, so the
+    keys can be rotated. The values without the envelope are decrypted using
+    the `LegacyCrypto` engine.
+    """
+
+    def __init__(self, keyring: OrderedDict = None) -> None:
+        self.keyring = keyring if keyring is not None else get_keyring()
+        self.key_id = next(iter(self.keyring))
+        self.legacy = LegacyCrypto(PRIVATE_SECRET_KEY, PRIVATE_SECRET_KEY_ID)
+
+    @instrument('crypto')
+    def encrypt(self, password: str) -> str:
+        header = ENVELOPE_SEPARATOR.join((ENVELOPE_VERSION, self.key_id))
+        sealed = seal(password.encode('utf-8'), self.keyring[self.key_id], header.encode())
+        return ENVELOPE_SEPARATOR.join((header, str(base64.b64encode(sealed), 'utf-8')))
+
+    def encrypt_many(self, passwords) -> list:
+        """Encrypt the given iterable of passwords, each with its own nonce."""
+        return [self.encrypt(password) for password in passwords]
+
+    @instrument('crypto')
+    def decrypt(self, password: str) -> str:
+        if not is_envelope(password):
+            return self.legacy.decrypt(password)
+
+        version, key_id, sealed = password.split(ENVELOPE_SEPARATOR, 2)
+        if key_id not in self.keyring:
+            raise ValueError('Unknown key "{}".'.format(key_id))
+        header = ENVELOPE_SEPARATOR.join((version, key_id))
+        return str(unseal(base64.b64decode(sealed), self.keyring[key_id], header.encode()), 'utf-8')
+
+    def decrypt_many(self, passwords) -> list:
+        """
+        Decrypt the given iterable of passwords. Only the legacy passwords are
+        decrypted in a batch (a single cipher call of the legacy engine), the
+        envelope passwords are decrypted one by one, each with its own cipher
+        setup (see `unseal`), which takes about half of the time.
+        """
+        passwords = list(passwords)
+        legacy = [index for index, password in enumerate(passwords) if not is_envelope(password)]
+        plaintexts = [self.decrypt(password) if is_envelope(password) else None for password in passwords]
+        for index, plaintext in zip(legacy, self.legacy.decrypt_many([passwords[index] for index in legacy])):
+            plaintexts[index] = plaintext
+        return plaintexts
+
+    def needs_rotation(self, password: str) -> bool:
+        """Tell whether the password is not encrypted with the primary key yet."""
+        return not password.startswith(ENVELOPE_PREFIX.format(self.key_id))
+
+    def rotate(self, password: str) -> str:
+        """Re-encrypt the password with the primary key (if needed)."""
+        return self.encrypt(self.decrypt(password)) if self.needs_rotation(password) else password
+
+
+def is_envelope(password: str) -> bool:
+    """Tell whether the encrypted password uses the envelope format."""
+    return password.startswith(ENVELOPE_VERSION + ENVELOPE_SEPARATOR)
+
+
+def get_crypto() -> Crypto:
+    """Return a crypto engine using the configured keyring."""
+    return Crypto(get_keyring())
+
+
+def get_fingerprint(owner_id: int, password: str) -> str:
+    """
+    Return the keyed fingerprint (HMAC-SHA256) of the password of the given
+    user. The same passwords of a user have the same fingerprints, so the
+    reused passwords are found without decrypting them, while the fingerprints
+    of different users never match. The fingerprints depend on `SECRET_KEY`.
+    """
+    return salted_hmac('entries.fingerprint', '{}:{}'.format(owner_id, password), algorithm='sha256').hexdigest()
+
+
+def seal(data: bytes, key: bytes, associated_data: bytes = b'') -> bytes:
+    """
+    Encrypt and authenticate the given data (and the associated data) using
+    AES-GCM with a random nonce. Returns the nonce, the tag and the
+    ciphertext joined together. A new cipher (the key schedule and the GHASH
+    key) is set up for every call, since a GCM cipher cannot be reused with
+    another nonce.
+    """
+    nonce = get_random_bytes(12)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(associated_data)
+    ciphertext, tag = cipher.encrypt_and_digest(data)
+    return nonce + tag + ciphertext
+
+
+def unseal(token: bytes, key: bytes, associated_data: bytes = b'') -> bytes:
+    """
+    Decrypt the data sealed with the `seal` function. Raises `ValueError`
+    when the data has been tampered with or sealed with another key. As with
+    `seal`, a new cipher is set up for every call.
+    """
+    nonce, tag, ciphertext = token[:12], token[12:28], token[28:]
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(associated_data)
+    return cipher.decrypt_and_verify(ciphertext, tag)
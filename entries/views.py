@@ -2,47 +2,148 @@ from django.contrib.messages.views import SuccessMessageMixin
 from django.views.generic import (ListView, DetailView, CreateView,
                                   UpdateView, DeleteView, View)
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.cache import add_never_cache_headers
+from django.template.response import TemplateResponse
 from django.utils.translation import ugettext as _
 from django.urls import reverse, reverse_lazy
-from django.http import Http404
-from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
-from django.shortcuts import render
-import hashlib
-import time
+from django.shortcuts import render, redirect, get_object_or_404
+from manager.metrics import share_link_validations
+from manager.routers import is_reading_replicas
+from asgiref.sync import sync_to_async
 
-from .models import Entry
-from .forms import EntryForm
+from .concurrency import AsyncViewMixin, AsyncLoginRequiredMixin, run_crypto
+from .paginator import CursorPaginator, InvalidCursor
+from .transfer import FORMATS, export_entries
+from .sharing import (InvalidShareToken, create_share_token, get_active_share_tokens,
+                      resolve_share_token, revoke_share_token)
+from .reuse import find_reused_passwords, get_reuse_count
+from .jobs import cancel_job, enqueue_job
+from .revisions import restore_revision
+from .breach import get_breach_index
+from .search import search_entries
+from .cache import get_entry_count, get_list_page, get_page_key, is_cache_shared, set_list_page
+from .utils import get_crypto
+from .forms import EntryForm, ImportForm, ShareTokenForm
+from .models import Entry, EntryRevision, Job, ShareToken
 
 
-class EntryListView(LoginRequiredMixin, ListView):
+async def reveal_password(entry: Entry) -> JsonResponse:
+    """
+    Respond with the password of the entry decrypted in the crypto thread
+    pool. The response is never cached.
+    """
+    response = JsonResponse({'password': await run_crypto(get_crypto().decrypt, entry.password)})
+    add_never_cache_headers(response)
+    return response
+
+
+def warn_about_reuse(request, entry: Entry) -> None:
+    """Warn the user when the password of the saved entry is used by other entries too."""
+    count = get_reuse_count(entry)
+    if count:
+        messages.warning(request, _('The password is also used by %(count)d other entries.') % {'count': count})
+
+
+class EntryOwnerMixin(object):
+    """Limits the entries available in the view to the entries of the logged user."""
+
+    def get_queryset(self):
+        return Entry.objects.filter(owner=self.request.user)
+
+
+class EntryListView(AsyncLoginRequiredMixin, EntryOwnerMixin, ListView):
     """
     The entries list view. This view is used to display all entries
-    from the database.
+    from the database. The entries are paginated with opaque cursors
+    instead of page numbers. With a cache shared by all the processes,
+    the rendered pages are cached (sealed) until any entry of the user
+    changes. The passwords are neither loaded nor decrypted, they are
+    fetched from the reveal view on demand. The view is asynchronous,
+    the database and the cache are accessed in a thread.
     """
     model = Entry
     context_object_name = 'entries'
     template_name = 'entries/entries_list.html'
     paginate_by = 10
 
+    async def get(self, request, *args, **kwargs):
+        response = await sync_to_async(self.get_page)(request, *args, **kwargs)
+        # The template response is rendered by the handler (in a thread too).
+        return response
+
+    def get_page(self, request, *args, **kwargs):
+        if not is_cache_shared() or len(messages.get_messages(request)):
+            # The pages with the messages are not cached nor served from the cache. Neither are the pages
+            # of a cache kept by every process, as they would not be invalidated by the other processes.
+            return super().get(request, *args, **kwargs)
+
+        # The version of the vault is read once, before the entries are queried.
+        key = get_page_key(request.user.pk, request.GET.get('q', ''), request.GET.get('cursor', ''))
+        content = get_list_page(key)
+        if content is not None:
+            return HttpResponse(content)
+
+        response = super().get(request, *args, **kwargs)
+        if not is_reading_replicas():
+            # A replica may lag behind the version of the vault, the pages read from it are not cached.
+            response.add_post_render_callback(lambda response: set_list_page(key, response.content))
+        return response
+
     def get_queryset(self):
-        try:
-            query_name = self.request.GET.get('q')
-            queryset = Entry.objects.filter(name__contains=query_name)
-        except ValueError:
-            queryset = Entry.objects.all()
+        queryset = super().get_queryset().defer('password')
+        query = self.request.GET.get('q')
+        if query:
+            queryset = search_entries(queryset, query, owner_id=self.request.user.pk)
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404(_('Invalid cursor.'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['entry_count'] = get_entry_count(self.request.user)
+        return context
+
 
-class EntryDetailView(LoginRequiredMixin, DetailView):
+class EntryDetailView(AsyncLoginRequiredMixin, EntryOwnerMixin, DetailView):
     """
     The entry detail view. This view is used to display detailed informations
-    about a specific entry in the database.
+    about a specific entry in the database. The password is fetched from
+    the reveal view on demand.
     """
-    queryset = Entry.objects.all()
     context_object_name = 'entry'
     template_name = 'entries/entries_detail.html'
 
+    async def get(self, request, *args, **kwargs):
+        self.object = await sync_to_async(self.get_object)()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_queryset(self):
+        return super().get_queryset().defer('password')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['reveal_url'] = reverse('entries:reveal', args=[self.object.pk])
+        return context
+
+
+class EntryRevealView(AsyncLoginRequiredMixin, EntryOwnerMixin, View):
+    """
+    The entry reveal view. This view is used to decrypt the password of
+    a specific entry when the user wants to show or copy it.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        entry = await sync_to_async(get_object_or_404)(self.get_queryset(), pk=kwargs['pk'])
+        return await reveal_password(entry)
+
 
 class EntryCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     """
@@ -54,8 +155,14 @@ class EntryCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     success_url = reverse_lazy('entries:list')
     success_message = _('Entry successfully created.')
 
+    def form_valid(self, form):
+        form.instance.owner = self.request.user
+        response = super().form_valid(form)
+        warn_about_reuse(self.request, self.object)
+        return response
 
-class EntryUpdateView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
+
+class EntryUpdateView(LoginRequiredMixin, EntryOwnerMixin, SuccessMessageMixin, UpdateView):
     """
     The entry update view. This view is used to update existing entries
     in the database.
@@ -70,11 +177,16 @@ class EntryUpdateView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
             cleaned_data, name=self.object.name
         )
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        warn_about_reuse(self.request, self.object)
+        return response
+
     def get_success_url(self):
         return reverse('entries:detail', args=[self.object.pk])
 
 
-class EntryDeleteView(LoginRequiredMixin, DeleteView):
+class EntryDeleteView(LoginRequiredMixin, EntryOwnerMixin, DeleteView):
     """
     The entry delete view. This view is used to delete a specific
     entry from the database and redirect the user to the home page.
@@ -89,51 +201,216 @@ class EntryDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class EntryShareView(LoginRequiredMixin, View):
+class EntryShareView(LoginRequiredMixin, EntryOwnerMixin, View):
     """
     The entry share view. This view is used to create a URL that allows
-    access to a specific entry.
+    access to a specific entry and to list the active URLs of the entry.
 
     URL FORMAT:
-        http://exmaple.com/entry/share/<hash>/<time>/<pk>/
+        http://exmaple.com/entry/share/<token>/
     WHERE:
-        * hash - MD5 hash of (`SHARE_SECRET_SALT` + expiration time + pk).
-        * time - time of entry expiry (UNIX timestamp in seconds).
-        * pk - primary key of the entry.
+        * token - random token, only its HMAC is stored (see `ShareToken`).
     """
+    template_name = 'entries/entries_share.html'
+
+    def render_page(self, entry: Entry, form: ShareTokenForm, **context):
+        context.update(entry=entry, form=form, shares=get_active_share_tokens(entry))
+        return render(self.request, self.template_name, context)
 
     def get(self, request, *args, **kwargs):
-        SHARE_SECRET_SALT = settings.SHARE_SECRET_SALT
+        entry = get_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        return self.render_page(entry, ShareTokenForm())
 
-        expiration_time = int(time.time()) + 5 * 60
-        to_hash = '{salt}{time}{pk}'.format(salt=SHARE_SECRET_SALT,
-                                            time=expiration_time,
-                                            pk=kwargs['pk'])
-        link_hash = hashlib.md5(to_hash.encode('utf-8')).hexdigest()
+    def post(self, request, *args, **kwargs):
+        entry = get_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        form = ShareTokenForm(request.POST)
+        if not form.is_valid():
+            return self.render_page(entry, form)
 
-        link = reverse('entries:share-check',
-                       kwargs={'hash': link_hash, 'time': expiration_time, 'pk': kwargs['pk']})
-        link = request.build_absolute_uri(link)
-        return render(request, 'entries/entries_share.html', {'link': link})
+        token, share = create_share_token(entry, form.cleaned_data['expires_in'], form.cleaned_data['max_uses'])
+        link = request.build_absolute_uri(reverse('entries:share-check', args=[token]))
+        return self.render_page(entry, ShareTokenForm(), link=link, share=share)
 
 
-class EntryShareCheckView(View):
+class EntryShareRevokeView(LoginRequiredMixin, View):
+    """
+    The entry share revoke view. This view is used to revoke a URL that
+    allows access to a specific entry before it expires.
+    """
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        share = get_object_or_404(ShareToken, pk=kwargs['share_pk'], entry_id=kwargs['pk'],
+                                  entry__owner=request.user)
+        revoke_share_token(share)
+        messages.success(request, _('The share link has been revoked.'))
+        return redirect('entries:share', pk=kwargs['pk'])
+
+
+class EntryShareCheckView(AsyncViewMixin, View):
     """
     The entry share check view. This view is used to validate a shared
-    URL and gives permission to a specific entry.
+    URL and gives permission to a specific entry. Displaying the entry
+    does not count as a use of the URL, only revealing the password does.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            entry = await sync_to_async(resolve_share_token)(kwargs['token'])
+        except InvalidShareToken as exc:
+            share_link_validations.inc(result=exc.reason)
+            raise Http404
+        share_link_validations.inc(result='valid')
+
+        reveal_url = reverse('entries:share-reveal', kwargs=kwargs)
+        return TemplateResponse(request, 'entries/entries_detail.html', {'entry': entry, 'reveal_url': reveal_url})
+
+
+class EntryShareRevealView(AsyncViewMixin, View):
+    """
+    The entry share reveal view. This view is used to decrypt the password
+    of a shared entry while the share link is valid. Every reveal counts
+    as a use of the URL.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            entry = await sync_to_async(resolve_share_token)(kwargs['token'], use=True)
+        except InvalidShareToken:
+            raise Http404
+        return await reveal_password(entry)
+
+
+class EntryHistoryView(LoginRequiredMixin, ListView):
+    """
+    The entry history view. This view is used to display the revisions
+    of a specific entry, latest first.
+    """
+    context_object_name = 'revisions'
+    template_name = 'entries/entries_history.html'
+    paginate_by = 20
+
+    def get_queryset(self):
+        entries = Entry.objects.filter(owner=self.request.user).defer('password')
+        self.entry = get_object_or_404(entries, pk=self.kwargs['pk'])
+        return self.entry.revisions.defer('data').order_by('-number')
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(entry=self.entry, **kwargs)
+
+
+class EntryRevisionRestoreView(LoginRequiredMixin, View):
+    """
+    The entry revision restore view. This view is used to restore a specific
+    entry to the state of one of its revisions.
+    """
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        revision = get_object_or_404(EntryRevision.objects.select_related('entry'), entry_id=kwargs['pk'],
+                                     entry__owner=request.user, number=kwargs['number'])
+        try:
+            restore_revision(revision)
+        except EntryRevision.DoesNotExist:
+            raise Http404
+        messages.success(request, _('Entry restored to the revision %(number)d.') % {'number': revision.number})
+        return redirect('entries:detail', pk=kwargs['pk'])
+
+
+class EntryReusedView(LoginRequiredMixin, View):
+    """
+    The reused passwords view. This view is used to display the groups of
+    the entries of the user sharing the same password.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return render(request, 'entries/entries_reused.html', {'groups': find_reused_passwords(request.user)})
+
+
+class EntryImportView(LoginRequiredMixin, View):
+    """
+    The entry import view. This view is used to upload a CSV or JSON lines
+    file of entries, which are imported in the background by the `run_jobs`
+    worker, so a large file never blocks the request.
     """
 
     def get(self, request, *args, **kwargs):
-        SHARE_SECRET_SALT = settings.SHARE_SECRET_SALT
+        return render(request, 'entries/entries_import.html', {'form': ImportForm()})
+
+    def post(self, request, *args, **kwargs):
+        form = ImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, 'entries/entries_import.html', {'form': form})
+
+        job = enqueue_job(Job.IMPORT, owner=request.user, params={'format': form.cleaned_data['format']},
+                          payload=form.cleaned_data['text'])
+        return redirect('entries:job', pk=job.pk)
 
-        url_hash, url_time, url_pk = kwargs['hash'], kwargs['time'], kwargs['pk']
-        to_hash = '{salt}{time}{pk}'.format(salt=SHARE_SECRET_SALT,
-                                            time=url_time,
-                                            pk=url_pk)
-        link_hash = hashlib.md5(to_hash.encode('utf-8')).hexdigest()
 
-        if link_hash != url_hash or (int(time.time()) - url_time) > 0:
+class EntryAuditView(LoginRequiredMixin, View):
+    """
+    The entry audit view. This view is used to check the passwords of all
+    entries of the user against the breach index in the background.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return render(request, 'entries/entries_audit.html', {'available': get_breach_index() is not None})
+
+    def post(self, request, *args, **kwargs):
+        if get_breach_index() is None:
+            messages.error(request, _('The breach index is not available.'))
+            return redirect('entries:audit')
+        job = enqueue_job(Job.AUDIT, owner=request.user)
+        return redirect('entries:job', pk=job.pk)
+
+
+class JobDetailView(LoginRequiredMixin, DetailView):
+    """
+    The job view. This view is used to display the status and the result of
+    a background job of the user. The progress is polled from the job API.
+    """
+    context_object_name = 'job'
+    template_name = 'entries/entries_job.html'
+
+    def get_queryset(self):
+        return Job.objects.filter(owner=self.request.user).defer('payload')
+
+    def get_context_data(self, **kwargs):
+        breached = self.object.result.get('breached')
+        if breached:
+            kwargs['entries'] = Entry.objects.filter(owner=self.request.user, pk__in=breached) \
+                .defer('password').order_by('name')
+        return super().get_context_data(**kwargs)
+
+
+class JobCancelView(LoginRequiredMixin, View):
+    """
+    The job cancel view. This view is used to cancel a pending or running
+    background job of the user.
+    """
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        job = get_object_or_404(Job.objects.defer('payload'), pk=kwargs['pk'], owner=request.user)
+        if cancel_job(job):
+            messages.success(request, _('Job cancelled.'))
+        return redirect('entries:job', pk=job.pk)
+
+
+class EntryExportView(LoginRequiredMixin, EntryOwnerMixin, View):
+    """
+    The entry export view. This view is used to download all entries of
+    the user as a CSV or JSON lines file. The response is streamed, so the whole
+    vault is never loaded into memory.
+    """
+    content_types = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in FORMATS:
             raise Http404
 
-        entry = Entry.objects.get(pk=kwargs['pk'])
-        return render(request, 'entries/entries_detail.html', {'entry': entry})
+        response = StreamingHttpResponse(export_entries(self.get_queryset().order_by('pk'), fmt),
+                                         content_type=self.content_types[fmt])
+        response['Content-Disposition'] = 'attachment; filename="entries.{}"'.format(fmt)
+        return response
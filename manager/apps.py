@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ManagerConfig(AppConfig):
+    name = 'manager'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.core.signals import request_finished, request_started
+        from .database import configure_connection, check_connections, mark_connections_used
+
+        connection_created.connect(configure_connection)
+        request_started.connect(check_connections)
+        request_finished.connect(mark_connections_used)
@@ -0,0 +1,38 @@
+from django.db import connections
+from django.conf import settings
+import time
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Apply the `SQLITE_PRAGMAS` to every new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute('PRAGMA {} = {}'.format(name, value))
+
+
+def check_connections(**kwargs):
+    """
+    Close the persistent connections which cannot be used anymore (e.g. after
+    the database server has been restarted), so the request opens a new
+    connection instead of failing on the first query. Only the connections
+    idle for `DB_CHECK_IDLE_SECONDS` are checked, the check costs a round trip
+    to the database. The connections broken by an error and those older than
+    `CONN_MAX_AGE` are closed by Django itself (`close_old_connections`).
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if now - getattr(connection, 'last_used_at', 0) < settings.DB_CHECK_IDLE_SECONDS:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def mark_connections_used(**kwargs):
+    """Remember when the open connections have been used for the last time (at the end of every request)."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used_at = now
@@ -0,0 +1,212 @@
+from django.db.backends.signals import connection_created
+from asgiref.sync import markcoroutinefunction
+from django.db import connections
+from django.conf import settings
+from contextvars import ContextVar
+import functools
+import asyncio
+import cProfile
+import logging
+import pstats
+import random
+import time
+import json
+import io
+
+from . import metrics as prometheus
+
+logger = logging.getLogger('manager.requests')
+
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics(object):
+    """
+    The performance metrics of a single request: the number and the total
+    time of the SQL queries and the crypto calls, the template render time
+    and the total time of the request. The times are kept in seconds.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.counts = {'sql': 0, 'crypto': 0}
+        self.times = {'sql': 0.0, 'crypto': 0.0, 'render': 0.0}
+
+    def record(self, kind: str, duration: float, count: int = 1) -> None:
+        self.times[kind] += duration
+        if kind in self.counts:
+            self.counts[kind] += count
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Return the metrics as the value of the `Server-Timing` header."""
+        return ', '.join([
+            'sql;dur={:.2f};desc="{} queries"'.format(self.times['sql'] * 1000, self.counts['sql']),
+            'crypto;dur={:.2f};desc="{} calls"'.format(self.times['crypto'] * 1000, self.counts['crypto']),
+            'render;dur={:.2f}'.format(self.times['render'] * 1000),
+            'total;dur={:.2f}'.format(self.total * 1000),
+        ])
+
+    def to_dict(self) -> dict:
+        return {
+            'sql_count': self.counts['sql'],
+            'sql_ms': round(self.times['sql'] * 1000, 2),
+            'crypto_count': self.counts['crypto'],
+            'crypto_ms': round(self.times['crypto'] * 1000, 2),
+            'render_ms': round(self.times['render'] * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+def get_metrics():
+    """Return the metrics of the current request or `None` outside of a request."""
+    return _metrics.get()
+
+
+def instrument(kind: str, operation: str = None, count=None):
+    """
+    Record the calls of the decorated function in the metrics of the current
+    request (if any) and in the process-wide `<kind>` operation metrics,
+    labelled with the `operation` (the name of the function by default).
+    The optional `count` function returns the number of operations of a call
+    from its arguments (a single operation by default).
+    """
+    def decorator(func):
+        counters = prometheus.OPERATIONS[kind]
+        labels = {'operation': operation or func.__name__}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - started
+                number = count(*args, **kwargs) if count else 1
+                counters[0].inc(number, **labels)
+                counters[1].inc(duration, **labels)
+                metrics = _metrics.get()
+                if metrics is not None:
+                    metrics.record(kind, duration, number)
+        return wrapper
+    return decorator
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Record the SQL queries executed during a request (see `execute_wrapper`)."""
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record('sql', time.perf_counter() - started)
+
+
+def install_sql_wrapper(connection, **kwargs) -> None:
+    """Install the `sql_wrapper` on the given connection (once)."""
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+class InstrumentationMiddleware(object):
+    """
+    Records the performance metrics of every request. The metrics are sent
+    in the `Server-Timing` header (when the `SERVER_TIMING` setting is set)
+    and logged as JSON by the `manager.requests` logger. A `PROFILE_SAMPLE_RATE`
+    fraction of the requests is profiled and the profile of those slower
+    than `SLOW_REQUEST_THRESHOLD` milliseconds is logged as well. Every
+    request is also counted in the Prometheus metrics by its URL name.
+
+    The middleware runs natively under both WSGI and ASGI. The requests
+    served asynchronously are not profiled, since the event loop runs the
+    other requests in the same thread meanwhile.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.server_timing = getattr(settings, 'SERVER_TIMING', False)
+        self.sample_rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', 1000) / 1000
+        # The connections are thread-local, the queries of the asynchronous
+        # requests run in other threads, so the wrapper is installed on every
+        # new connection as well.
+        connection_created.connect(install_sql_wrapper, dispatch_uid='manager.instrumentation')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        for connection in connections.all():
+            install_sql_wrapper(connection)
+
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        profiler = cProfile.Profile() if self.sample_rate and random.random() < self.sample_rate else None
+        try:
+            if profiler is not None:
+                profiler.enable()
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            metrics.finish()
+            _metrics.reset(token)
+        return self.process_metrics(request, response, metrics, profiler)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish()
+            _metrics.reset(token)
+        return self.process_metrics(request, response, metrics, None)
+
+    def process_metrics(self, request, response, metrics: RequestMetrics, profiler):
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing()
+        self.log(request, response, metrics, profiler)
+        self.observe(request, response, metrics)
+        return response
+
+    def observe(self, request, response, metrics: RequestMetrics) -> None:
+        """Record the request in the Prometheus metrics."""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        prometheus.http_requests.inc(view=view, method=method, status=response.status_code)
+        prometheus.http_request_duration.observe(metrics.total, view=view)
+        prometheus.registry.flush()
+
+    def process_template_response(self, request, response):
+        metrics = _metrics.get()
+        if metrics is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda response: metrics.record('render', time.perf_counter() - started))
+        return response
+
+    def log(self, request, response, metrics: RequestMetrics, profiler) -> None:
+        slow = metrics.total > self.slow_threshold
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+
+        data = dict(metrics.to_dict(), method=request.method, path=request.path, status=response.status_code)
+        logger.log(level, json.dumps(data), extra={'metrics': data})
+        if slow and profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+            logger.warning('Profile of %s %s:\n%s', request.method, request.path, stream.getvalue())
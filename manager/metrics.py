@@ -0,0 +1,190 @@
+from django.conf import settings
+import threading
+import tempfile
+import glob
+import json
+import math
+import time
+import os
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+FLUSH_INTERVAL = 1.0
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    escaped = ('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Registry(object):
+    """
+    A registry of the metrics aggregated in the process. Every thread
+    increments the samples in its own shard, so recording a sample takes
+    no lock; the shards are merged only when the metrics are collected.
+
+    When the `METRICS_MULTIPROC_DIR` setting is set, every process saves
+    its samples to a file in that directory (at most once per second) and
+    the collected metrics are summed over the files of all processes.
+    """
+
+    def __init__(self) -> None:
+        self.families = {}
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._flushed = 0.0
+
+    def register(self, family) -> None:
+        self.families[family.name] = family
+
+    def _get_shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: tuple, value: float = 1) -> None:
+        shard = self._get_shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def snapshot(self) -> dict:
+        """Return the samples of the process merged from all the shards."""
+        with self._lock:
+            shards = list(self._shards)
+        samples = {}
+        for shard in shards:
+            for key, value in shard.copy().items():
+                samples[key] = samples.get(key, 0) + value
+        return samples
+
+    def get_directory(self):
+        return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+    def flush(self, force: bool = False) -> None:
+        """Save the samples of the process in the multiprocess mode."""
+        directory = self.get_directory()
+        now = time.monotonic()
+        if not directory or (not force and now - self._flushed < FLUSH_INTERVAL):
+            return
+        self._flushed = now
+
+        samples = [[name, labels, value] for (name, labels), value in self.snapshot().items()]
+        fd, path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as stream:
+            json.dump(samples, stream)
+        os.replace(path, os.path.join(directory, 'metrics-{}.json'.format(os.getpid())))
+
+    def collect(self) -> dict:
+        """Return the samples of the process or of all the processes."""
+        directory = self.get_directory()
+        if not directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        samples = {}
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as stream:
+                    data = json.load(stream)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data:
+                key = (name, tuple(tuple(label) for label in labels))
+                samples[key] = samples.get(key, 0) + value
+        return samples
+
+    def render(self) -> str:
+        """Render the collected metrics in the Prometheus text format."""
+        samples = self.collect()
+        lines = []
+        for family in self.families.values():
+            lines.append('# HELP {} {}'.format(family.name, family.documentation))
+            lines.append('# TYPE {} {}'.format(family.name, family.type))
+            lines.extend(family.render(samples))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Counter(object):
+    """A monotonically increasing counter with optional labels."""
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry: Registry = registry) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        registry.register(self)
+
+    def render(self, samples: dict) -> list:
+        return ['{}{} {}'.format(self.name, _format_labels(labels), _format_value(value))
+                for (name, labels), value in sorted(samples.items()) if name == self.name]
+
+    def _labels(self, labels: dict) -> tuple:
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def inc(self, value: float = 1, **labels) -> None:
+        self.registry.inc(self.name, self._labels(labels), value)
+
+
+class Histogram(Counter):
+    """A histogram of the observed values (e.g. durations) with optional labels."""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry: Registry = registry) -> None:
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def render(self, samples: dict) -> list:
+        lines = []
+        for labels in sorted(labels for name, labels in samples if name == self.name + '_count'):
+            # All the buckets are rendered (cumulatively) in their order, including the empty ones.
+            for bucket in self.buckets:
+                bucket_labels = labels + (('le', _format_value(bucket)),)
+                value = samples.get((self.name + '_bucket', bucket_labels), 0)
+                lines.append('{}_bucket{} {}'.format(self.name, _format_labels(bucket_labels), _format_value(value)))
+            for suffix in ('_sum', '_count'):
+                value = samples[(self.name + suffix, labels)]
+                lines.append('{}{}{} {}'.format(self.name, suffix, _format_labels(labels), _format_value(value)))
+        return lines
+
+    def inc(self, value: float = 1, **labels) -> None:
+        raise TypeError('Use the observe method of the histogram.')
+
+    def observe(self, value: float, **labels) -> None:
+        labels = self._labels(labels)
+        for bucket in self.buckets:
+            if value <= bucket:
+                self.registry.inc(self.name + '_bucket', labels + (('le', _format_value(bucket)),))
+        self.registry.inc(self.name + '_sum', labels, value)
+        self.registry.inc(self.name + '_count', labels)
+
+
+http_requests = Counter('http_requests_total', 'Number of the HTTP requests.', ['view', 'method', 'status'])
+http_request_duration = Histogram('http_request_duration_seconds', 'Duration of the HTTP requests.', ['view'])
+crypto_operations = Counter('crypto_operations_total', 'Number of the crypto operations.', ['operation'])
+crypto_duration = Counter('crypto_operation_seconds_total', 'Total time of the crypto operations.', ['operation'])
+share_links_created = Counter('share_links_created_total', 'Number of the created share links.')
+share_link_validations = Counter('share_link_validations_total', 'Number of the share link validations.',
+                                 ['result'])
+logins = Counter('logins_total', 'Number of the sign in attempts.', ['result'])
+
+# The counters of the instrumented operations (see `manager.instrumentation.instrument`) by their kind.
+OPERATIONS = {
+    'crypto': (crypto_operations, crypto_duration),
+}
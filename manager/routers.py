@@ -0,0 +1,151 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from asgiref.sync import markcoroutinefunction
+from contextlib import contextmanager
+from django.conf import settings
+from contextvars import ContextVar
+import asyncio
+import random
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class ReplicaRouting(object):
+    """
+    The replica routing state of a single request. The replicas are used only
+    by the safe requests of the views listed in `REPLICA_VIEWS`, made by the
+    clients which have not written anything for the last `REPLICA_PIN_SECONDS`,
+    so every client reads its own writes. The reads made within `use_primary`
+    always go to the primary database.
+    """
+
+    def __init__(self, enabled: bool, pinned: bool = False, request=None) -> None:
+        self.enabled = enabled
+        self.pinned = pinned
+        self.request = request
+        self.written = False
+        self.primary = 0
+
+    @property
+    def use_replicas(self) -> bool:
+        if not self.enabled or self.pinned or self.written or self.primary:
+            return False
+        # The view is known once the URL has been resolved by the handler.
+        match = getattr(self.request, 'resolver_match', None)
+        return match is not None and match.view_name in getattr(settings, 'REPLICA_VIEWS', ())
+
+
+@contextmanager
+def use_primary():
+    """
+    Send the reads made within the block to the primary database. It is used
+    for the reads the replicas must not serve: the data which is cached under
+    the version of the vault bumped on the primary database, or which tells
+    the client what it has missed.
+    """
+    routing = _routing.get()
+    if routing is None:
+        yield
+        return
+    routing.primary += 1
+    try:
+        yield
+    finally:
+        routing.primary -= 1
+
+
+def get_replicas() -> list:
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_reading_replicas() -> bool:
+    """Tell whether the reads of the `REPLICA_MODELS` made by the current request go to the replicas."""
+    routing = _routing.get()
+    return routing is not None and routing.use_replicas and bool(get_replicas())
+
+
+class ReplicaRouter(object):
+    """
+    Sends the reads of the `REPLICA_MODELS` made by the safe requests to a
+    random replica of the `DATABASE_REPLICAS`. All other reads and all writes
+    go to the primary (default) database, the replicas are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        replicas = get_replicas()
+        if routing is None or not routing.use_replicas or not replicas:
+            return None
+        if model._meta.label not in getattr(settings, 'REPLICA_MODELS', ()):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # The reads inside a transaction see the data of the transaction.
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware(object):
+    """
+    Enables the replica reads for the safe requests. A response to a request
+    which has written to the database sets the `REPLICA_PIN_COOKIE` cookie,
+    which pins the reads of the client to the primary database for the next
+    `REPLICA_PIN_SECONDS`. The middleware runs natively under both WSGI and
+    ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        routing, token = self.start_routing(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.process_routing(routing, response)
+
+    async def __acall__(self, request):
+        # The state is copied to the threads running the synchronous code of the request.
+        routing, token = self.start_routing(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.process_routing(routing, response)
+
+    def start_routing(self, request) -> tuple:
+        routing = ReplicaRouting(enabled=request.method in SAFE_METHODS,
+                                 pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES, request=request)
+        return routing, _routing.set(routing)
+
+    def process_routing(self, routing: ReplicaRouting, response):
+        if routing.written and get_replicas():
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -25,6 +25,11 @@ SECRET_KEY = os.environ.get('SECRET_KEY')
 
 SHARE_SECRET_SALT = 'LH[K8xPYzTVP{.oCoctAe^+2/g1hf0<.'
 
+# The share links expire after `SHARE_LINK_TTL` seconds unless the owner
+# chooses otherwise. Run the `purge_share_tokens` command periodically to
+# remove the expired, revoked and used up links.
+SHARE_LINK_TTL = int(os.environ.get('SHARE_LINK_TTL', 5 * 60))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -41,12 +46,16 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
 
+    'manager',
     'users',
     'entries'
 ]
 
 MIDDLEWARE = [
+    'manager.instrumentation.InstrumentationMiddleware',
+    'manager.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'manager.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,18 +83,161 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'manager.wsgi.application'
+ASGI_APPLICATION = 'manager.asgi.application'
+
+# The performance metrics of the requests (the SQL queries, the crypto calls,
+# the template rendering) are sent in the `Server-Timing` header when enabled.
+# A `PROFILE_SAMPLE_RATE` fraction of the requests is profiled, the profiles
+# of the requests slower than `SLOW_REQUEST_THRESHOLD` ms are logged.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', str(DEBUG)).lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+SLOW_REQUEST_THRESHOLD = int(os.environ.get('SLOW_REQUEST_THRESHOLD', 1000))
+
+# The metrics are exported at `/metrics` to the staff users, the clients
+# sending the `METRICS_TOKEN` in the `Authorization: Bearer <token>` header and
+# the clients from the comma separated `METRICS_ALLOWED_IPS` addresses. No
+# address is allowed by default: behind a proxy on the same host every client
+# comes from the loopback address. With multiple worker processes set
+# `METRICS_MULTIPROC_DIR` to a directory shared by them (emptied on deploy).
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+
+# The keys the passwords are encrypted with: comma separated `<key id>:<key>`
+# pairs, where the key is a base64 encoded 256-bit key. The first key encrypts
+# the new passwords, the others are kept to decrypt the passwords until they
+# are re-encrypted using the `rotate_keys` command.
+ENTRIES_KEYRING = os.environ.get('ENTRIES_KEYRING', '')
+
+# The retention of the entry revisions: the `REVISION_MAX_COUNT` latest
+# revisions of every entry not older than `REVISION_MAX_AGE` days are kept by
+# the `prune_revisions` command.
+REVISION_MAX_COUNT = int(os.environ.get('REVISION_MAX_COUNT', 50))
+REVISION_MAX_AGE = int(os.environ.get('REVISION_MAX_AGE', 365))
+
+# The background jobs are run by the `run_jobs` command, which checks for new
+# jobs every `JOB_POLL_INTERVAL` seconds. A running job without a progress
+# report for `JOB_STALE_SECONDS` is resumed by another worker, at most
+# `JOB_MAX_ATTEMPTS` times. The imported files are limited to
+# `IMPORT_MAX_SIZE` bytes.
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 5 * 60))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+IMPORT_MAX_SIZE = int(os.environ.get('IMPORT_MAX_SIZE', 10 * 1024 * 1024))
+
+# The path of the breach index built using the `build_breach_index` command.
+# The passwords of the entries found in the index are rejected.
+BREACH_INDEX_PATH = os.environ.get('BREACH_INDEX_PATH')
+
+# The sign in attempts are limited to `SIGNIN_IP_LIMIT` per client address and
+# `SIGNIN_USERNAME_LIMIT` per username in any `SIGNIN_LIMIT_WINDOW` seconds.
+# The counters are kept in the `RATELIMIT_CACHE` cache. Behind a reverse proxy
+# set `CLIENT_IP_HEADER` to the header the proxy puts the client address in
+# (e.g. `X-Real-IP` or `X-Forwarded-For`), otherwise all clients share the
+# address of the proxy. Never set it without a proxy overwriting the header.
+CLIENT_IP_HEADER = os.environ.get('CLIENT_IP_HEADER', '')
+SIGNIN_IP_LIMIT = int(os.environ.get('SIGNIN_IP_LIMIT', 20))
+SIGNIN_USERNAME_LIMIT = int(os.environ.get('SIGNIN_USERNAME_LIMIT', 10))
+SIGNIN_LIMIT_WINDOW = int(os.environ.get('SIGNIN_LIMIT_WINDOW', 60))
+RATELIMIT_CACHE = os.environ.get('RATELIMIT_CACHE', 'default')
+
+# The number of threads the cryptographic operations of the asynchronous
+# views are offloaded to.
+CRYPTO_WORKERS = int(os.environ.get('CRYPTO_WORKERS', 4))
 
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
+# The SQLite database is used by default. PostgreSQL can be configured using
+# `DB_ENGINE=postgresql` and the `DB_NAME`, `DB_USER`, `DB_PASSWORD`, `DB_HOST`
+# and `DB_PORT` environment variables; set `DB_POOLER=pgbouncer` when the
+# connections go through a transaction pooler. The connections are kept open
+# for `DB_CONN_MAX_AGE` seconds; the connections idle for `DB_CHECK_IDLE_SECONDS`
+# are checked before they are reused (see `manager.database`).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_CHECK_IDLE_SECONDS = int(os.environ.get('DB_CHECK_IDLE_SECONDS', 10))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'manager'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # The server-side cursors do not work with the transaction pooling.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == 'pgbouncer',
+            'OPTIONS': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5))},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {'timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5))},
+        }
+    }
+
+# The read replicas: comma separated `DB_REPLICAS` (the SQLite files or the
+# PostgreSQL hosts, the other options are the same as of the primary). The
+# reads of the `REPLICA_MODELS` made by the safe requests of the `REPLICA_VIEWS`
+# go to a replica, except for the clients which wrote to the primary database
+# in the last `REPLICA_PIN_SECONDS` (see `manager.routers`).
+DATABASE_REPLICAS = []
+for number, replica in enumerate([replica for replica in os.environ.get('DB_REPLICAS', '').split(',') if replica]):
+    alias = 'replica{}'.format(number + 1)
+    location = {'HOST': replica} if DB_ENGINE == 'postgresql' else {'NAME': replica}
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'}, **location)
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['manager.routers.ReplicaRouter']
+REPLICA_MODELS = ['entries.Entry']
+REPLICA_VIEWS = ['entries:list', 'entries:detail', 'entries:share-check']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_COOKIE = 'primary_pin'
+
+# The pragmas set on every new SQLite connection. The write-ahead log lets the
+# readers work while a request writes, the writers wait for the lock for up
+# to `busy_timeout` ms instead of failing.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+}
 
-DATABASES = {
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# The local-memory cache is used by default. Any cache backend, e.g. a Redis
+# backend such as `django_redis.cache.RedisCache`, can be configured using
+# the `CACHE_BACKEND` and `CACHE_LOCATION` environment variables. The data
+# invalidated by one process (the sessions, the list pages and the counts of
+# the entries) is cached only by a cache shared by all the processes.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'password-manager'),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+        'KEY_PREFIX': 'manager',
     }
 }
 
+if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -130,3 +282,16 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATICFILES_DIRS = (
     os.path.join(BASE_DIR, 'common/static'),
 )
+
+# With `STATIC_MANIFEST` set, the `collectstatic` command stores the static
+# files under the names containing the hash of their content, along with
+# their gzip (and brotli, with the `brotli` package installed) compressed
+# copies. With `STATIC_SERVE` set, the `StaticFilesMiddleware` serves them
+# from `STATIC_ROOT` (for the deployments without a CDN), the files with the
+# hashed names are cached by the browsers for `STATIC_MAX_AGE` seconds.
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST', str(not DEBUG)).lower() in ('1', 'true', 'yes')
+STATIC_SERVE = os.environ.get('STATIC_SERVE', str(not DEBUG)).lower() in ('1', 'true', 'yes')
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 365 * 24 * 60 * 60))
+
+if STATIC_MANIFEST:
+    STATICFILES_STORAGE = 'manager.staticfiles.CompressedManifestStaticFilesStorage'
@@ -0,0 +1,178 @@
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpResponseNotModified
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.static import was_modified_since
+from django.core.files.base import ContentFile
+from asgiref.sync import markcoroutinefunction
+from django.utils.http import http_date
+from django.conf import settings
+import mimetypes
+import asyncio
+import gzip
+import os
+import io
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.xml', '.map', '.ico')
+COMPRESS_MIN_SIZE = 256
+# The preferred encodings first, along with the extensions of the compressed copies.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([^\s;]+)\s*(?:;\s*q\s*=\s*(\d+(?:\.\d*)?))?\s*$')
+
+
+def compress(data: bytes) -> dict:
+    """
+    Return the gzip (and the brotli, with the optional `brotli` package
+    installed) compressed copies of the data by their extensions. The copies
+    not smaller than the data are left out.
+    """
+    buffer = io.BytesIO()
+    # The modification time is not stored, so the output is reproducible.
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as stream:
+        stream.write(data)
+    copies = {'.gz': buffer.getvalue()}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(data, mode=brotli.MODE_TEXT)
+    return {extension: copy for extension, copy in copies.items() if len(copy) < len(data)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Stores the static files under the names containing the hash of their
+    content (listed in the manifest, used by the `static` template tag)
+    along with their precompressed copies, served by the
+    `StaticFilesMiddleware` without compressing anything on the fly.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in sorted(set(self.hashed_files) | set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+                continue
+            with self.open(name) as stream:
+                data = stream.read()
+            if len(data) < COMPRESS_MIN_SIZE:
+                continue
+            for extension, copy in compress(data).items():
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(copy))
+                yield name, name + extension, True
+
+
+class StaticAsset(object):
+    """A collected static file along with its precompressed copies."""
+
+    def __init__(self, path: str, immutable: bool) -> None:
+        self.path = path
+        self.immutable = immutable
+        stat = os.stat(path)
+        self.size, self.mtime = stat.st_size, stat.st_mtime
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.encodings = {encoding: path + extension for encoding, extension in ENCODINGS
+                          if os.path.isfile(path + extension)}
+
+    def choose(self, accept_encoding: str) -> tuple:
+        """Return the best encoding accepted by the client (`None` for no encoding) and the path of the file."""
+        accepted = set()
+        for value in accept_encoding.split(','):
+            match = ACCEPT_ENCODING_RE.match(value)
+            if match and (match.group(2) is None or float(match.group(2)) > 0):
+                accepted.add(match.group(1).lower())
+        for encoding, _extension in ENCODINGS:
+            if encoding in self.encodings and (encoding in accepted or '*' in accepted):
+                return encoding, self.encodings[encoding]
+        return None, self.path
+
+
+class StaticFilesMiddleware(object):
+    """
+    Serves the collected static files from `STATIC_ROOT` for the deployments
+    without a CDN or a web server in front (enabled by `STATIC_SERVE`). The
+    files are picked up once, when the process starts. The precompressed
+    copy matching the `Accept-Encoding` header is sent when available. The
+    files with the hashed names are immutable, so the browsers cache them for
+    `STATIC_MAX_AGE` seconds and never ask for them again; the others are
+    revalidated by the modification time. The middleware runs natively under
+    both WSGI and ASGI, so the requests of the other views are not passed
+    through a thread by it. The file I/O is blocking even under ASGI: the
+    file is opened in the event loop and the ASGI handler of Django 3.2
+    reads the chunks of the `FileResponse` there as well. Serve the static
+    files by a web server or a CDN when the loop must never block on them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STATIC_SERVE', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.assets = self.scan(settings.STATIC_ROOT, settings.STATIC_URL)
+
+    def scan(self, root: str, url: str) -> dict:
+        hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        compressed = tuple(extension for _encoding, extension in ENCODINGS)
+        assets = {}
+        for directory, _directories, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if filename.endswith(compressed) and os.path.isfile(path[:path.rindex('.')]):
+                    continue
+                assets[url + name] = StaticAsset(path, immutable=name in hashed)
+        return assets
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        asset = self.find(request)
+        if asset is None:
+            return self.get_response(request)
+        return self.serve(request, asset)
+
+    async def __acall__(self, request):
+        asset = self.find(request)
+        if asset is None:
+            return await self.get_response(request)
+        # The file is opened and then read (by the handler) in the event loop, the I/O blocks it.
+        return self.serve(request, asset)
+
+    def find(self, request):
+        """Return the asset requested, or `None` if the request is not for a static file."""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return self.assets.get(request.path_info)
+
+    def serve(self, request, asset: StaticAsset):
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), asset.mtime):
+            response = HttpResponseNotModified()
+        else:
+            encoding, path = asset.choose(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            response = FileResponse(open(path, 'rb'))
+            # The headers guessed from the name of the compressed copy are replaced.
+            response['Content-Type'] = asset.content_type
+            del response['Content-Disposition']
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(asset.mtime)
+
+        if asset.encodings:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        if asset.immutable:
+            patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
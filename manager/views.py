@@ -0,0 +1,32 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.generic import View
+from django.conf import settings
+
+from .metrics import registry
+
+
+class MetricsView(View):
+    """
+    The metrics view. This view is used to export the metrics of the
+    application in the Prometheus text format. Only the staff users, the
+    clients sending the `METRICS_TOKEN` as the bearer token and the clients
+    from the `METRICS_ALLOWED_IPS` addresses (none by default) are allowed.
+    """
+    http_method_names = ['get', 'head']
+
+    def is_allowed(self, request) -> bool:
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        scheme, _sep, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if token and scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token):
+            return True
+        # Behind a proxy on the same host every client has the address of the
+        # proxy, so the addresses are allowed only when configured explicitly.
+        if request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+            return True
+        return request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_allowed(request):
+            return HttpResponseForbidden()
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,20 +2,49 @@ from django.utils.translation import ugettext as _
 from django.contrib.auth import authenticate
 from django import forms
 
+from users.ratelimit import get_client_address, get_signin_limiters
+
 
 class SigninForm(forms.Form):
     """
-    Form representation of the user credentials.
+    Form representation of the user credentials. The credentials are checked
+    once, the authenticated user is available through `get_user`. The
+    attempts are rate limited by the client address and by the username
+    before the password is hashed at all.
     """
     username = forms.CharField(max_length=50, label=_('Username'),
                                widget=forms.TextInput(attrs={'placeholder': _('username')}))
     password = forms.CharField(max_length=50, label=_('Password'),
                                widget=forms.PasswordInput(attrs={'placeholder': _('password')}))
 
+    def __init__(self, request=None, *args, **kwargs):
+        self.request = request
+        self.user_cache = None
+        self.throttled = False
+        super().__init__(*args, **kwargs)
+
+    def is_throttled(self, username: str) -> bool:
+        address = get_client_address(self.request) if self.request is not None else ''
+        ip_limiter, username_limiter = get_signin_limiters()
+        # Both hits are counted, so a throttled address still counts against the username.
+        by_address = ip_limiter.hit(address)
+        by_username = username_limiter.hit(username.lower())
+        return by_address or by_username
+
     def clean(self):
         username = self.cleaned_data.get('username')
         password = self.cleaned_data.get('password')
-        user = authenticate(username=username, password=password)
-        if user is None:
+        if username is None or password is None:
+            return super().clean()
+
+        if self.is_throttled(username):
+            self.throttled = True
+            raise forms.ValidationError(_('Too many sign in attempts. Try again later.'))
+
+        self.user_cache = authenticate(self.request, username=username, password=password)
+        if self.user_cache is None:
             raise forms.ValidationError(_('Username or password incorrent.'))
         return super().clean()
+
+    def get_user(self):
+        return self.user_cache
@@ -0,0 +1,115 @@
+from django.core.cache import caches
+from django.conf import settings
+import threading
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCounters(object):
+    """
+    Expiring counters kept in the memory of the process. Used when the cache
+    is not available, so the limits still hold (per process) during an outage.
+    """
+
+    def __init__(self) -> None:
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        for key in [key for key, (value, expires) in self._counters.items() if expires <= now]:
+            del self._counters[key]
+
+    def incr(self, key: str, timeout: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            value, expires = self._counters.get(key, (0, now + timeout))
+            if expires <= now:
+                value, expires = 0, now + timeout
+            self._counters[key] = (value + 1, expires)
+            if len(self._counters) > 10000:
+                self._prune(now)
+            return value + 1
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            value, expires = self._counters.get(key, (0, 0))
+            return value if expires > time.monotonic() else 0
+
+
+local_counters = LocalCounters()
+
+
+class SlidingWindowRateLimiter(object):
+    """
+    Limits the number of hits per key to `limit` in any `window` seconds.
+    The sliding window is approximated by two fixed windows: the count of the
+    previous window is weighted by the part of it still inside the sliding
+    window. The counters are kept in the `RATELIMIT_CACHE` cache (shared by
+    the processes) with a fallback to the memory of the process.
+    """
+
+    def __init__(self, name: str, limit: int, window: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _get_key(self, key: str, index: int) -> str:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return 'ratelimit:{}:{}:{}'.format(self.name, digest, index)
+
+    def _incr(self, key: str) -> int:
+        try:
+            cache = caches[settings.RATELIMIT_CACHE]
+            cache.add(key, 0, timeout=self.window * 2)
+            try:
+                return cache.incr(key)
+            except ValueError:
+                # The counter expired (or was evicted) just after it had been added.
+                cache.set(key, 1, timeout=self.window * 2)
+                return 1
+        except Exception:
+            logger.warning('The rate limit cache is not available, using the local counters.', exc_info=True)
+            return local_counters.incr(key, self.window * 2)
+
+    def _get(self, key: str) -> int:
+        try:
+            return caches[settings.RATELIMIT_CACHE].get(key, 0)
+        except Exception:
+            return local_counters.get(key)
+
+    def hit(self, key: str) -> bool:
+        """Count a hit of the key and return whether the key is over the limit."""
+        now = time.time()
+        index, elapsed = divmod(now, self.window)
+        current = self._incr(self._get_key(key, int(index)))
+        previous = self._get(self._get_key(key, int(index) - 1))
+        return previous * (self.window - elapsed) / self.window + current > self.limit
+
+
+def get_client_address(request) -> str:
+    """
+    Return the address of the client of the request. Behind a reverse proxy
+    every request comes from the address of the proxy, so the address is
+    taken from the `CLIENT_IP_HEADER` header set by the proxy instead. Of
+    a list of addresses (`X-Forwarded-For`) the last one is taken, the one
+    appended by the proxy; the others are sent by the client and may be
+    forged.
+    """
+    header = getattr(settings, 'CLIENT_IP_HEADER', '')
+    if header:
+        value = request.META.get('HTTP_' + header.upper().replace('-', '_'), '')
+        addresses = [address.strip() for address in value.split(',') if address.strip()]
+        if addresses:
+            return addresses[-1]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_signin_limiters() -> tuple:
+    """Return the limiters of the sign in attempts by the client address and by the username."""
+    return (
+        SlidingWindowRateLimiter('signin-ip', settings.SIGNIN_IP_LIMIT, settings.SIGNIN_LIMIT_WINDOW),
+        SlidingWindowRateLimiter('signin-username', settings.SIGNIN_USERNAME_LIMIT, settings.SIGNIN_LIMIT_WINDOW),
+    )
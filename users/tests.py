@@ -1,12 +1,29 @@
+from django.contrib.auth.hashers import MD5PasswordHasher
 from django.utils.translation import ugettext as _
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
+from django.test import TestCase, SimpleTestCase, Client, RequestFactory, override_settings
+from django.core.cache import cache
 
+from users.ratelimit import LocalCounters, SlidingWindowRateLimiter, get_client_address
 
+
+class CountingPasswordHasher(MD5PasswordHasher):
+    """Counts the password checks."""
+    algorithm = 'counting_md5'
+    verified = 0
+
+    def verify(self, password, encoded):
+        CountingPasswordHasher.verified += 1
+        return super().verify(password, encoded)
+
+
+@override_settings(PASSWORD_HASHERS=['users.tests.CountingPasswordHasher'])
 class SigninViewTest(TestCase):
     """The tests for the sign in view."""
 
     def setUp(self):
+        cache.clear()
+        CountingPasswordHasher.verified = 0
         self.user = User.objects.create_user(username='rik', password='pass')
         self.client = Client()
 
@@ -30,11 +47,79 @@ class SigninViewTest(TestCase):
             'username': 'rik', 'password': 'pass'
         })
         self.assertRedirects(respone, '/', target_status_code=200)
+        self.assertEqual(CountingPasswordHasher.verified, 1)
+
+    @override_settings(SIGNIN_USERNAME_LIMIT=2)
+    def test_not_logged_user_throttled_by_username(self):
+        for password in ('password', 'password'):
+            self.client.post('/account/signin/', {'username': 'rik', 'password': password})
+        response = self.client.post('/account/signin/', {'username': 'RIK', 'password': 'pass'},
+                                    REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, _('Too many sign in attempts. Try again later.'), status_code=429)
+        self.assertEqual(CountingPasswordHasher.verified, 2)
+
+    @override_settings(SIGNIN_IP_LIMIT=2)
+    def test_not_logged_user_throttled_by_address(self):
+        for username in ('morty', 'summer'):
+            self.client.post('/account/signin/', {'username': username, 'password': 'password'})
+        response = self.client.post('/account/signin/', {'username': 'rik', 'password': 'pass'})
+        self.assertEqual(response.status_code, 429)
+
+        response = self.client.post('/account/signin/', {'username': 'rik', 'password': 'pass'},
+                                    REMOTE_ADDR='10.0.0.1')
+        self.assertRedirects(response, '/', target_status_code=200)
+
+    @override_settings(SIGNIN_IP_LIMIT=2, CLIENT_IP_HEADER='X-Forwarded-For')
+    def test_not_logged_user_throttled_by_forwarded_address(self):
+        # All the requests come from the address of the proxy.
+        for username in ('morty', 'summer'):
+            self.client.post('/account/signin/', {'username': username, 'password': 'password'},
+                             HTTP_X_FORWARDED_FOR='10.0.0.1')
+        response = self.client.post('/account/signin/', {'username': 'rik', 'password': 'pass'},
+                                    HTTP_X_FORWARDED_FOR='10.0.0.2, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+
+        response = self.client.post('/account/signin/', {'username': 'rik', 'password': 'pass'},
+                                    HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertRedirects(response, '/', target_status_code=200)
 
     def tearDown(self):
         self.user = None
 
 
+class SlidingWindowRateLimiterTest(SimpleTestCase):
+    """The tests for the sliding window rate limiter."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_limit(self):
+        limiter = SlidingWindowRateLimiter('test', 3, 60)
+        self.assertEqual([limiter.hit('key') for _hit in range(4)], [False, False, False, True])
+        self.assertFalse(limiter.hit('other'))
+
+    @override_settings(RATELIMIT_CACHE='missing')
+    def test_local_fallback(self):
+        limiter = SlidingWindowRateLimiter('test', 1, 60)
+        with self.assertLogs('users.ratelimit', 'WARNING'):
+            self.assertEqual([limiter.hit('key'), limiter.hit('key')], [False, True])
+
+    def test_client_address(self):
+        request = RequestFactory().get('/', HTTP_X_REAL_IP='10.0.0.1')
+        self.assertEqual(get_client_address(request), '127.0.0.1')
+        with self.settings(CLIENT_IP_HEADER='X-Real-IP'):
+            self.assertEqual(get_client_address(request), '10.0.0.1')
+            self.assertEqual(get_client_address(RequestFactory().get('/')), '127.0.0.1')
+
+    def test_local_counters(self):
+        counters = LocalCounters()
+        self.assertEqual([counters.incr('key', 60), counters.incr('key', 60)], [1, 2])
+        self.assertEqual(counters.get('key'), 2)
+        self.assertEqual(counters.incr('expired', 0), 1)
+        self.assertEqual(counters.get('expired'), 0)
+
+
 class LogoutViewTest(TestCase):
     """The tests for the logout view."""
 
@@ -52,5 +137,19 @@ class LogoutViewTest(TestCase):
         respone = self.client.get('/account/logout/', {})
         self.assertRedirects(respone, '/account/signin/', target_status_code=200)
 
+    @override_settings(SIGNIN_IP_LIMIT=2, CLIENT_IP_HEADER='X-Forwarded-For')
+    def test_not_logged_user_throttled_by_forwarded_address(self):
+        # All the requests come from the address of the proxy.
+        for username in ('morty', 'summer'):
+            self.client.post('/account/signin/', {'username': username, 'password': 'password'},
+                             HTTP_X_FORWARDED_FOR='10.0.0.1')
+        response = self.client.post('/account/signin/', {'username': 'rik', 'password': 'pass'},
+                                    HTTP_X_FORWARDED_FOR='10.0.0.2, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+
+        response = self.client.post('/account/signin/', {'username': 'rik', 'password': 'pass'},
+                                    HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertRedirects(response, '/', target_status_code=200)
+
     def tearDown(self):
         self.user = None
@@ -1,10 +1,11 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.views.generic import FormView, RedirectView
 from django.utils.translation import ugettext as _
 from django.urls import reverse_lazy
 from django.contrib import messages
 
+from manager.metrics import logins
 from users.forms import SigninForm
 
 
@@ -16,20 +17,29 @@ class ForNotLoggedOnly(UserPassesTestMixin):
 class SinginView(ForNotLoggedOnly, FormView):
     """
     The users sign in view. This view provides login authorization
-    for users.
+    for users. Throttled attempts are rejected with `429 Too Many Requests`.
     """
     template_name = 'users/users_signin.html'
     form_class = SigninForm
 
-    def form_valid(self, form):
-        username = form.cleaned_data.get('username')
-        password = form.cleaned_data.get('password')
-        user = authenticate(username=username, password=password)
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
 
-        login(self.request, user)
+    def form_valid(self, form):
+        login(self.request, form.get_user())
+        logins.inc(result='success')
         messages.success(self.request, _('Successfully logged in.'))
         return super().form_valid(form)
 
+    def form_invalid(self, form):
+        logins.inc(result='throttled' if form.throttled else 'failure')
+        response = super().form_invalid(form)
+        if form.throttled:
+            response.status_code = 429
+        return response
+
     def get_success_url(self):
         return self.request.GET.get('next', reverse_lazy('entries:list'))
 